@@ -11,17 +11,20 @@ from .forms import (
 )
 from django.shortcuts import redirect, get_object_or_404, render
 from django.contrib import messages
-from dormitory.models import Dorm, Review, Reservation, Message, School
+from dormitory.models import Dorm, Review, Reservation, Message
 from dormitory.models_transaction import TransactionLog
 from django.views import View
 from .models import Notification, CustomUser, UserReport
-from user_profile.models import UserProfile, UserInteraction, TenantPreferences
+from user_profile.models import UserProfile, TenantPreferences
 from user_profile.forms import TenantPreferencesForm
 from django.http import JsonResponse, HttpResponse
 from django.db.models import Avg, Count, F, Q, ExpressionWrapper, FloatField, Value
 from django.db.models.functions import Cast, Coalesce, Round
 from datetime import datetime, timedelta
-from math import radians, sin, cos, sqrt, atan2
+from dormitory.geo import haversine_km
+from dormitory.dashboard_cache import hydrate_recommendations, recommendations_for
+from dormitory.daily_stats import landlord_monthly_stats, landlord_views_between
+from dormitory.trending import trending_dorms
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.db.models import Case, When
@@ -29,8 +32,6 @@ from django.core.mail import send_mail
 from django.conf import settings
 import secrets
 from django.template.loader import render_to_string
-import numpy as np
-from sklearn.neighbors import NearestNeighbors
 from django.core.paginator import Paginator
 import json
 import re
@@ -359,15 +360,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points using Haversine formula."""
-        R = 6371  # Earth's radius in kilometers
-
-        lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c
+        return haversine_km(lat1, lon1, lat2, lon2)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -427,11 +420,6 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             context['inactive_users'] = inactive_users
             
         elif user.user_type == "tenant":
-            user_profile = UserProfile.objects.get(user=user)
-            favorite_dorms = user_profile.favorite_dorms.all()
-            recent_views = UserInteraction.objects.filter(user=user, interaction_type='view').order_by('-timestamp')[:10]
-            viewed_dorms = Dorm.objects.filter(id__in=recent_views.values_list('dorm_id', flat=True))
-
             # Get tenant preferences for AI-based filtering
             try:
                 preferences = TenantPreferences.objects.get(user=user)
@@ -441,291 +429,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 preferences = None
                 context['has_preferences'] = False
 
-            # --- Prepare base queryset with SMART FILTERING based on preferences ---
-            base_queryset = Dorm.objects.filter(approval_status="approved", available=True)
-            matched_school_ids = set()
-            
-            # Apply preference-based filters if they exist
-            if preferences:
-                # Budget filter
-                if preferences.min_budget > 0 or preferences.max_budget < 1000000:
-                    base_queryset = base_queryset.filter(
-                        price__gte=preferences.min_budget,
-                        price__lte=preferences.max_budget
-                    )
-                
-                # Gender preference filter (if dorm has gender field)
-                if hasattr(Dorm, 'gender_preference') and preferences.preferred_gender != 'any':
-                    base_queryset = base_queryset.filter(
-                        Q(gender_preference=preferences.preferred_gender) | 
-                        Q(gender_preference='any')
-                    )
-                
-                # Room type filter
-                if preferences.preferred_room_type in ['single', 'whole_unit']:
-                    base_queryset = base_queryset.filter(accommodation_type='whole_unit')
-                elif preferences.preferred_room_type in ['shared', 'bedspace']:
-                    base_queryset = base_queryset.filter(
-                        accommodation_type__in=['bedspace', 'room_sharing']
-                    )
-
-                # Preferred-location filter with university/school awareness.
-                preferred_location = (preferences.preferred_location or '').strip()
-                if preferred_location:
-                    matched_schools = School.objects.filter(
-                        Q(name__icontains=preferred_location) |
-                        Q(address__icontains=preferred_location)
-                    )
-
-                    if matched_schools.exists():
-                        matched_school_ids = set(matched_schools.values_list('id', flat=True))
-
-            base_queryset = base_queryset.annotate(
-                avg_rating=Coalesce(Avg('reviews__rating'), 0.0),
-                review_count=Count('reviews'),
-                amenity_count=Count('amenities'),
-            ).annotate(
-                avg_rating_rounded=Case(
-                    When(avg_rating__isnull=True, then=Value(0.0)),
-                    default=ExpressionWrapper(Round(F('avg_rating')), output_field=FloatField()),
-                    output_field=FloatField()
-                )
-            )
-            dorms = list(base_queryset)
-
             # --- Popular Dorms Logic ---
-            popular_dorms = (
-                Dorm.objects.filter(approval_status="approved", available=True)
-                .annotate(
-                    avg_rating=Coalesce(Avg('reviews__rating'), 0.0),
-                    review_count=Count('reviews'),
-                )
-                .annotate(
-                    avg_rating_rounded=Case(
-                        When(avg_rating__isnull=True, then=Value(0.0)),
-                        default=ExpressionWrapper(Round(F('avg_rating')), output_field=FloatField()),
-                        output_field=FloatField()
-                    )
-                )
-                .order_by('-recent_views', '-avg_rating')[:6]
-            )
+            popular_dorms = trending_dorms(6)
             context['popular_dorms'] = popular_dorms
 
-            # --- Collaborative Filtering Logic ---
-            user_favorites = set(user_profile.favorite_dorms.values_list('id', flat=True))
-            similar_users = UserProfile.objects.filter(
-                favorite_dorms__in=user_favorites
-            ).exclude(user=user).distinct()
-            collab_dorms = Dorm.objects.filter(
-                favorited_by__in=similar_users
-            ).exclude(
-                id__in=user_favorites
-            ).annotate(
-                num_similar_favorites=Count('favorited_by')
-            ).order_by('-num_similar_favorites', '-reviews__rating')[:12]
-            collab_dorm_ids = set(collab_dorms.values_list('id', flat=True))
-
-            # --- Prepare dorm features for ML ---
-            dorm_features = []
-            for dorm in dorms:
-                dorm_features.append([
-                    float(dorm.price),
-                    float(getattr(dorm, 'avg_rating', dorm.get_average_rating())),
-                    dorm.amenity_count,
-                    float(dorm.latitude or 0),
-                    float(dorm.longitude or 0),
-                ])
-            dorm_features = np.array(dorm_features)
-
-            # --- ML: Find similar dorms to favorites/views ---
-            if favorite_dorms.exists():
-                user_pref_indices = [i for i, d in enumerate(dorms) if d in favorite_dorms]
-            else:
-                user_pref_indices = [i for i, d in enumerate(dorms) if d in viewed_dorms]
-            if user_pref_indices:
-                user_pref_features = dorm_features[user_pref_indices]
-                n_neighbors = min(6, len(dorms))
-                nn = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean')
-                nn.fit(dorm_features)
-                user_vector = np.mean(user_pref_features, axis=0).reshape(1, -1)
-                distances, indices = nn.kneighbors(user_vector)
-                ml_recommended_indices = indices[0]
-            else:
-                ml_recommended_indices = []
-
-            # --- Calculate distance score based on location range (not exact text) ---
-            if preferences and preferences.preferred_location:
-                preferred_location = preferences.preferred_location.lower().strip()
-                max_distance_km = float(preferences.max_distance_km or 5.0)
-
-                matched_school_coords = []
-                if matched_school_ids:
-                    matched_school_coords = list(
-                        School.objects.filter(id__in=matched_school_ids)
-                        .exclude(latitude__isnull=True)
-                        .exclude(longitude__isnull=True)
-                        .values_list('latitude', 'longitude')
-                    )
+            # --- AI-powered ranking, cached per tenant (see dormitory.dashboard_cache) ---
+            regular_dorms, bedspace_dorms, top_matches = hydrate_recommendations(recommendations_for(user))
 
-                normalized_location = ''.join(ch if ch.isalnum() else ' ' for ch in preferred_location)
-                location_tokens = [token for token in normalized_location.split() if len(token) >= 3]
-
-                def haversine_km(lat1, lon1, lat2, lon2):
-                    r = 6371.0
-                    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-                    dlat = lat2 - lat1
-                    dlon = lon2 - lon1
-                    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-                    return r * (2 * atan2(sqrt(a), sqrt(1 - a)))
-
-                for dorm in dorms:
-                    if matched_school_ids:
-                        dorm_school_ids = set(dorm.nearby_schools.values_list('id', flat=True))
-                        dorm_has_school_match = bool(dorm_school_ids.intersection(matched_school_ids))
-
-                        if matched_school_coords and dorm.latitude and dorm.longitude:
-                            dorm_lat = float(dorm.latitude)
-                            dorm_lng = float(dorm.longitude)
-                            nearest = min(
-                                haversine_km(dorm_lat, dorm_lng, float(s_lat), float(s_lng))
-                                for s_lat, s_lng in matched_school_coords
-                            )
-
-                            if nearest <= max_distance_km:
-                                dorm.distance_score = 1.0 - ((nearest / max_distance_km) * 0.25)
-                            elif nearest <= (max_distance_km * 2):
-                                dorm.distance_score = 0.75 - (((nearest - max_distance_km) / max_distance_km) * 0.25)
-                            else:
-                                dorm.distance_score = 0.35
-
-                            if dorm_has_school_match:
-                                dorm.distance_score = min(1.0, dorm.distance_score + 0.12)
-                        elif dorm_has_school_match:
-                            dorm.distance_score = 0.85
-                        else:
-                            dorm.distance_score = 0.45
-                    else:
-                        searchable_text = f"{dorm.name or ''} {dorm.address or ''}".lower()
-                        if preferred_location in searchable_text:
-                            dorm.distance_score = 0.85
-                        else:
-                            token_hits = sum(1 for token in location_tokens if token in searchable_text)
-                            token_ratio = (token_hits / len(location_tokens)) if location_tokens else 0
-                            if token_ratio >= 0.67:
-                                dorm.distance_score = 0.8
-                            elif token_ratio >= 0.34:
-                                dorm.distance_score = 0.65
-                            elif token_hits > 0:
-                                dorm.distance_score = 0.55
-                            else:
-                                dorm.distance_score = 0.45
-            else:
-                # No preferences, use default distance scoring
-                for dorm in dorms:
-                    dorm.distance_score = 0.5
-            
-            # --- AI-POWERED scoring with preferences ---
-            scored_dorms = []
-            for i, dorm in enumerate(dorms):
-                # Base scoring
-                final_score = (
-                    float(getattr(dorm, 'avg_rating', dorm.get_average_rating())) * 0.20 +
-                    dorm.distance_score * 0.20 +
-                    (dorm.amenity_count / 10) * 0.15 +
-                    float(getattr(dorm, 'review_count', 0)) * 0.05 +
-                    float(dorm.price) * -0.00001
-                )
-                
-                # AI bonuses
-                ml_bonus = 0.15 if i in ml_recommended_indices else 0
-                collab_bonus = 0.15 if dorm.id in collab_dorm_ids else 0
-                
-                # PREFERENCE-BASED BONUS (makes it smart!)
-                preference_bonus = 0
-                amenity_matches = 0
-                if preferences:
-                    # Get dorm amenities
-                    dorm_amenity_names = set(dorm.amenities.values_list('name', flat=True))
-                    
-                    # Check amenity matches
-                    if preferences.wifi_required and any('wifi' in a.lower() or 'internet' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.parking_required and any('parking' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.laundry_required and any('laundry' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.kitchen_required and any('kitchen' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.aircon_required and any('aircon' in a.lower() or 'air con' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.security_required and any('security' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.pet_friendly_required and any('pet' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.study_area_required and any('study' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    if preferences.near_public_transport and any('transport' in a.lower() or 'jeep' in a.lower() or 'mrt' in a.lower() for a in dorm_amenity_names):
-                        amenity_matches += 1
-                    
-                    # Calculate preference bonus (0-0.30 based on amenity matches)
-                    total_required_amenities = sum([
-                        preferences.wifi_required,
-                        preferences.parking_required,
-                        preferences.laundry_required,
-                        preferences.kitchen_required,
-                        preferences.aircon_required,
-                        preferences.security_required,
-                        preferences.pet_friendly_required,
-                        preferences.study_area_required,
-                        preferences.near_public_transport
-                    ])
-                    if total_required_amenities > 0:
-                        preference_bonus = (amenity_matches / total_required_amenities) * 0.30
-                    
-                    # Budget match bonus
-                    if preferences.min_budget <= dorm.price <= preferences.max_budget:
-                        preference_bonus += 0.10
-                
-                total_score = final_score + ml_bonus + collab_bonus + preference_bonus
-
-                # --- Enhanced explanation logic with preferences ---
-                reasons = []
-                dorm.preference_match_percentage = 0
-                if preferences and total_required_amenities > 0:
-                    match_pct = int((amenity_matches / total_required_amenities) * 100)
-                    dorm.preference_match_percentage = match_pct
-                    if match_pct >= 80:
-                        reasons.append(f" {match_pct}% match with your preferences")
-                    elif match_pct >= 50:
-                        reasons.append(f" {match_pct}% match with your preferences")
-                
-                if preferences and preferences.min_budget <= dorm.price <= preferences.max_budget:
-                    reasons.append(" Within your budget")
-                
-                if i in ml_recommended_indices:
-                    reasons.append(" Similar to your favorites")
-                if dorm.id in collab_dorm_ids:
-                    reasons.append(" Popular among similar tenants")
-                if getattr(dorm, 'avg_rating', dorm.get_average_rating()) >= 4.5:
-                    reasons.append(" Highly rated")
-                if dorm.distance_score >= 0.8:
-                    reasons.append(" Near your preferred location")
-                if dorm.amenity_count >= 7:
-                    reasons.append(" Many amenities")
-                
-                explanation = " • ".join(reasons[:3]) if reasons else "Recommended for you"
-
-                scored_dorms.append((dorm, total_score, explanation, amenity_matches if preferences else 0))
-            
-            # --- Sort by score (AI-powered ranking!) ---
-            scored_dorms.sort(key=lambda x: x[1], reverse=True)
-            regular_dorms = [(d, e) for d, s, e, a in scored_dorms if d.accommodation_type == 'whole_unit'][:12]
-            bedspace_dorms = [(d, e) for d, s, e, a in scored_dorms if d.accommodation_type in ['bedspace', 'room_sharing']][:12]
-            
             # Top matches specifically for preference-based users
             if preferences:
-                top_matches = [(d, e, a) for d, s, e, a in scored_dorms if a >= 3][:6]  # At least 3 amenity matches
-                context['top_preference_matches'] = top_matches
+                context['top_preference_matches'] = top_matches or []
 
             context.update({
                 "dorms": regular_dorms,
@@ -805,17 +518,11 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             context['sales_growth'] = sales_growth
             
             # Calculate week-over-week views growth
-            week_ago = now - timedelta(days=7)
-            two_weeks_ago = now - timedelta(days=14)
-            
-            recent_views_count = landlord_dorms.filter(
-                reservations__created_at__gte=week_ago
-            ).aggregate(total=Coalesce(Sum('recent_views'), 0))['total']
-            
-            previous_views_count = landlord_dorms.filter(
-                reservations__created_at__gte=two_weeks_ago,
-                reservations__created_at__lt=week_ago
-            ).aggregate(total=Coalesce(Sum('recent_views'), 0))['total']
+            today = timezone.localdate()
+            recent_views_count = landlord_views_between(user, today - timedelta(days=6), today)
+            previous_views_count = landlord_views_between(
+                user, today - timedelta(days=13), today - timedelta(days=7)
+            )
             
             if previous_views_count > 0:
                 views_growth = round(((recent_views_count - previous_views_count) / previous_views_count) * 100, 1)
@@ -841,28 +548,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             # Calculate 6 months ago (approximately 180 days)
             six_months_ago = now - timedelta(days=180)
             
-            # Get reservation counts
-            last_six_months = Reservation.objects.filter(
-                dorm__landlord=user,
-                created_at__gte=six_months_ago
-            ).annotate(
-                month=TruncMonth('created_at')
-            ).values('month').annotate(
-                count=Count('id')
-            ).order_by('month')
-            
-            # Get revenue from TransactionLog for accurate tracking
-            revenue_six_months = TransactionLog.objects.filter(
-                landlord=user,
-                transaction_type='payment_received',
-                status='success',
-                amount__isnull=False,  # Ensure amount is present
-                created_at__gte=six_months_ago
-            ).annotate(
-                month=TruncMonth('created_at')
-            ).values('month').annotate(
-                revenue=Coalesce(Sum('amount'), Value(0), output_field=DecimalField())
-            ).order_by('month')
+            # Reservations and revenue per month from the daily rollup
+            monthly_stats = landlord_monthly_stats(user, six_months_ago.date())
 
             # Generate last 6 months labels using calendar
             import calendar
@@ -881,8 +568,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 chart_months.append(f"{month_name} {target_year}")
             
             # Map data to months
-            reservations_data = {entry['month'].strftime('%b %Y'): entry['count'] for entry in last_six_months if entry['month']}
-            revenue_data = {entry['month'].strftime('%b %Y'): float(entry['revenue']) for entry in revenue_six_months if entry['month']}
+            reservations_data = {month.strftime('%b %Y'): stats['reservations'] for month, stats in monthly_stats.items()}
+            revenue_data = {month.strftime('%b %Y'): float(stats['revenue'] or 0) for month, stats in monthly_stats.items()}
             
             reservations_counts = [reservations_data.get(m, 0) for m in chart_months]
             revenue_values = [revenue_data.get(m, 0) for m in chart_months]
@@ -0,0 +1,137 @@
+"""
+Canonical amenity vocabulary and per-row amenity bitmasks.
+
+Dorm amenities, roommate post amenities and tenant preference flags are all
+free-form in different ways (admin-named ``Amenity`` rows, user-created
+``RoommateAmenity`` rows, boolean fields). Each is mapped onto the fixed
+vocabulary below and stored as an integer ``amenity_mask`` with one bit per
+vocabulary entry, so "how many of the tenant's must-haves does this dorm
+have" is ``popcount(dorm_mask & wanted)`` and "has X and Y" is the single
+filter ``amenity_mask & wanted == wanted``. A B-tree cannot serve that
+predicate, so the column is deliberately not indexed; it is evaluated on
+rows the other filters already narrowed.
+
+Bit positions are persisted in the database: only append to the vocabulary,
+and run ``sync_amenity_masks`` for every model after changing keywords
+(migrations keep their own frozen copy of the vocabulary).
+"""
+
+import re
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import F
+
+# (key, label, TenantPreferences flag, lowercase name keywords); bit = position.
+# A keyword matches at the start of a word, so 'pet' finds "Pets" but not "Carpet".
+AMENITY_VOCABULARY = (
+    ('wifi', 'WiFi', 'wifi_required', ('wifi', 'internet')),
+    ('parking', 'Parking', 'parking_required', ('parking',)),
+    ('laundry', 'Laundry', 'laundry_required', ('laundry',)),
+    ('kitchen', 'Kitchen', 'kitchen_required', ('kitchen',)),
+    ('aircon', 'Air Conditioning', 'aircon_required', ('aircon', 'air con')),
+    ('security', 'Security', 'security_required', ('security',)),
+    ('pet_friendly', 'Pet Friendly', 'pet_friendly_required', ('pet',)),
+    ('study_area', 'Study Area', 'study_area_required', ('study',)),
+    ('public_transport', 'Near Public Transport', 'near_public_transport', ('transport', 'jeep', 'mrt')),
+)
+AMENITY_BITS = {key: 1 << position for position, (key, _label, _field, _keywords) in enumerate(AMENITY_VOCABULARY)}
+PREFERENCE_FIELDS = tuple(field for _key, _label, field, _keywords in AMENITY_VOCABULARY)
+_KEYWORD_PATTERNS = tuple(
+    re.compile('|'.join(r'\b' + re.escape(keyword) for keyword in keywords))
+    for _key, _label, _field, keywords in AMENITY_VOCABULARY
+)
+
+
+def mask_for_name(name):
+    """Bits of every vocabulary entry whose keywords start a word in the amenity ``name``."""
+    lowered = (name or '').lower()
+    mask = 0
+    for position, pattern in enumerate(_KEYWORD_PATTERNS):
+        if pattern.search(lowered):
+            mask |= 1 << position
+    return mask
+
+
+def mask_for_names(names):
+    mask = 0
+    for name in names:
+        mask |= mask_for_name(name)
+    return mask
+
+
+def mask_for_keys(keys):
+    """Mask of the given vocabulary keys; unknown keys are ignored."""
+    mask = 0
+    for key in keys:
+        mask |= AMENITY_BITS.get(key, 0)
+    return mask
+
+
+def mask_for_preferences(preferences):
+    """Mask of the amenities a ``TenantPreferences`` row marks as required."""
+    mask = 0
+    for position, field in enumerate(PREFERENCE_FIELDS):
+        if getattr(preferences, field, False):
+            mask |= 1 << position
+    return mask
+
+
+def labels_for_mask(mask):
+    return [label for position, (_key, label, _field, _keywords) in enumerate(AMENITY_VOCABULARY) if mask & (1 << position)]
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def popcounts(masks):
+    """Vectorized ``popcount`` over an integer array."""
+    return np.bitwise_count(np.asarray(masks, dtype=np.uint64)).astype(np.int64)
+
+
+def jaccard(mask_a, mask_b):
+    union = popcount(mask_a | mask_b)
+    return popcount(mask_a & mask_b) / union if union else 0.0
+
+
+def with_all_amenities(queryset, mask):
+    """Rows of ``queryset`` whose ``amenity_mask`` has every bit of ``mask``."""
+    if not mask:
+        return queryset
+    return queryset.alias(required_amenities=F('amenity_mask').bitand(mask)).filter(required_amenities=mask)
+
+
+def sync_amenity_masks(model, owner_ids=None):
+    """
+    Recompute ``amenity_mask`` for rows of ``model`` from its ``amenities``
+    many-to-many (all rows when ``owner_ids`` is None); returns rows updated.
+    """
+    field = model._meta.get_field('amenities')
+    through = field.remote_field.through
+    owner_column = f'{field.m2m_field_name()}_id'
+    name_lookup = f'{field.m2m_reverse_field_name()}__name'
+
+    pairs = through.objects.all()
+    owners = model.objects.all()
+    if owner_ids is not None:
+        owner_ids = list(owner_ids)
+        pairs = pairs.filter(**{f'{owner_column}__in': owner_ids})
+        owners = owners.filter(pk__in=owner_ids)
+
+    name_masks = {}
+    masks = defaultdict(int)
+    for owner_id, name in pairs.values_list(owner_column, name_lookup).iterator():
+        if name not in name_masks:
+            name_masks[name] = mask_for_name(name)
+        masks[owner_id] |= name_masks[name]
+
+    by_mask = defaultdict(list)
+    for owner_id, current in owners.values_list('pk', 'amenity_mask').iterator():
+        mask = masks.get(owner_id, 0)
+        if mask != current:
+            by_mask[mask].append(owner_id)
+    updated = 0
+    for mask, ids in by_mask.items():
+        updated += model.objects.filter(pk__in=ids).update(amenity_mask=mask)
+    return updated
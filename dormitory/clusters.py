@@ -0,0 +1,229 @@
+"""
+Server-side map marker clustering.
+
+Listed dorms are projected to Web Mercator and bucketed into a hierarchical
+grid: at zoom ``z`` the world is split into ``2 ** (z + CELL_SHIFT)`` cells
+per axis (one cell is ``CLUSTER_CELL_PX`` screen pixels wide), so every cell
+has exactly one parent one zoom level up. Each cell keeps a running count
+and coordinate sums, which makes inserting or removing a dorm an
+O(zoom levels) update and lets a viewport query return one marker per
+occupied cell. The number of markers depends on the viewport size in
+pixels, not on how many dorms exist.
+"""
+
+import math
+
+from django.conf import settings
+
+from .versioning import VersionedValue
+
+DORM_CLUSTERS_VERSION = 'dorm_clusters'
+
+TILE_PX = 256
+CLUSTER_CELL_PX = 64
+CELL_SHIFT = int(math.log2(TILE_PX // CLUSTER_CELL_PX))
+MIN_ZOOM = 0
+MAX_CLUSTER_ZOOM = 16
+# Upper bound on cells scanned per query; wider boxes are answered one zoom level up.
+MAX_QUERY_CELLS = 4096
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def project(lat, lng):
+    """(lat, lng) -> Web Mercator (x, y) in [0, 1)."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, float(lat)))
+    x = (float(lng) + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def cells_per_axis(zoom):
+    return 1 << (zoom + CELL_SHIFT)
+
+
+def _range_size(cell_range):
+    min_x, min_y, max_x, max_y = cell_range
+    return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+
+class ClusterGrid:
+    """Per-zoom cell aggregates ``[count, sum_lat, sum_lng, sum_id]`` over points."""
+
+    def __init__(self, max_zoom=MAX_CLUSTER_ZOOM):
+        self.max_zoom = max_zoom
+        self._levels = [{} for _zoom in range(max_zoom + 1)]
+        self._members = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _finest_cell(self, x, y):
+        scale = cells_per_axis(self.max_zoom)
+        return int(x * scale), int(y * scale)
+
+    def _apply(self, item_id, lat, lng, cell, sign):
+        cx, cy = cell
+        for zoom in range(self.max_zoom, MIN_ZOOM - 1, -1):
+            level = self._levels[zoom]
+            key = (cx, cy)
+            aggregate = level.get(key)
+            if aggregate is None:
+                aggregate = level[key] = [0, 0.0, 0.0, 0]
+            aggregate[0] += sign
+            aggregate[1] += sign * lat
+            aggregate[2] += sign * lng
+            aggregate[3] += sign * item_id
+            if aggregate[0] == 0:
+                del level[key]
+            cx >>= 1
+            cy >>= 1
+
+    def insert(self, item_id, lat, lng):
+        self.remove(item_id)
+        lat = float(lat)
+        lng = float(lng)
+        cell = self._finest_cell(*project(lat, lng))
+        self._points[item_id] = (lat, lng, cell)
+        self._members.setdefault(cell, set()).add(item_id)
+        self._apply(item_id, lat, lng, cell, 1)
+
+    def remove(self, item_id):
+        point = self._points.pop(item_id, None)
+        if point is None:
+            return
+        lat, lng, cell = point
+        members = self._members.get(cell)
+        if members is not None:
+            members.discard(item_id)
+            if not members:
+                del self._members[cell]
+        self._apply(item_id, lat, lng, cell, -1)
+
+    def _cell_range(self, zoom, min_lat, min_lng, max_lat, max_lng):
+        scale = cells_per_axis(zoom)
+        west, north = project(max_lat, min_lng)
+        east, south = project(min_lat, max_lng)
+        return int(west * scale), int(north * scale), int(east * scale), int(south * scale)
+
+    def _occupied_cells(self, zoom, cell_range):
+        min_x, min_y, max_x, max_y = cell_range
+        level = self._levels[zoom]
+        if _range_size(cell_range) > len(level):
+            return [
+                (key, aggregate) for key, aggregate in level.items()
+                if min_x <= key[0] <= max_x and min_y <= key[1] <= max_y
+            ]
+        cells = []
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                aggregate = level.get((cx, cy))
+                if aggregate:
+                    cells.append(((cx, cy), aggregate))
+        return cells
+
+    def _expansion_zoom(self, zoom, cell):
+        """First zoom level at which the cell's points stop sharing one cell."""
+        cx, cy = cell
+        for child_zoom in range(zoom + 1, self.max_zoom + 1):
+            level = self._levels[child_zoom]
+            children = [
+                (x, y) for x in (cx * 2, cx * 2 + 1) for y in (cy * 2, cy * 2 + 1)
+                if (x, y) in level
+            ]
+            if len(children) != 1:
+                return child_zoom
+            cx, cy = children[0]
+        return self.max_zoom + 1
+
+    def clusters(self, min_lat, min_lng, max_lat, max_lng, zoom):
+        """
+        Markers for the box at ``zoom``: ``{'id', 'lat', 'lng', 'count': 1}``
+        for single dorms, ``{'lat', 'lng', 'count', 'expansion_zoom'}`` for
+        clusters (positioned at their members' centroid).
+        """
+        zoom = max(MIN_ZOOM, zoom)
+        cell_range = self._cell_range(min(zoom, self.max_zoom), min_lat, min_lng, max_lat, max_lng)
+        if zoom > self.max_zoom and _range_size(cell_range) <= MAX_QUERY_CELLS:
+            return self._points_in_box(cell_range, min_lat, min_lng, max_lat, max_lng)
+        zoom = min(zoom, self.max_zoom)
+        while zoom > MIN_ZOOM and _range_size(cell_range) > MAX_QUERY_CELLS:
+            zoom -= 1
+            cell_range = self._cell_range(zoom, min_lat, min_lng, max_lat, max_lng)
+
+        markers = []
+        for cell, (count, sum_lat, sum_lng, sum_id) in self._occupied_cells(zoom, cell_range):
+            if count == 1:
+                lat, lng, _cell = self._points[sum_id]
+                markers.append({'id': sum_id, 'lat': lat, 'lng': lng, 'count': 1})
+            else:
+                markers.append({
+                    'lat': sum_lat / count,
+                    'lng': sum_lng / count,
+                    'count': count,
+                    'expansion_zoom': self._expansion_zoom(zoom, cell),
+                })
+        return markers
+
+    def _points_in_box(self, cell_range, min_lat, min_lng, max_lat, max_lng):
+        markers = []
+        for cell, _aggregate in self._occupied_cells(self.max_zoom, cell_range):
+            for item_id in self._members.get(cell, ()):
+                lat, lng, _cell = self._points[item_id]
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                    markers.append({'id': item_id, 'lat': lat, 'lng': lng, 'count': 1})
+        return markers
+
+
+class DormClusterIndex:
+    """
+    Process-wide ClusterGrid over listed (approved, available) dorms.
+
+    Same lifecycle as the spatial index: local writes are applied in place
+    from signals, other processes' writes arrive through the version stamp.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._grid = VersionedValue('dorm cluster index', self._build, DORM_CLUSTERS_VERSION, self._max_age)
+
+    def _max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, 'DORM_SPATIAL_INDEX_MAX_AGE', 300)
+
+    def _build(self):
+        from .models import Dorm
+
+        grid = ClusterGrid()
+        rows = Dorm.objects.filter(
+            available=True,
+            approval_status='approved',
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).values_list('id', 'latitude', 'longitude')
+        for dorm_id, lat, lng in rows.iterator():
+            grid.insert(dorm_id, lat, lng)
+        return grid
+
+    def grid(self):
+        return self._grid.get()
+
+    def update_dorm(self, dorm_id, latitude, longitude, listed=True):
+        if not listed or latitude is None or longitude is None:
+            self.discard(dorm_id)
+            return
+        self._grid.apply_local_write(lambda grid: grid.insert(dorm_id, latitude, longitude))
+
+    def discard(self, dorm_id):
+        self._grid.apply_local_write(lambda grid: grid.remove(dorm_id))
+
+    def reset(self):
+        self._grid.reset()
+
+    def clusters(self, min_lat, min_lng, max_lat, max_lng, zoom):
+        return self.grid().clusters(min_lat, min_lng, max_lat, max_lng, zoom)
+
+
+dorm_cluster_index = DormClusterIndex()
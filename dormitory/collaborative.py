@@ -0,0 +1,159 @@
+"""
+Item-item collaborative filtering for "Popular among similar tenants".
+
+The batch job builds a sparse user x dorm matrix from current favorites and
+the view/booking history in ``UserInteraction``, each event weighted by type
+and by ``exp(-ln 2 * age / half_life)``. Repeat events are damped with
+``log1p`` so a tenant refreshing one page does not dominate. Dorms are
+compared by cosine similarity of their (column-normalized) user vectors, one
+sparse product for the whole catalog, and each dorm's best listed neighbours
+are stored in ``DormCollaborativeNeighbour``. The dashboard then sums the
+stored scores of its tenant's favorites and recent dorms in one query.
+"""
+
+import logging
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Dorm, DormCollaborativeNeighbour
+
+logger = logging.getLogger(__name__)
+
+# Favorites come from FavoriteDorm (current state); the 'favorite' interaction
+# rows would count them twice.
+EVENT_WEIGHTS = {
+    'view': 1.0,
+    'favorite': 3.0,
+    'book': 5.0,
+}
+NEIGHBOURS_STORED = 20
+# Events older than this many half-lives add less than 0.1% of their weight.
+HORIZON_HALF_LIVES = 10
+
+
+def half_life_seconds():
+    return float(getattr(settings, 'COLLABORATIVE_HALF_LIFE_DAYS', 30)) * 86400
+
+
+def _events(now, horizon):
+    """``(user_id, dorm_id, weight, moment)`` for every counted event since ``horizon``."""
+    from user_profile.models import FavoriteDorm, UserInteraction
+
+    favorites = FavoriteDorm.objects.filter(added_date__gte=horizon).values_list(
+        'user_profile__user_id', 'dorm_id', 'added_date',
+    )
+    for user_id, dorm_id, moment in favorites.iterator():
+        yield user_id, dorm_id, EVENT_WEIGHTS['favorite'], moment
+    interactions = UserInteraction.objects.filter(
+        timestamp__gte=horizon,
+        interaction_type__in=[kind for kind in EVENT_WEIGHTS if kind != 'favorite'],
+    ).values_list('user_id', 'dorm_id', 'interaction_type', 'timestamp')
+    for user_id, dorm_id, kind, moment in interactions.iterator():
+        yield user_id, dorm_id, EVENT_WEIGHTS[kind], moment
+
+
+def interaction_matrix(now=None):
+    """(dorm ids, CSR user x dorm matrix of decayed, damped event weights)."""
+    now = now or timezone.now()
+    half_life = half_life_seconds()
+    horizon = now - timedelta(seconds=half_life * HORIZON_HALF_LIVES)
+
+    users, dorms = {}, {}
+    rows, columns, weights, ages = [], [], [], []
+    for user_id, dorm_id, weight, moment in _events(now, horizon):
+        rows.append(users.setdefault(user_id, len(users)))
+        columns.append(dorms.setdefault(dorm_id, len(dorms)))
+        weights.append(weight)
+        ages.append((now - moment).total_seconds())
+
+    decayed = np.array(weights, dtype=np.float64) * np.exp(
+        -math.log(2) * np.maximum(np.array(ages, dtype=np.float64), 0.0) / half_life
+    )
+    # COO -> CSR sums repeated (user, dorm) events.
+    matrix = sparse.coo_matrix((decayed, (rows, columns)), shape=(len(users), len(dorms))).tocsr()
+    matrix.data = np.log1p(matrix.data)
+    return np.array(list(dorms), dtype=np.int64), matrix
+
+
+def item_similarities(matrix):
+    """Sparse dorm x dorm cosine similarity of the matrix's columns, diagonal removed."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = matrix @ sparse.diags(inverse)
+    similarities = (normalized.T @ normalized).tocsr()
+    similarities = (similarities - sparse.diags(similarities.diagonal())).tocsr()
+    similarities.eliminate_zeros()
+    return similarities
+
+
+def top_neighbours(dorm_ids, similarities, listed, k=NEIGHBOURS_STORED):
+    """Rows ``(dorm_id, neighbour_id, score, rank)``: each dorm's best ``k`` listed neighbours."""
+    rows = []
+    for position, dorm_id in enumerate(dorm_ids.tolist()):
+        start, end = similarities.indptr[position], similarities.indptr[position + 1]
+        columns = similarities.indices[start:end]
+        scores = similarities.data[start:end]
+        keep = listed[columns]
+        columns, scores = columns[keep], scores[keep]
+        if len(columns) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((dorm_ids[columns], -scores))
+        for rank, (neighbour_id, score) in enumerate(
+            zip(dorm_ids[columns[order]].tolist(), scores[order].tolist()), start=1,
+        ):
+            rows.append((dorm_id, neighbour_id, score, rank))
+    return rows
+
+
+def rebuild_collaborative_neighbours(now=None, k=NEIGHBOURS_STORED, batch_size=1000):
+    """Recompute and replace every stored neighbour list; returns (dorms with events, rows stored)."""
+    dorm_ids, matrix = interaction_matrix(now)
+    listed_ids = set(Dorm.objects.filter(
+        id__in=dorm_ids.tolist(), available=True, approval_status='approved',
+    ).values_list('id', flat=True))
+    listed = np.array([dorm_id in listed_ids for dorm_id in dorm_ids.tolist()], dtype=bool)
+    rows = top_neighbours(dorm_ids, item_similarities(matrix), listed, k=k) if len(dorm_ids) else []
+
+    with transaction.atomic():
+        DormCollaborativeNeighbour.objects.all().delete()
+        DormCollaborativeNeighbour.objects.bulk_create(
+            [
+                DormCollaborativeNeighbour(dorm_id=dorm_id, neighbour_id=neighbour_id, score=score, rank=rank)
+                for dorm_id, neighbour_id, score, rank in rows
+            ],
+            batch_size=batch_size,
+        )
+    logger.info(
+        "Rebuilt collaborative neighbours: %s users x %s dorms, %s rows",
+        matrix.shape[0], len(dorm_ids), len(rows),
+    )
+    return len(dorm_ids), len(rows)
+
+
+def collaborative_dorm_ids(seed_dorm_ids, exclude=(), limit=12):
+    """
+    Listed dorms most often engaged with alongside ``seed_dorm_ids`` (a
+    tenant's favorites and recent dorms), best first, skipping ``exclude``.
+    """
+    seed_dorm_ids = list(seed_dorm_ids)
+    if not seed_dorm_ids:
+        return []
+    return list(
+        DormCollaborativeNeighbour.objects.filter(
+            dorm_id__in=seed_dorm_ids,
+            neighbour__available=True,
+            neighbour__approval_status='approved',
+        ).exclude(
+            neighbour_id__in=list(exclude),
+        ).values('neighbour_id').annotate(
+            total=Sum('score'),
+        ).order_by('-total', 'neighbour_id').values_list('neighbour_id', flat=True)[:limit]
+    )
@@ -0,0 +1,190 @@
+"""
+Per-dorm daily activity rollup (``DormDailyStats``).
+
+Views are added as they are flushed from the buffered view counter, so a
+day's ``views`` are the views flushed that day. Favorites, reservations,
+messages and revenue are recomputed from the raw rows for a trailing window
+of days by ``rollup_daily_stats`` (re-running a day overwrites it), which the
+``rollup_dorm_stats`` command runs hourly (railway.toml). Landlord charts
+then sum a few rows per dorm and day instead of scanning the event tables;
+only the last ``LIVE_DAYS`` days, which the cron may not have rolled up yet,
+are counted from the raw rows. Migration 0071 backfilled those fields for
+all history when the rollup shipped.
+
+Revenue is attributed to a landlord through the dorm (``dorm__landlord``,
+via the payment's dorm or its reservation's dorm), not through
+``TransactionLog.landlord``; payments logged with neither are not counted.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Dorm, DormDailyStats, Message, Reservation
+from .models_transaction import TransactionLog
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ('favorites', 'reservations', 'messages', 'revenue')
+# Trailing days (including today) charts count from the raw rows; matches the
+# ``rollup_dorm_stats --days`` window the cron recomputes.
+LIVE_DAYS = 2
+
+
+def add_daily_views(deltas, day=None):
+    """Add ``{dorm_id: views}`` to the dorms' rows for ``day`` (today by default)."""
+    if not deltas:
+        return
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        DormDailyStats.objects.bulk_create(
+            [DormDailyStats(dorm_id=dorm_id, day=day) for dorm_id in deltas],
+            ignore_conflicts=True,
+        )
+        by_delta = defaultdict(list)
+        for dorm_id, count in deltas.items():
+            by_delta[count].append(dorm_id)
+        for delta, dorm_ids in by_delta.items():
+            DormDailyStats.objects.filter(dorm_id__in=dorm_ids, day=day).update(views=F('views') + delta)
+
+
+def _day_bounds(first_day, last_day):
+    start = timezone.make_aware(datetime.combine(first_day, dt_time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), dt_time.min))
+    return start, end
+
+
+def _per_dorm_day(queryset, time_field, value, dorm=F('dorm_id'), dorm_ids=None):
+    rows = queryset.annotate(
+        stat_dorm=dorm,
+        stat_day=TruncDate(time_field),
+    ).filter(stat_dorm__isnull=False)
+    if dorm_ids is not None:
+        rows = rows.filter(stat_dorm__in=dorm_ids)
+    rows = rows.values('stat_dorm', 'stat_day').annotate(value=value)
+    return {(row['stat_dorm'], row['stat_day']): row['value'] for row in rows}
+
+
+def daily_totals(first_day, last_day, dorm_ids=None):
+    """
+    ``{field: {(dorm_id, day): value}}`` of the rollup fields for days in
+    [first_day, last_day], counted from the raw rows (only ``dorm_ids`` when given).
+    """
+    from user_profile.models import FavoriteDorm
+
+    start, end = _day_bounds(first_day, last_day)
+    return {
+        'favorites': _per_dorm_day(
+            FavoriteDorm.objects.filter(added_date__gte=start, added_date__lt=end),
+            'added_date', Count('id'), dorm_ids=dorm_ids,
+        ),
+        'reservations': _per_dorm_day(
+            Reservation.objects.filter(created_at__gte=start, created_at__lt=end),
+            'created_at', Count('id'), dorm_ids=dorm_ids,
+        ),
+        'messages': _per_dorm_day(
+            Message.objects.filter(timestamp__gte=start, timestamp__lt=end),
+            'timestamp', Count('id'), dorm_ids=dorm_ids,
+        ),
+        # Payments logged without a dorm are attributed through their reservation.
+        'revenue': _per_dorm_day(
+            TransactionLog.objects.filter(
+                transaction_type='payment_received',
+                status='success',
+                amount__isnull=False,
+                created_at__gte=start,
+                created_at__lt=end,
+            ),
+            'created_at', Sum('amount'),
+            dorm=Coalesce('dorm_id', 'reservation__dorm_id'),
+            dorm_ids=dorm_ids,
+        ),
+    }
+
+
+def rollup_daily_stats(first_day, last_day, batch_size=1000):
+    """
+    Recompute favorites, reservations, messages and revenue for every dorm
+    and day in [first_day, last_day]; returns the number of rows written.
+    """
+    totals = daily_totals(first_day, last_day)
+    keys = set()
+    for values in totals.values():
+        keys.update(values)
+    existing_dorms = set(Dorm.objects.filter(id__in={dorm_id for dorm_id, _day in keys}).values_list('id', flat=True))
+
+    with transaction.atomic():
+        existing = {
+            (row.dorm_id, row.day): row
+            for row in DormDailyStats.objects.filter(day__gte=first_day, day__lte=last_day)
+        }
+        to_update = []
+        for key, row in existing.items():
+            for field in ROLLUP_FIELDS:
+                setattr(row, field, totals[field].get(key, Decimal('0') if field == 'revenue' else 0))
+            to_update.append(row)
+        to_create = [
+            DormDailyStats(
+                dorm_id=dorm_id,
+                day=day,
+                **{field: totals[field].get((dorm_id, day), 0) for field in ROLLUP_FIELDS},
+            )
+            for dorm_id, day in sorted(keys - set(existing), key=lambda key: (key[1], key[0]))
+            if dorm_id in existing_dorms
+        ]
+        DormDailyStats.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=batch_size)
+        DormDailyStats.objects.bulk_create(to_create, batch_size=batch_size)
+    logger.info(
+        "Rolled up dorm stats %s..%s: %s rows updated, %s created",
+        first_day, last_day, len(to_update), len(to_create),
+    )
+    return len(to_update) + len(to_create)
+
+
+def landlord_monthly_stats(landlord, since_day, today=None):
+    """
+    ``{month_start: {'views', 'reservations', 'revenue', ...}}`` for the
+    landlord's dorms since ``since_day``. The last ``LIVE_DAYS`` days are
+    counted from the raw rows, since the rollup may not have reached them.
+    """
+    today = today or timezone.localdate()
+    live_from = max(since_day, today - timedelta(days=LIVE_DAYS - 1))
+    rolled_up = Q(day__lt=live_from)
+    rows = DormDailyStats.objects.filter(
+        dorm__landlord=landlord,
+        day__gte=since_day,
+    ).annotate(month=TruncMonth('day')).values('month').annotate(
+        views=Sum('views'),
+        favorites=Sum('favorites', filter=rolled_up),
+        reservations=Sum('reservations', filter=rolled_up),
+        messages=Sum('messages', filter=rolled_up),
+        revenue=Sum('revenue', filter=rolled_up),
+    ).order_by('month')
+    stats = {}
+    for row in rows:
+        month = row.pop('month')
+        stats[month] = {field: value or 0 for field, value in row.items()}
+
+    dorm_ids = list(Dorm.objects.filter(landlord=landlord).values_list('id', flat=True))
+    for field, values in daily_totals(live_from, today, dorm_ids=dorm_ids).items():
+        for (_dorm_id, day), value in values.items():
+            month = stats.setdefault(day.replace(day=1), {
+                'views': 0, **{name: 0 for name in ROLLUP_FIELDS},
+            })
+            month[field] += value
+    return dict(sorted(stats.items()))
+
+
+def landlord_views_between(landlord, first_day, last_day):
+    """Views of the landlord's dorms flushed on days in [first_day, last_day]."""
+    return DormDailyStats.objects.filter(
+        dorm__landlord=landlord,
+        day__gte=first_day,
+        day__lte=last_day,
+    ).aggregate(total=Coalesce(Sum('views'), 0))['total']
@@ -0,0 +1,276 @@
+"""
+Per-tenant cache of the dashboard's recommended dorm sections.
+
+The scored "dorms", "bedspace_dorms" and "top_preference_matches" sections
+are cached per user as dorm ids plus their explanation and template
+attributes, so a dashboard load hydrates at most 30 dorms instead of loading
+and ranking every candidate. Keys carry the ``dorm_results`` catalog version
+(bumped by listing, review, school and amenity writes), so catalog changes
+expire every entry at once. They also carry the recommender model file's
+stamp and the newest ``DormCollaborativeNeighbour`` id, which every process
+reads from shared storage, so ``train_recommender`` and
+``rebuild_collaborative_filter`` (separate processes) retire old entries in
+the web workers without signalling them. A tenant's own entry is dropped
+when their preferences, favorites or interactions change. If they opened the dashboard within
+``DASHBOARD_RECOMMENDATIONS_ACTIVE_SECONDS``, it is recomputed on a
+background thread ``DASHBOARD_RECOMMENDATIONS_WARM_DELAY`` seconds later, so
+a burst of interactions (browsing several dorms) costs one ranking, not one
+per click.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+
+from .collaborative import collaborative_dorm_ids
+from .dashboard_ranking import REGULAR_TYPES, SHARED_TYPES, DashboardRanking
+from .models import Dorm, DormCollaborativeNeighbour, School
+from .recommendations import dorm_recommender
+from .result_cache import DORM_RESULTS_VERSION
+from .versioning import get_version
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'dashboard_recs'
+ACTIVE_KEY_PREFIX = 'dashboard_recs:active'
+CACHE_TIMEOUT = 900
+
+
+def model_signature():
+    """Changes whenever the recommender model file or the collaborative neighbour table is rebuilt."""
+    stamp = dorm_recommender.model_stamp()
+    model = '%s-%s' % stamp if stamp else '0'
+    # A rebuild replaces every row, and primary keys are not reused.
+    latest_neighbour = DormCollaborativeNeighbour.objects.aggregate(latest=Max('id'))['latest'] or 0
+    return f'{model}.{latest_neighbour}'
+
+
+def cache_key(user_id):
+    return f'{CACHE_KEY_PREFIX}:{user_id}:{get_version(DORM_RESULTS_VERSION)}.{model_signature()}'
+
+
+def _candidate_dorms(preferences):
+    """(listed dorms passing the tenant's hard filters, ids of schools matching their location)."""
+    # --- Prepare base queryset with SMART FILTERING based on preferences ---
+    base_queryset = Dorm.objects.filter(approval_status="approved", available=True)
+    matched_school_ids = set()
+
+    # Apply preference-based filters if they exist
+    if preferences:
+        # Budget filter
+        if preferences.min_budget > 0 or preferences.max_budget < 1000000:
+            base_queryset = base_queryset.filter(
+                price__gte=preferences.min_budget,
+                price__lte=preferences.max_budget
+            )
+
+        # Gender preference filter (if dorm has gender field)
+        if hasattr(Dorm, 'gender_preference') and preferences.preferred_gender != 'any':
+            base_queryset = base_queryset.filter(
+                Q(gender_preference=preferences.preferred_gender) |
+                Q(gender_preference='any')
+            )
+
+        # Room type filter
+        if preferences.preferred_room_type in ['single', 'whole_unit']:
+            base_queryset = base_queryset.filter(accommodation_type='whole_unit')
+        elif preferences.preferred_room_type in ['shared', 'bedspace']:
+            base_queryset = base_queryset.filter(
+                accommodation_type__in=['bedspace', 'room_sharing']
+            )
+
+        # Preferred-location filter with university/school awareness.
+        preferred_location = (preferences.preferred_location or '').strip()
+        if preferred_location:
+            matched_school_ids = set(School.objects.filter(
+                Q(name__icontains=preferred_location) |
+                Q(address__icontains=preferred_location)
+            ).values_list('id', flat=True))
+
+    return list(base_queryset.annotate(amenity_count=Count('amenities'))), matched_school_ids
+
+
+def _entry(dorm, explanation, **extra):
+    return {
+        'id': dorm.id,
+        'explanation': explanation,
+        'preference_match_percentage': dorm.preference_match_percentage,
+        'distance_score': dorm.distance_score,
+        **extra,
+    }
+
+
+def compute_recommendations(user):
+    """Rank the tenant's candidate dorms; returns the cacheable sections."""
+    from user_profile.models import TenantPreferences, UserInteraction
+
+    preferences = TenantPreferences.objects.filter(user=user).first()
+    dorms, matched_school_ids = _candidate_dorms(preferences)
+
+    favorite_ids = list(Dorm.objects.filter(favorited_by__user=user).values_list('id', flat=True))
+    recent_view_ids = list(
+        UserInteraction.objects.filter(user=user, interaction_type='view')
+        .order_by('-timestamp').values_list('dorm_id', flat=True)[:10]
+    )
+
+    # --- Collaborative Filtering Logic (item-item neighbours from rebuild_collaborative_filter) ---
+    collab_dorm_ids = set(collaborative_dorm_ids(
+        set(favorite_ids) | set(recent_view_ids), exclude=favorite_ids, limit=12,
+    ))
+
+    # --- ML: Find similar dorms to favorites/views (pre-trained index) ---
+    ml_recommended_ids = set(dorm_recommender.neighbours(
+        favorite_ids or list(dict.fromkeys(recent_view_ids)), k=6, candidates={dorm.id for dorm in dorms},
+    ))
+
+    # --- AI-POWERED scoring with preferences (columnar, see dormitory.dashboard_ranking) ---
+    ranking = DashboardRanking(
+        dorms,
+        preferences,
+        matched_school_ids=matched_school_ids,
+        ml_ids=ml_recommended_ids,
+        collab_ids=collab_dorm_ids,
+    )
+    return {
+        'regular': [_entry(dorm, explanation) for dorm, explanation in ranking.section(REGULAR_TYPES)],
+        'bedspace': [_entry(dorm, explanation) for dorm, explanation in ranking.section(SHARED_TYPES)],
+        # Top matches specifically for preference-based users
+        'top_matches': [
+            _entry(dorm, explanation, amenity_matches=amenity_matches)
+            for dorm, explanation, amenity_matches in ranking.top_preference_matches()
+        ] if preferences else None,
+    }
+
+
+def active_key(user_id):
+    return f'{ACTIVE_KEY_PREFIX}:{user_id}'
+
+
+def active_seconds():
+    return int(getattr(settings, 'DASHBOARD_RECOMMENDATIONS_ACTIVE_SECONDS', 1800))
+
+
+def warm_delay():
+    return float(getattr(settings, 'DASHBOARD_RECOMMENDATIONS_WARM_DELAY', 30))
+
+
+def recommendations_for(user):
+    """The tenant's cached sections, computed and stored on a miss."""
+    # Marks the tenant as active, so their entry is warmed again after it is dropped.
+    cache.set(active_key(user.pk), 1, active_seconds())
+    key = cache_key(user.pk)
+    payload = cache.get(key)
+    if payload is None:
+        payload = compute_recommendations(user)
+        cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
+
+
+def hydrate_recommendations(payload):
+    """
+    ``(dorms, bedspace_dorms, top_preference_matches)`` in the shapes the
+    dashboard template expects; dorms delisted since caching are dropped.
+    """
+    entries = payload['regular'] + payload['bedspace'] + (payload['top_matches'] or [])
+    rows = {
+        dorm.id: dorm
+        for dorm in Dorm.objects.filter(
+            id__in={entry['id'] for entry in entries},
+            approval_status='approved',
+            available=True,
+        ).select_related('landlord').prefetch_related('images').annotate(amenity_count=Count('amenities'))
+    }
+
+    def dorms_of(section):
+        for entry in section:
+            dorm = rows.get(entry['id'])
+            if dorm is None:
+                continue
+            dorm.preference_match_percentage = entry['preference_match_percentage']
+            dorm.distance_score = entry['distance_score']
+            yield dorm, entry
+
+    regular = [(dorm, entry['explanation']) for dorm, entry in dorms_of(payload['regular'])]
+    bedspace = [(dorm, entry['explanation']) for dorm, entry in dorms_of(payload['bedspace'])]
+    top_matches = None
+    if payload['top_matches'] is not None:
+        top_matches = [
+            (dorm, entry['explanation'], entry['amenity_matches'])
+            for dorm, entry in dorms_of(payload['top_matches'])
+        ]
+    return regular, bedspace, top_matches
+
+
+# --- Invalidation and background warming ---
+
+_warm_condition = threading.Condition()
+_warm_due = {}  # user id -> time.monotonic() at which to warm
+_warm_thread = None
+
+
+def _warm(user_id):
+    from accounts.models import CustomUser
+
+    try:
+        user = CustomUser.objects.filter(pk=user_id, user_type='tenant').first()
+        if user is not None:
+            cache.set(cache_key(user_id), compute_recommendations(user), CACHE_TIMEOUT)
+    except Exception:
+        logger.exception("Failed to warm dashboard recommendations for user %s", user_id)
+    finally:
+        # The warm-up thread holds its own connection; don't leave it open between jobs.
+        connection.close()
+
+
+def _due_users():
+    """Block until at least one scheduled warm is due; returns those user ids."""
+    with _warm_condition:
+        while True:
+            now = time.monotonic()
+            due = [user_id for user_id, moment in _warm_due.items() if moment <= now]
+            if due:
+                for user_id in due:
+                    del _warm_due[user_id]
+                return due
+            _warm_condition.wait(min(_warm_due.values()) - now if _warm_due else None)
+
+
+def _warm_loop():
+    while True:
+        for user_id in _due_users():
+            _warm(user_id)
+
+
+def schedule_warm(user_id):
+    """
+    Recompute the tenant's entry on the warm-up thread after
+    ``warm_delay()`` seconds, if they used the dashboard recently. Calls for
+    a tenant who already has a warm pending join it.
+    """
+    global _warm_thread
+    if not getattr(settings, 'DASHBOARD_RECOMMENDATIONS_WARM', True):
+        return
+    if not cache.get(active_key(user_id)):
+        return
+    with _warm_condition:
+        if user_id in _warm_due:
+            return
+        _warm_due[user_id] = time.monotonic() + warm_delay()
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=_warm_loop, name='dashboard-warm', daemon=True)
+            _warm_thread.start()
+        _warm_condition.notify()
+
+
+def invalidate_user(user_id):
+    """Drop the tenant's entry once the current transaction commits, then warm it again."""
+    def invalidate():
+        cache.delete(cache_key(user_id))
+        schedule_warm(user_id)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,202 @@
+"""
+Columnar scoring for the tenant dashboard's recommended dorms.
+
+The candidate dorms are turned into NumPy columns once: rating, price,
+amenity count, review count and amenity bitmask from the loaded objects, and
+a distance score per dorm from one dorm x school distance matrix. Preference
+matches are a popcount of each dorm's mask against the tenant's. Scores are
+then a handful of array expressions, evaluated in the same order as the
+per-dorm formula so the ranking (ties included) is unchanged. Explanations
+are only built for the dorms a section actually shows.
+"""
+
+import numpy as np
+
+from .amenity_bits import mask_for_preferences, popcount, popcounts
+from .geo import haversine_matrix
+from .models import DormSchoolDistance, School
+from .school_distances import NEARBY_SCHOOL_RADIUS_KM
+
+DEFAULT_DISTANCE_SCORE = 0.5
+UNMATCHED_DISTANCE_SCORE = 0.45
+SECTION_SIZE = 12
+TOP_MATCHES_SIZE = 6
+TOP_MATCH_MIN_AMENITIES = 3
+REGULAR_TYPES = ('whole_unit',)
+SHARED_TYPES = ('bedspace', 'room_sharing')
+
+
+def _location_text_scores(dorms, preferred_location):
+    """Distance scores from how much of the preferred location a dorm's name/address mentions."""
+    normalized = ''.join(ch if ch.isalnum() else ' ' for ch in preferred_location)
+    tokens = [token for token in normalized.split() if len(token) >= 3]
+    scores = np.full(len(dorms), UNMATCHED_DISTANCE_SCORE)
+    for position, dorm in enumerate(dorms):
+        searchable_text = f"{dorm.name or ''} {dorm.address or ''}".lower()
+        if preferred_location in searchable_text:
+            scores[position] = 0.85
+            continue
+        token_hits = sum(1 for token in tokens if token in searchable_text)
+        token_ratio = (token_hits / len(tokens)) if tokens else 0
+        if token_ratio >= 0.67:
+            scores[position] = 0.8
+        elif token_ratio >= 0.34:
+            scores[position] = 0.65
+        elif token_hits > 0:
+            scores[position] = 0.55
+    return scores
+
+
+def _school_scores(dorms, school_ids, max_distance_km):
+    """Distance scores from the nearest matched school, boosted for dorms with one in the nearby radius."""
+    dorm_ids = [dorm.id for dorm in dorms]
+    school_match = np.isin(
+        np.array(dorm_ids, dtype=np.int64),
+        np.array(list(DormSchoolDistance.objects.filter(
+            dorm_id__in=dorm_ids,
+            school_id__in=school_ids,
+            distance_km__lte=NEARBY_SCHOOL_RADIUS_KM,
+        ).values_list('dorm_id', flat=True)), dtype=np.int64),
+    )
+
+    nearest = np.full(len(dorms), np.nan)
+    school_coords = list(
+        School.objects.filter(id__in=school_ids)
+        .exclude(latitude__isnull=True)
+        .exclude(longitude__isnull=True)
+        .values_list('latitude', 'longitude')
+    )
+    located = np.array([bool(dorm.latitude and dorm.longitude) for dorm in dorms], dtype=bool)
+    if school_coords and located.any():
+        school_lats, school_lngs = zip(*school_coords)
+        located_dorms = [dorm for dorm, has_coords in zip(dorms, located) if has_coords]
+        nearest[located] = haversine_matrix(
+            [dorm.latitude for dorm in located_dorms],
+            [dorm.longitude for dorm in located_dorms],
+            school_lats,
+            school_lngs,
+        ).min(axis=1)
+
+    with np.errstate(invalid='ignore'):
+        within = nearest <= max_distance_km
+        within_double = nearest <= max_distance_km * 2
+    by_distance = np.select(
+        [within, within_double],
+        [
+            1.0 - ((nearest / max_distance_km) * 0.25),
+            0.75 - (((nearest - max_distance_km) / max_distance_km) * 0.25),
+        ],
+        default=0.35,
+    )
+    by_distance = np.where(school_match, np.minimum(1.0, by_distance + 0.12), by_distance)
+    unlocated = np.where(school_match, 0.85, UNMATCHED_DISTANCE_SCORE)
+    return np.where(np.isnan(nearest), unlocated, by_distance)
+
+
+def distance_scores(dorms, preferences, matched_school_ids=()):
+    """Per-dorm closeness to the tenant's preferred location, in [0, 1]."""
+    if not (preferences and preferences.preferred_location):
+        return np.full(len(dorms), DEFAULT_DISTANCE_SCORE)
+    if matched_school_ids:
+        max_distance_km = float(preferences.max_distance_km or 5.0)
+        return _school_scores(dorms, matched_school_ids, max_distance_km)
+    return _location_text_scores(dorms, preferences.preferred_location.lower().strip())
+
+
+class DashboardRanking:
+    """Scored candidate dorms, best first; sections are sliced from ``order``."""
+
+    def __init__(self, dorms, preferences, matched_school_ids=(), ml_ids=(), collab_ids=()):
+        self.dorms = list(dorms)
+        self.preferences = preferences
+        count = len(self.dorms)
+        ids = np.fromiter((dorm.id for dorm in self.dorms), dtype=np.int64, count=count)
+        ratings = np.fromiter((float(dorm.avg_rating) for dorm in self.dorms), dtype=np.float64, count=count)
+        prices = np.fromiter((float(dorm.price) for dorm in self.dorms), dtype=np.float64, count=count)
+        amenity_counts = np.fromiter((dorm.amenity_count for dorm in self.dorms), dtype=np.float64, count=count)
+        review_counts = np.fromiter((float(dorm.review_count) for dorm in self.dorms), dtype=np.float64, count=count)
+        self.types = np.array([dorm.accommodation_type for dorm in self.dorms], dtype=object)
+
+        self.distance = distance_scores(self.dorms, preferences, matched_school_ids)
+        self.ml = np.isin(ids, np.fromiter(ml_ids, dtype=np.int64))
+        self.collab = np.isin(ids, np.fromiter(collab_ids, dtype=np.int64))
+
+        self.amenity_matches = np.zeros(count, dtype=np.int64)
+        self.total_required = 0
+        self.within_budget = np.zeros(count, dtype=bool)
+        preference_bonus = np.zeros(count)
+        if preferences:
+            required = mask_for_preferences(preferences)
+            self.total_required = popcount(required)
+            if self.total_required:
+                masks = np.fromiter((dorm.amenity_mask for dorm in self.dorms), dtype=np.uint64, count=count)
+                self.amenity_matches = popcounts(masks & np.uint64(required))
+                preference_bonus = (self.amenity_matches / self.total_required) * 0.30
+            self.within_budget = (
+                (float(preferences.min_budget) <= prices) & (prices <= float(preferences.max_budget))
+            )
+            preference_bonus = preference_bonus + np.where(self.within_budget, 0.10, 0.0)
+
+        base = (
+            ratings * 0.20 +
+            self.distance * 0.20 +
+            (amenity_counts / 10) * 0.15 +
+            review_counts * 0.05 +
+            prices * -0.00001
+        )
+        self.scores = (
+            base
+            + np.where(self.ml, 0.15, 0.0)
+            + np.where(self.collab, 0.15, 0.0)
+            + preference_bonus
+        )
+        self.order = np.argsort(-self.scores, kind='stable')
+        self._explanations = {}
+
+    def ranked_ids(self):
+        return [self.dorms[position].id for position in self.order.tolist()]
+
+    def explanation(self, position):
+        """Why the dorm at ``position`` was recommended; also sets its template attributes."""
+        if position in self._explanations:
+            return self._explanations[position]
+        dorm = self.dorms[position]
+        dorm.distance_score = float(self.distance[position])
+        dorm.preference_match_percentage = 0
+        reasons = []
+        if self.preferences and self.total_required > 0:
+            match_pct = int((int(self.amenity_matches[position]) / self.total_required) * 100)
+            dorm.preference_match_percentage = match_pct
+            if match_pct >= 50:
+                reasons.append(f" {match_pct}% match with your preferences")
+        if self.within_budget[position]:
+            reasons.append(" Within your budget")
+        if self.ml[position]:
+            reasons.append(" Similar to your favorites")
+        if self.collab[position]:
+            reasons.append(" Popular among similar tenants")
+        if dorm.avg_rating >= 4.5:
+            reasons.append(" Highly rated")
+        if dorm.distance_score >= 0.8:
+            reasons.append(" Near your preferred location")
+        if dorm.amenity_count >= 7:
+            reasons.append(" Many amenities")
+        explanation = " • ".join(reasons[:3]) if reasons else "Recommended for you"
+        self._explanations[position] = explanation
+        return explanation
+
+    def _top_positions(self, mask, limit):
+        return self.order[mask[self.order]][:limit].tolist()
+
+    def section(self, accommodation_types, limit=SECTION_SIZE):
+        """``[(dorm, explanation)]`` for the best ``limit`` dorms of the given types."""
+        mask = np.isin(self.types, accommodation_types)
+        return [(self.dorms[position], self.explanation(position)) for position in self._top_positions(mask, limit)]
+
+    def top_preference_matches(self, limit=TOP_MATCHES_SIZE, min_matches=TOP_MATCH_MIN_AMENITIES):
+        """``[(dorm, explanation, amenity_matches)]`` for the best dorms meeting ``min_matches`` preferences."""
+        positions = self._top_positions(self.amenity_matches >= min_matches, limit)
+        return [
+            (self.dorms[position], self.explanation(position), int(self.amenity_matches[position]))
+            for position in positions
+        ]
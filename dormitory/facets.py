@@ -0,0 +1,210 @@
+"""
+Filter-sidebar facet counts for the dorm listings.
+
+Every listed (approved, available) dorm gets a bit position in a
+process-level catalog, and every facet value (amenity, accommodation type,
+nearby school, verified landlord, price band, minimum rating) is a packed
+NumPy bitmap over those positions. Counting a facet under the current
+filters is a bitwise AND with the filtered result's bitmap and a popcount,
+so the whole sidebar costs one ``values_list('id')`` query instead of one
+COUNT per value.
+
+The catalog is rebuilt when the ``dorm_catalog`` version moves, or
+``DORM_FACET_CATALOG_MAX_AGE`` seconds after it was built: management
+commands run in their own process, and their ``invalidate()`` only reaches
+the web workers when the cache is shared. Counts are cached per catalog
+build, view and normalized filter signature, so they never outlive the
+catalog they were counted from.
+"""
+
+import hashlib
+import time
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .school_distances import NEARBY_SCHOOL_RADIUS_KM
+from .versioning import VersionedValue
+
+DORM_CATALOG_VERSION = 'dorm_catalog'
+FACET_CACHE_TIMEOUT = 300
+
+# (label, min_price, max_price) in whole pesos, matching the min_price /
+# target_price filters; None means open-ended.
+PRICE_BANDS = (
+    ('Under ₱3,000', 0, 2999),
+    ('₱3,000 – ₱4,999', 3000, 4999),
+    ('₱5,000 – ₱7,999', 5000, 7999),
+    ('₱8,000 – ₱11,999', 8000, 11999),
+    ('₱12,000+', 12000, None),
+)
+RATING_THRESHOLDS = (1, 2, 3, 4, 5)
+
+# Query parameters the listing filters read (dormitory.views
+# _apply_public_dorm_filters, DormListView.get_queryset and the school and
+# location helpers). Only these make up a cache signature, so tracking
+# parameters or junk like ``?utm_source=`` cannot create new entries.
+FILTER_PARAMS = frozenset({
+    'search', 'min_price', 'target_price', 'amenities', 'amenity_keyword', 'must_have',
+    'school', 'school_radius', 'location', 'lat', 'lng', 'accommodation_type', 'verified',
+    'min_rating', 'advance_months', 'deposit_months',
+})
+
+
+def filter_signature(params, keys=FILTER_PARAMS):
+    """Stable hash of the GET parameters in ``keys`` (order and blanks ignored)."""
+    items = []
+    for key in sorted(params):
+        if key not in keys:
+            continue
+        values = sorted(value.strip() for value in params.getlist(key) if value.strip())
+        if values:
+            items.append(f'{key}={",".join(values)}')
+    return hashlib.sha1('&'.join(items).encode()).hexdigest()
+
+
+class FacetCatalog:
+    """
+    Packed bitmaps over listed dorms, one per facet value.
+
+    Dorm ``i`` (in ascending id order) is bit ``i`` of a ``np.packbits``
+    array, so a count is a byte-wise AND and a popcount over ``len / 8``
+    bytes, and building a facet value is one scatter into a bool array.
+    """
+
+    def __init__(self, dorms=(), amenity_pairs=(), school_pairs=()):
+        dorms = sorted(dorms)
+        self.ids = np.array([row[0] for row in dorms], dtype=np.int64)
+        types = np.array([row[1] for row in dorms], dtype=object)
+        prices = np.array([row[2] for row in dorms], dtype=np.float64)
+        ratings = np.array([row[3] or 0 for row in dorms], dtype=np.float64)
+
+        self.accommodation_types = {
+            value: np.packbits(types == value) for value in dict.fromkeys(types.tolist())
+        }
+        self.verified = np.packbits(np.array([bool(row[4]) for row in dorms], dtype=bool))
+        self.price_bands = [
+            np.packbits((prices >= low) & ((prices < high + 1) if high is not None else True))
+            for _label, low, high in PRICE_BANDS
+        ]
+        self.min_rating = {threshold: np.packbits(ratings >= threshold) for threshold in RATING_THRESHOLDS}
+
+        self.amenities = self._pair_bitmaps(amenity_pairs)
+        self.schools = self._pair_bitmaps(school_pairs)
+        self.built_at = time.time_ns()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self, dorm_ids):
+        """Bit positions of the listed dorms among ``dorm_ids`` (others are dropped)."""
+        dorm_ids = np.asarray(dorm_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, dorm_ids)
+        inside = positions < len(self.ids)
+        inside[inside] = self.ids[positions[inside]] == dorm_ids[inside]
+        return positions[inside], inside
+
+    def _bitmap(self, positions):
+        members = np.zeros(len(self.ids), dtype=bool)
+        members[positions] = True
+        return np.packbits(members)
+
+    def _pair_bitmaps(self, pairs):
+        pairs = np.fromiter(chain.from_iterable(pairs), dtype=np.int64).reshape(-1, 2)
+        if not len(pairs):
+            return {}
+        positions, inside = self._positions(pairs[:, 0])
+        values = pairs[inside, 1]
+        order = np.argsort(values, kind='stable')
+        values, positions = values[order], positions[order]
+        unique, starts = np.unique(values, return_index=True)
+        bounds = list(starts[1:]) + [len(values)]
+        return {
+            value: self._bitmap(positions[start:end])
+            for value, start, end in zip(unique.tolist(), starts.tolist(), bounds)
+        }
+
+    def mask_for(self, dorm_ids):
+        positions, _inside = self._positions(np.fromiter(dorm_ids, dtype=np.int64))
+        return self._bitmap(positions)
+
+    def counts(self, dorm_ids):
+        """Facet counts restricted to ``dorm_ids`` (the current result set)."""
+        mask = self.mask_for(dorm_ids)
+
+        def count(bitmap):
+            return int(np.bitwise_count(bitmap & mask).sum())
+
+        return {
+            'total': int(np.bitwise_count(mask).sum()),
+            'amenities': {key: count(bitmap) for key, bitmap in self.amenities.items()},
+            'accommodation_types': {key: count(bitmap) for key, bitmap in self.accommodation_types.items()},
+            'schools': {key: count(bitmap) for key, bitmap in self.schools.items()},
+            'verified': count(self.verified),
+            'price_bands': [
+                {'label': label, 'min': low, 'max': high, 'count': count(bitmap)}
+                for (label, low, high), bitmap in zip(PRICE_BANDS, self.price_bands)
+            ],
+            # String keys so templates can look them up (``facets.min_rating.4``).
+            'min_rating': {str(key): count(bitmap) for key, bitmap in self.min_rating.items()},
+        }
+
+
+class VersionedFacetCatalog:
+    """
+    Lazily built FacetCatalog, rebuilt when the dorm catalog version moves
+    or ``max_age`` seconds after the last build.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._catalog = VersionedValue('dorm facet catalog', self._build, DORM_CATALOG_VERSION, self._max_age)
+
+    def _max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, 'DORM_FACET_CATALOG_MAX_AGE', 300)
+
+    def _build(self):
+        from .models import Dorm, DormSchoolDistance
+
+        listed = Dorm.objects.filter(available=True, approval_status='approved')
+        dorms = [
+            (dorm_id, accommodation_type, float(price), avg_rating, verified)
+            for dorm_id, accommodation_type, price, avg_rating, verified in listed.order_by('id').values_list(
+                'id', 'accommodation_type', 'price', 'avg_rating', 'landlord__is_identity_verified'
+            )
+        ]
+        amenity_pairs = Dorm.amenities.through.objects.filter(dorm__in=listed).values_list('dorm_id', 'amenity_id')
+        school_pairs = DormSchoolDistance.objects.filter(
+            dorm__in=listed, distance_km__lte=NEARBY_SCHOOL_RADIUS_KM,
+        ).values_list('dorm_id', 'school_id')
+        return FacetCatalog(dorms, amenity_pairs.iterator(), school_pairs.iterator())
+
+    def catalog(self):
+        return self._catalog.get_with_version()
+
+    def invalidate(self):
+        self._catalog.invalidate()
+
+    def reset(self):
+        self._catalog.reset()
+
+    def counts_for(self, queryset, params, scope):
+        """
+        Facet counts for a filtered Dorm ``queryset``, cached under ``scope``
+        (the view) and the signature of the request's filter ``params``.
+        """
+        catalog, version = self.catalog()
+        key = f'dorm_facets:{scope}:{version}.{catalog.built_at}:{filter_signature(params)}'
+        counts = cache.get(key)
+        if counts is None:
+            dorm_ids = queryset.order_by().values_list('id', flat=True).distinct()
+            counts = catalog.counts(dorm_ids.iterator())
+            cache.set(key, counts, FACET_CACHE_TIMEOUT)
+        return counts
+
+
+dorm_facets = VersionedFacetCatalog()
@@ -0,0 +1,64 @@
+"""
+Great-circle distance helpers shared by every piece of distance code.
+
+The batched functions take sequences of latitudes/longitudes in degrees
+(floats, Decimals or NumPy arrays) and return kilometers as NumPy arrays.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance in km between two points (scalar inputs)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _to_radians(values):
+    return np.radians(np.asarray(values, dtype=np.float64))
+
+
+def _haversine_from_radians(lat1, lon1, lat2, lon2):
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_one_to_many(lat, lng, lats, lngs):
+    """Distances in km from one point to each of ``lats``/``lngs`` (shape (n,))."""
+    return _haversine_from_radians(
+        math.radians(float(lat)), math.radians(float(lng)),
+        _to_radians(lats), _to_radians(lngs),
+    )
+
+
+def haversine_matrix(lats1, lngs1, lats2, lngs2):
+    """Pairwise distances in km, shape (len(lats1), len(lats2))."""
+    lat1 = _to_radians(lats1)[:, np.newaxis]
+    lon1 = _to_radians(lngs1)[:, np.newaxis]
+    lat2 = _to_radians(lats2)[np.newaxis, :]
+    lon2 = _to_radians(lngs2)[np.newaxis, :]
+    return _haversine_from_radians(lat1, lon1, lat2, lon2)
+
+
+def coordinates_of(items):
+    """
+    Split objects with ``latitude``/``longitude`` attributes into
+    (located_items, lats, lngs), skipping items without coordinates.
+    """
+    located = [
+        item for item in items
+        if getattr(item, 'latitude', None) is not None and getattr(item, 'longitude', None) is not None
+    ]
+    lats = np.fromiter((float(item.latitude) for item in located), dtype=np.float64, count=len(located))
+    lngs = np.fromiter((float(item.longitude) for item in located), dtype=np.float64, count=len(located))
+    return located, lats, lngs
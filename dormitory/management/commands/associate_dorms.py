@@ -1,7 +1,10 @@
 # dormitory/management/commands/associate_dorms.py
 from django.core.management.base import BaseCommand
+from dormitory.facets import dorm_facets
 from dormitory.models import Dorm, School
-from math import radians, sin, cos, sqrt, atan2
+from dormitory.result_cache import dorm_results
+from dormitory.school_distances import distance_pairs, max_distance_km, write_pairs
+from dormitory.search import reindex_dorms
 
 class Command(BaseCommand):
     help = 'Associate dorms with nearby schools'
@@ -16,27 +19,19 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         radius_km = options['radius']
-        updated = 0
-        
-        for dorm in Dorm.objects.filter(latitude__isnull=False, longitude__isnull=False):
-            # Clear existing associations
-            dorm.nearby_schools.clear()
-            
-            # Find nearby schools
-            for school in School.objects.all():
-                # Distance calculation
-                lat1 = radians(float(dorm.latitude))
-                lon1 = radians(float(dorm.longitude))
-                lat2 = radians(float(school.latitude))
-                lon2 = radians(float(school.longitude))
-                
-                dlat = lat2 - lat1
-                dlon = lon2 - lon1
-                a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                distance = 6371 * 2 * atan2(sqrt(a), sqrt(1-a))
-                
-                if distance <= radius_km:
-                    dorm.nearby_schools.add(school)
-                    updated += 1
-        
-        self.stdout.write(f'Created {updated} dorm-school associations within {radius_km}km radius')
\ No newline at end of file
+
+        dorm_rows = list(
+            Dorm.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .values_list('id', 'latitude', 'longitude')
+        )
+        school_rows = list(School.objects.values_list('id', 'latitude', 'longitude'))
+        pairs = distance_pairs(dorm_rows, school_rows, max(max_distance_km(), radius_km))
+        dorm_ids = [row[0] for row in dorm_rows]
+        write_pairs(pairs, {'dorm_id__in': dorm_ids}, nearby_radius_km=radius_km)
+        reindex_dorms(dorm_ids)
+        dorm_facets.invalidate()
+        dorm_results.invalidate()
+
+        associated = sum(1 for _dorm_id, _school_id, distance in pairs if distance <= radius_km)
+        self.stdout.write(f'Stored {len(pairs)} dorm-school distances')
+        self.stdout.write(f'Created {associated} dorm-school associations within {radius_km}km radius')
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark for the shared haversine engine.
+Usage: python manage.py benchmark_haversine --dorms 10000 --schools 100
+"""
+
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dormitory.geo import haversine_km, haversine_matrix, haversine_one_to_many
+
+LAT_RANGE = (14.40, 14.80)
+LNG_RANGE = (120.90, 121.10)
+
+
+class Command(BaseCommand):
+    help = 'Compare scalar per-pair haversine with the batched NumPy versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dorms', type=int, default=10000)
+        parser.add_argument('--schools', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Take the best of N runs (default: 3)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _best_of(self, repeat, func):
+        best = None
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000, result
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        dorm_lats = [rng.uniform(*LAT_RANGE) for _ in range(options['dorms'])]
+        dorm_lngs = [rng.uniform(*LNG_RANGE) for _ in range(options['dorms'])]
+        school_lats = [rng.uniform(*LAT_RANGE) for _ in range(options['schools'])]
+        school_lngs = [rng.uniform(*LNG_RANGE) for _ in range(options['schools'])]
+        pairs = options['dorms'] * options['schools']
+        repeat = options['repeat']
+
+        def scalar():
+            return [
+                [haversine_km(d_lat, d_lng, s_lat, s_lng) for s_lat, s_lng in zip(school_lats, school_lngs)]
+                for d_lat, d_lng in zip(dorm_lats, dorm_lngs)
+            ]
+
+        def one_to_many():
+            return [
+                haversine_one_to_many(d_lat, d_lng, school_lats, school_lngs)
+                for d_lat, d_lng in zip(dorm_lats, dorm_lngs)
+            ]
+
+        def matrix():
+            return haversine_matrix(dorm_lats, dorm_lngs, school_lats, school_lngs)
+
+        scalar_ms, scalar_result = self._best_of(repeat, scalar)
+        one_ms, one_result = self._best_of(repeat, one_to_many)
+        matrix_ms, matrix_result = self._best_of(repeat, matrix)
+
+        reference = np.array(scalar_result)
+        max_error = max(
+            float(np.abs(np.vstack(one_result) - reference).max()),
+            float(np.abs(matrix_result - reference).max()),
+        )
+
+        self.stdout.write(f"{options['dorms']} dorms x {options['schools']} schools = {pairs:,} pairs")
+        self.stdout.write(f"{'method':<24} {'ms':>10} {'pairs/sec':>14} {'speedup':>9}")
+        for label, elapsed in (
+            ('scalar math loop', scalar_ms),
+            ('one-to-many per dorm', one_ms),
+            ('many-to-many matrix', matrix_ms),
+        ):
+            self.stdout.write(
+                f'{label:<24} {elapsed:>10.1f} {pairs / (elapsed / 1000):>14,.0f} {scalar_ms / elapsed:>8.1f}x'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Max deviation from scalar result: {max_error:.2e} km'))
@@ -0,0 +1,101 @@
+"""
+Benchmark the dorm spatial grid against the linear haversine loop the dorm
+views used before it (kept below as the baseline).
+Usage: python manage.py benchmark_spatial_index --sizes 1000 10000 100000
+"""
+
+import random
+import time
+from math import atan2, cos, radians, sin, sqrt
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from dormitory.spatial_index import GridIndex
+
+# Roughly Metro Manila, where the catalog lives
+LAT_RANGE = (14.40, 14.80)
+LNG_RANGE = (120.90, 121.10)
+
+
+def _calculate_distance_km(lat1, lon1, lat2, lon2):
+    earth_radius_km = 6371
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return earth_radius_km * c
+
+
+def _filter_items_within_radius(items, lat, lng, radius_km=5.0):
+    """The original per-item scalar haversine loop from dormitory.views."""
+    nearby_items = []
+    for item in items:
+        item_lat = getattr(item, 'latitude', None)
+        item_lng = getattr(item, 'longitude', None)
+        if item_lat is None or item_lng is None:
+            continue
+        distance = _calculate_distance_km(lat, lng, float(item_lat), float(item_lng))
+        if distance <= radius_km:
+            nearby_items.append(item)
+    return nearby_items
+
+
+class Command(BaseCommand):
+    help = 'Compare radius lookups: grid spatial index vs. the original per-dorm haversine loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Catalog sizes to benchmark (default: 1k, 10k, 100k)')
+        parser.add_argument('--queries', type=int, default=50,
+                            help='Radius queries per size (default: 50)')
+        parser.add_argument('--radius', type=float, default=5.0,
+                            help='Search radius in kilometers (default: 5km)')
+        parser.add_argument('--cell-size', type=float, default=0.01,
+                            help='Grid cell size in degrees (default: 0.01)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        radius_km = options['radius']
+        query_count = options['queries']
+
+        self.stdout.write(
+            f"{'dorms':>8} {'build ms':>10} {'loop ms/q':>11} {'index ms/q':>11} {'speedup':>9}"
+        )
+        for size in options['sizes']:
+            dorms = [
+                SimpleNamespace(id=i, latitude=rng.uniform(*LAT_RANGE), longitude=rng.uniform(*LNG_RANGE))
+                for i in range(size)
+            ]
+            queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for _ in range(query_count)]
+
+            started = time.perf_counter()
+            grid = GridIndex(options['cell_size'])
+            for dorm in dorms:
+                grid.insert(dorm.id, dorm.latitude, dorm.longitude)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            loop_results = [
+                {d.id for d in _filter_items_within_radius(dorms, lat, lng, radius_km)}
+                for lat, lng in queries
+            ]
+            loop_ms = (time.perf_counter() - started) * 1000 / query_count
+
+            started = time.perf_counter()
+            index_results = [set(grid.ids_within_radius(lat, lng, radius_km)) for lat, lng in queries]
+            index_ms = (time.perf_counter() - started) * 1000 / query_count
+
+            if loop_results != index_results:
+                self.stdout.write(self.style.ERROR(f'Result mismatch at {size} dorms'))
+
+            speedup = loop_ms / index_ms if index_ms else float('inf')
+            self.stdout.write(
+                f'{size:>8} {build_ms:>10.1f} {loop_ms:>11.3f} {index_ms:>11.3f} {speedup:>8.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            'Loop timings exclude ORM hydration, so the real per-request gap is larger.'
+        ))
@@ -0,0 +1,33 @@
+"""
+Rebuild the item-item collaborative filter from favorites and the view /
+booking history, replacing every stored neighbour list.
+Usage: python manage.py rebuild_collaborative_filter --neighbours 20
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dormitory.collaborative import NEIGHBOURS_STORED, rebuild_collaborative_neighbours
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recompute DormCollaborativeNeighbour rows (top co-engaged dorms per dorm)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=NEIGHBOURS_STORED,
+                            help=f'Neighbours stored per dorm (default: {NEIGHBOURS_STORED})')
+
+    def handle(self, *args, **options):
+        neighbours = options['neighbours']
+        if neighbours < 1:
+            raise CommandError('--neighbours must be positive')
+
+        started = time.perf_counter()
+        dorms, stored = rebuild_collaborative_neighbours(k=neighbours)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{dorms} dorms with tenant activity compared in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} collaborative neighbour rows'))
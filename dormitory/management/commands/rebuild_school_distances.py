@@ -0,0 +1,160 @@
+"""
+Rebuild the dorm <-> school distance table for the whole catalog (or for
+dorms created since a given date, or against only some schools, e.g. newly
+imported ones), computing distance matrices in a process pool and writing
+each chunk in one transaction.
+Usage: python manage.py rebuild_school_distances --workers 4 --since 2025-06-01
+       python manage.py rebuild_school_distances --schools 12,13,14
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from dormitory.facets import dorm_facets
+from dormitory.models import Dorm, School
+from dormitory.result_cache import dorm_results
+from dormitory.school_distances import (
+    NEARBY_SCHOOL_RADIUS_KM,
+    distance_pairs,
+    max_distance_km,
+    write_pairs,
+)
+from dormitory.search import reindex_dorms
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_since(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid --since value '{value}'. Use YYYY-MM-DD or an ISO datetime.")
+        parsed = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_school_ids(value):
+    try:
+        school_ids = sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        raise CommandError(f"Invalid --schools value '{value}'. Use comma-separated school ids.")
+    if not school_ids:
+        raise CommandError('--schools needs at least one school id')
+    missing = set(school_ids) - set(School.objects.filter(id__in=school_ids).values_list('id', flat=True))
+    if missing:
+        raise CommandError(f"Unknown school ids: {', '.join(map(str, sorted(missing)))}")
+    return school_ids
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Recompute DormSchoolDistance rows and nearby_schools links in parallel chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str,
+                            help='Only rebuild dorms created on/after this date (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--schools', type=str,
+                            help='Only rebuild distances to these school ids (comma-separated), '
+                                 'e.g. schools imported in bulk without signals')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Dorms per distance matrix / write transaction (default: 500)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes for the distance matrices (default: CPU count; 1 runs inline)')
+        parser.add_argument('--radius', type=float, default=NEARBY_SCHOOL_RADIUS_KM,
+                            help=f'nearby_schools radius in kilometers (default: {NEARBY_SCHOOL_RADIUS_KM}km)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        radius_km = options['radius']
+        self.verbosity = options['verbosity']
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+        limit_km = max(max_distance_km(), radius_km)
+
+        dorms = Dorm.objects.all()
+        if options['since']:
+            dorms = dorms.filter(created_at__gte=_parse_since(options['since']))
+        schools = School.objects.all()
+        # Extra write scope: only replace the selected schools' rows.
+        self.school_scope = {}
+        if options['schools']:
+            school_ids = _parse_school_ids(options['schools'])
+            schools = schools.filter(id__in=school_ids)
+            self.school_scope = {'school_id__in': school_ids}
+
+        # Plain floats keep the payload sent to worker processes small.
+        dorm_rows = []
+        unlocated_ids = []
+        for dorm_id, lat, lng in dorms.order_by('id').values_list('id', 'latitude', 'longitude').iterator():
+            if lat is None or lng is None:
+                unlocated_ids.append(dorm_id)
+            else:
+                dorm_rows.append((dorm_id, float(lat), float(lng)))
+        school_rows = [
+            (school_id, float(lat), float(lng))
+            for school_id, lat, lng in schools.values_list('id', 'latitude', 'longitude')
+        ]
+
+        if unlocated_ids:
+            write_pairs([], {'dorm_id__in': unlocated_ids, **self.school_scope}, radius_km)
+            reindex_dorms(unlocated_ids)
+
+        started = time.perf_counter()
+        self.write_seconds = 0.0
+        chunks = list(_chunks(dorm_rows, chunk_size))
+        if workers == 1 or len(chunks) <= 1:
+            results = (distance_pairs(chunk, school_rows, limit_km) for chunk in chunks)
+            stored = self._write_chunks(chunks, results, radius_km)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(
+                    distance_pairs,
+                    chunks,
+                    [school_rows] * len(chunks),
+                    [limit_km] * len(chunks),
+                )
+                stored = self._write_chunks(chunks, results, radius_km)
+        elapsed = time.perf_counter() - started
+        dorm_facets.invalidate()
+        dorm_results.invalidate()
+
+        evaluated = len(dorm_rows) * len(school_rows)
+        rate = evaluated / elapsed if elapsed else float('inf')
+        write_rate = stored / self.write_seconds if self.write_seconds else float('inf')
+        logger.info("Rebuilt school distances: %s pairs evaluated, %s stored in %.2fs", evaluated, stored, elapsed)
+        self.stdout.write(
+            f'{len(dorm_rows)} dorms x {len(school_rows)} schools = {evaluated} pairs in {elapsed:.2f}s '
+            f'({rate:,.0f} pairs/sec), {len(chunks)} chunks'
+        )
+        self.stdout.write(f'Writes: {stored} rows in {self.write_seconds:.2f}s ({write_rate:,.0f} rows/sec)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} distances within {limit_km}km; cleared {len(unlocated_ids)} dorms without coordinates'
+        ))
+
+    def _write_chunks(self, chunks, results, radius_km):
+        stored = 0
+        for index, (chunk, pairs) in enumerate(zip(chunks, results), start=1):
+            write_started = time.perf_counter()
+            chunk_ids = [row[0] for row in chunk]
+            write_pairs(pairs, {'dorm_id__in': chunk_ids, **self.school_scope}, radius_km)
+            reindex_dorms(chunk_ids)
+            self.write_seconds += time.perf_counter() - write_started
+            stored += len(pairs)
+            if self.verbosity > 1:
+                self.stdout.write(f'  chunk {index}/{len(chunks)}: {len(pairs)} distances')
+        return stored
@@ -0,0 +1,33 @@
+"""
+Rebuild every dorm's full-text search document (tsvector on PostgreSQL,
+FTS5 on SQLite). Run after bulk imports that bypass model signals.
+Usage: python manage.py rebuild_search_index
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from dormitory.models import Dorm
+from dormitory.result_cache import dorm_results
+from dormitory.search import reindex_dorms, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the dorm full-text search index'
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        if backend is None:
+            self.stdout.write(self.style.WARNING(
+                'No search table for this database; dorm search uses icontains filters.'
+            ))
+            return
+
+        started = time.perf_counter()
+        reindex_dorms()
+        dorm_results.invalidate()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Dorm.objects.count()} dorms ({backend}) in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,39 @@
+"""
+Recompute Dorm.rating_sum / rating_count / avg_rating from the Review table.
+Run after bulk review imports or any write that bypassed model signals.
+Usage: python manage.py repair_dorm_ratings [--dorm 12 --dorm 15]
+"""
+
+from django.core.management.base import BaseCommand
+
+from dormitory.facets import dorm_facets
+from dormitory.models import Dorm
+from dormitory.ratings import recompute_dorm_ratings
+from dormitory.result_cache import dorm_results
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized dorm rating aggregates from reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dorm', type=int, action='append', dest='dorm_ids',
+                            help='Only repair this dorm (repeatable)')
+
+    def handle(self, *args, **options):
+        dorm_ids = options['dorm_ids']
+        dorms = Dorm.objects.all() if dorm_ids is None else Dorm.objects.filter(pk__in=dorm_ids)
+
+        before = {row[0]: row[1:] for row in dorms.values_list('id', 'rating_sum', 'rating_count')}
+        updated = recompute_dorm_ratings(dorm_ids)
+        dorm_facets.invalidate()
+        dorm_results.invalidate()
+        after = {row[0]: row[1:] for row in dorms.values_list('id', 'rating_sum', 'rating_count')}
+
+        drifted = [dorm_id for dorm_id, values in after.items() if before.get(dorm_id) != values]
+        for dorm_id in drifted:
+            self.stdout.write(
+                f'  Dorm {dorm_id}: sum/count {before.get(dorm_id)} -> {after[dorm_id]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed ratings for {updated} dorms; {len(drifted)} had drifted'
+        ))
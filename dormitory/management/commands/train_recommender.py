@@ -0,0 +1,31 @@
+"""
+Fit the tenant dashboard recommender (feature scaler + nearest-neighbour
+index over listed dorms) and save it with joblib for web workers to load.
+Run it after catalog changes or on a schedule (e.g. nightly from cron).
+Usage: python manage.py train_recommender --output ml_models/dorm_recommender.joblib
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from dormitory.recommendations import model_path, save_model, train_model
+
+
+class Command(BaseCommand):
+    help = 'Train and persist the dorm recommender model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str,
+                            help='Model file (default: settings.RECOMMENDER_MODEL_PATH)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        bundle = train_model()
+        fitted = time.perf_counter()
+        path = save_model(bundle, options['output'] or model_path())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {len(bundle['dorm_ids'])} dorms in {fitted - started:.2f}s; "
+            f"saved to {path} ({elapsed:.2f}s total)"
+        ))
@@ -0,0 +1,23 @@
+"""
+Advance the time-decayed trending scores behind the popular dorms shown on
+the home page and tenant dashboard. railway.toml runs it every 15 minutes.
+Usage: python manage.py update_trending
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from dormitory.trending import trending_dorm_ids, update_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute exponentially decayed trending scores'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scored = update_trending_scores()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {scored} dorms in {elapsed:.2f}s; top ids: {trending_dorm_ids()[:6]}'
+        ))
@@ -0,0 +1,119 @@
+"""
+Shared map payload for schools and listed dorms.
+
+Schools and approved, available dorms are serialized once per ``map_data``
+version into compact JSON blobs. ``api/map/data/`` serves them with an ETag
+so browsers revalidate with If-None-Match instead of every page inlining the
+school list; ``?layer=schools`` is the schools-only blob the map pages load
+(static/js/dorm_map.js). Views reuse the cached entries when building
+``dorms_json``. Dorm, DormImage and School writes bump the version.
+"""
+
+import hashlib
+import json
+
+from .versioning import VersionedValue
+
+MAP_DATA_VERSION = 'map_data'
+
+# Dorm fields that appear in the map payload or decide whether a dorm is listed.
+MAP_DORM_FIELDS = frozenset({
+    'name', 'address', 'price', 'latitude', 'longitude', 'available', 'approval_status',
+})
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def school_entry(school):
+    return {
+        'id': school.id,
+        'name': school.name,
+        'address': school.address,
+        'latitude': float(school.latitude),
+        'longitude': float(school.longitude),
+    }
+
+
+def dorm_entry(dorm_id, name, address, price, latitude, longitude, thumbnail=''):
+    return {
+        'id': dorm_id,
+        'name': name,
+        'address': address,
+        'price': float(price),
+        'latitude': float(latitude) if latitude else None,
+        'longitude': float(longitude) if longitude else None,
+        'thumbnail': thumbnail,
+    }
+
+
+MAP_LAYERS = ('all', 'schools')
+
+
+class MapData:
+    """One built snapshot: entries plus each layer's JSON blob and ETag."""
+
+    def __init__(self, schools, dorms):
+        self.schools = schools
+        self.dorms_by_id = {entry['id']: entry for entry in dorms}
+        self.blobs = {
+            'all': _dumps({'schools': schools, 'dorms': dorms}).encode(),
+            'schools': _dumps({'schools': schools}).encode(),
+        }
+        self.etags = {layer: '"%s"' % hashlib.sha1(blob).hexdigest() for layer, blob in self.blobs.items()}
+
+
+class VersionedMapData:
+    """Lazily built MapData, rebuilt when the ``map_data`` version moves."""
+
+    def __init__(self):
+        self._data = VersionedValue('map data', self._build, MAP_DATA_VERSION)
+
+    def _build(self):
+        from .models import Dorm, DormImage, School
+
+        schools = [
+            school_entry(school)
+            for school in School.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True).order_by('id')
+            if school.latitude and school.longitude
+        ]
+        listed = Dorm.objects.filter(available=True, approval_status='approved')
+        thumbnails = {}
+        for image in DormImage.objects.filter(dorm__in=listed).order_by('dorm_id', 'id'):
+            if image.dorm_id not in thumbnails and image.image:
+                thumbnails[image.dorm_id] = image.image.url
+        dorms = [
+            dorm_entry(dorm_id, name, address, price, latitude, longitude, thumbnails.get(dorm_id, ''))
+            for dorm_id, name, address, price, latitude, longitude in listed.order_by('id').values_list(
+                'id', 'name', 'address', 'price', 'latitude', 'longitude'
+            )
+        ]
+        return MapData(schools, dorms)
+
+    def current(self):
+        return self._data.get()
+
+    def invalidate(self):
+        self._data.invalidate()
+
+    def reset(self):
+        self._data.reset()
+
+    def dorm_entries(self, dorms):
+        """Map entries for ``dorms`` in order, serializing any not in the snapshot."""
+        by_id = self.current().dorms_by_id
+        entries = []
+        for dorm in dorms:
+            entry = by_id.get(dorm.id)
+            if entry is None:
+                thumbnail = next(iter(dorm.images.all()), None)
+                entry = dorm_entry(
+                    dorm.id, dorm.name, dorm.address, dorm.price, dorm.latitude, dorm.longitude,
+                    thumbnail.image.url if thumbnail else '',
+                )
+            entries.append(entry)
+        return entries
+
+
+map_data = VersionedMapData()
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+import numpy as np
+
+# Frozen copies of dormitory.geo and settings.SCHOOL_DISTANCE_MAX_KM as of
+# this migration, so later changes to either do not change the backfill.
+EARTH_RADIUS_KM = 6371.0
+SCHOOL_DISTANCE_MAX_KM = 20.0
+
+
+def haversine_matrix(lats1, lngs1, lats2, lngs2):
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, np.newaxis]
+    lon1 = np.radians(np.asarray(lngs1, dtype=np.float64))[:, np.newaxis]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[np.newaxis, :]
+    lon2 = np.radians(np.asarray(lngs2, dtype=np.float64))[np.newaxis, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def backfill_school_distances(apps, schema_editor):
+    Dorm = apps.get_model('dormitory', 'Dorm')
+    School = apps.get_model('dormitory', 'School')
+    DormSchoolDistance = apps.get_model('dormitory', 'DormSchoolDistance')
+
+    dorm_rows = list(
+        Dorm.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    school_rows = list(School.objects.values_list('id', 'latitude', 'longitude'))
+    if not dorm_rows or not school_rows:
+        return
+
+    dorm_ids, dorm_lats, dorm_lngs = zip(*dorm_rows)
+    school_ids, school_lats, school_lngs = zip(*school_rows)
+    distances = haversine_matrix(dorm_lats, dorm_lngs, school_lats, school_lngs)
+    rows, cols = np.nonzero(distances <= SCHOOL_DISTANCE_MAX_KM)
+    DormSchoolDistance.objects.bulk_create(
+        [
+            DormSchoolDistance(
+                dorm_id=dorm_ids[row],
+                school_id=school_ids[col],
+                distance_km=float(distances[row, col]),
+            )
+            for row, col in zip(rows.tolist(), cols.tolist())
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0060_earlyoutrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DormSchoolDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.FloatField()),
+                ('dorm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='school_distances', to='dormitory.dorm')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dorm_distances', to='dormitory.school')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'distance_km'], name='dorm_school_dist_idx'), models.Index(fields=['dorm', 'distance_km'], name='school_dorm_dist_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dormschooldistance',
+            constraint=models.UniqueConstraint(fields=('dorm', 'school'), name='unique_dorm_school_distance'),
+        ),
+        migrations.RunPython(backfill_school_distances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+from django.db import DatabaseError, migrations
+
+# Schema and initial documents are spelled out here rather than imported from
+# dormitory.search, so later edits to that module cannot change this migration.
+
+POSTGRES_CREATE = [
+    'CREATE TABLE IF NOT EXISTS dormitory_dorm_search ('
+    ' dorm_id bigint PRIMARY KEY REFERENCES dormitory_dorm(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+    ' document tsvector NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS dormitory_dorm_search_document_gin ON dormitory_dorm_search USING GIN (document)',
+]
+
+POSTGRES_POPULATE = (
+    'INSERT INTO dormitory_dorm_search (dorm_id, document)'
+    " SELECT d.id,"
+    " setweight(to_tsvector('english', coalesce(d.name, '')), 'A') ||"
+    " setweight(to_tsvector('english', coalesce((SELECT string_agg(s.name || ' ' || s.address, ' ')"
+    " FROM dormitory_dorm_nearby_schools ns JOIN dormitory_school s ON s.id = ns.school_id"
+    " WHERE ns.dorm_id = d.id), '')), 'B') ||"
+    " setweight(to_tsvector('english', coalesce(d.address, '')), 'B') ||"
+    " setweight(to_tsvector('english', coalesce(d.description, '')), 'C')"
+    ' FROM dormitory_dorm d'
+)
+
+SQLITE_CREATE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS dormitory_dorm_fts USING fts5('
+    " name, address, description, schools, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+SQLITE_POPULATE = (
+    'INSERT INTO dormitory_dorm_fts (rowid, name, address, description, schools)'
+    " SELECT d.id, d.name, d.address, d.description, coalesce((SELECT group_concat(s.name || ' ' || s.address, ' ')"
+    " FROM dormitory_dorm_nearby_schools ns JOIN dormitory_school s ON s.id = ns.school_id"
+    " WHERE ns.dorm_id = d.id), '')"
+    ' FROM dormitory_dorm d'
+)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+        schema_editor.execute('DELETE FROM dormitory_dorm_search')
+        schema_editor.execute(POSTGRES_POPULATE)
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_CREATE)
+        except DatabaseError:
+            # No FTS5 in this SQLite build: dorm search falls back to icontains filters.
+            return
+        schema_editor.execute('DELETE FROM dormitory_dorm_fts')
+        schema_editor.execute(SQLITE_POPULATE)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS dormitory_dorm_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS dormitory_dorm_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0061_dormschooldistance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
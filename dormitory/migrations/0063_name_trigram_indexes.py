@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    """pg_trgm extension and GIN name indexes; other backends use the in-process trigram index."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS dormitory_school_name_trgm'
+        ' ON dormitory_school USING GIN (name gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS dormitory_dorm_name_trgm'
+        ' ON dormitory_dorm USING GIN (name gin_trgm_ops)'
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS dormitory_school_name_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS dormitory_dorm_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0062_dorm_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:29
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Dorm = apps.get_model('dormitory', 'Dorm')
+    Review = apps.get_model('dormitory', 'Review')
+    reviews = Review.objects.filter(dorm=OuterRef('pk')).order_by().values('dorm')
+    Dorm.objects.update(
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum('rating')).values('total'), output_field=IntegerField()), 0
+        ),
+        rating_count=Coalesce(
+            Subquery(reviews.annotate(total=Count('id')).values('total'), output_field=IntegerField()), 0
+        ),
+        avg_rating=Coalesce(
+            Subquery(reviews.annotate(average=Avg('rating')).values('average'), output_field=FloatField()), 0.0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0063_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dorm',
+            name='avg_rating',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='dorm',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dorm',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
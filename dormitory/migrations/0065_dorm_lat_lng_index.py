@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0064_dorm_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dorm',
+            index=models.Index(fields=['latitude', 'longitude'], name='dorm_lat_lng_idx'),
+        ),
+    ]
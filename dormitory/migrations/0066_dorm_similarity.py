@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0065_dorm_lat_lng_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DormSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('dorm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='dormitory.dorm')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='dormitory.dorm')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dorm', 'rank'], name='dorm_similarity_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dormsimilarity',
+            constraint=models.UniqueConstraint(fields=('dorm', 'similar'), name='unique_dorm_similarity'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0066_dorm_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DormTrendingScore',
+            fields=[
+                ('dorm', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='dormitory.dorm')),
+                ('score', models.FloatField(default=0)),
+                ('views_seen', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='dorm_trending_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0067_dorm_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DormDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('favorites', models.PositiveIntegerField(default=0)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('dorm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='dormitory.dorm')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='dorm_daily_stats_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dormdailystats',
+            constraint=models.UniqueConstraint(fields=('dorm', 'day'), name='unique_dorm_daily_stats'),
+        ),
+    ]
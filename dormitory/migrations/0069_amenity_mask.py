@@ -0,0 +1,68 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:00
+
+import re
+
+from django.db import migrations, models
+
+# Name keywords per bit as of this migration (bit = position); a frozen copy of
+# dormitory.amenity_bits.AMENITY_VOCABULARY so later vocabulary edits do not
+# change what this backfill writes.
+AMENITY_KEYWORDS = (
+    ('wifi', 'internet'),
+    ('parking',),
+    ('laundry',),
+    ('kitchen',),
+    ('aircon', 'air con'),
+    ('security',),
+    ('pet',),
+    ('study',),
+    ('transport', 'jeep', 'mrt'),
+)
+
+
+def mask_for_name(name):
+    lowered = (name or '').lower()
+    mask = 0
+    for position, keywords in enumerate(AMENITY_KEYWORDS):
+        if any(re.search(r'\b' + re.escape(keyword), lowered) for keyword in keywords):
+            mask |= 1 << position
+    return mask
+
+
+def backfill_model(model, owner_field, amenity_field):
+    masks = {}
+    through = model.amenities.through
+    for owner_id, name in through.objects.values_list(f'{owner_field}_id', f'{amenity_field}__name').iterator():
+        masks[owner_id] = masks.get(owner_id, 0) | mask_for_name(name)
+    by_mask = {}
+    for owner_id, mask in masks.items():
+        if mask:
+            by_mask.setdefault(mask, []).append(owner_id)
+    for mask, owner_ids in by_mask.items():
+        model.objects.filter(pk__in=owner_ids).update(amenity_mask=mask)
+
+
+def backfill_amenity_masks(apps, schema_editor):
+    backfill_model(apps.get_model('dormitory', 'Dorm'), 'dorm', 'amenity')
+    backfill_model(apps.get_model('dormitory', 'RoommatePost'), 'roommatepost', 'roommateamenity')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0068_dorm_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dorm',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='roommatepost',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amenity_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0069_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DormCollaborativeNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('dorm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collaborative_neighbours', to='dormitory.dorm')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collaborative_neighbour_of', to='dormitory.dorm')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dorm', 'rank'], name='dorm_collab_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dormcollaborativeneighbour',
+            constraint=models.UniqueConstraint(fields=('dorm', 'neighbour'), name='unique_dorm_collaborative_neighbour'),
+        ),
+    ]
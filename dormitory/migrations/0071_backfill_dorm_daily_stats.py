@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+# Frozen copy of dormitory.daily_stats.rollup_daily_stats over all history, so
+# the landlord charts have the months before the rollup existed. Views have no
+# dated history (they were a lifetime counter) and start from the first flush.
+ROLLUP_FIELDS = ('favorites', 'reservations', 'messages', 'revenue')
+
+
+def per_dorm_day(queryset, time_field, value, dorm=F('dorm_id')):
+    rows = queryset.annotate(
+        stat_dorm=dorm,
+        stat_day=TruncDate(time_field),
+    ).filter(stat_dorm__isnull=False).values('stat_dorm', 'stat_day').annotate(value=value)
+    return {(row['stat_dorm'], row['stat_day']): row['value'] for row in rows.iterator()}
+
+
+def backfill_daily_stats(apps, schema_editor):
+    Dorm = apps.get_model('dormitory', 'Dorm')
+    DormDailyStats = apps.get_model('dormitory', 'DormDailyStats')
+    FavoriteDorm = apps.get_model('user_profile', 'FavoriteDorm')
+    Message = apps.get_model('dormitory', 'Message')
+    Reservation = apps.get_model('dormitory', 'Reservation')
+    TransactionLog = apps.get_model('dormitory', 'TransactionLog')
+
+    totals = {
+        'favorites': per_dorm_day(FavoriteDorm.objects.all(), 'added_date', Count('id')),
+        'reservations': per_dorm_day(Reservation.objects.all(), 'created_at', Count('id')),
+        'messages': per_dorm_day(Message.objects.all(), 'timestamp', Count('id')),
+        'revenue': per_dorm_day(
+            TransactionLog.objects.filter(
+                transaction_type='payment_received', status='success', amount__isnull=False,
+            ),
+            'created_at', Sum('amount'),
+            dorm=Coalesce('dorm_id', 'reservation__dorm_id'),
+        ),
+    }
+    keys = set()
+    for values in totals.values():
+        keys.update(values)
+    if not keys:
+        return
+    existing_dorms = set(Dorm.objects.filter(id__in={dorm_id for dorm_id, _day in keys}).values_list('id', flat=True))
+
+    def value(field, key):
+        return totals[field].get(key, Decimal('0') if field == 'revenue' else 0)
+
+    existing = {(row.dorm_id, row.day): row for row in DormDailyStats.objects.all()}
+    to_update = []
+    for key, row in existing.items():
+        for field in ROLLUP_FIELDS:
+            setattr(row, field, value(field, key))
+        to_update.append(row)
+    to_create = [
+        DormDailyStats(dorm_id=dorm_id, day=day, **{field: value(field, (dorm_id, day)) for field in ROLLUP_FIELDS})
+        for dorm_id, day in sorted(keys - set(existing), key=lambda key: (key[1], key[0]))
+        if dorm_id in existing_dorms
+    ]
+    DormDailyStats.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=1000)
+    DormDailyStats.objects.bulk_create(to_create, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0070_dorm_collaborative_neighbour'),
+        ('user_profile', '0013_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+import math
+
+import numpy as np
+from django.db import migrations
+
+# Frozen copy of dormitory.similarity as of this migration, so later changes
+# to the scoring do not change what this backfill writes. The
+# rebuild_dorm_similarities command refreshes the table with the current
+# scoring afterwards.
+SIMILAR_DORMS_STORED = 12
+MIN_SIMILARITY_SCORE = 0.3
+PRICE_TOLERANCE = 0.3
+SIMILAR_DISTANCE_KM = 10.0
+EARTH_RADIUS_KM = 6371.0
+WEIGHTS = {
+    'price': 0.35,
+    'accommodation_type': 0.25,
+    'amenities': 0.25,
+    'distance': 0.15,
+}
+CHUNK_SIZE = 500
+
+
+def as_float(value):
+    return float(value) if value is not None else math.nan
+
+
+def distances_km(lats1, lngs1, lats2, lngs2):
+    lat1 = np.radians(lats1)[:, np.newaxis]
+    lon1 = np.radians(lngs1)[:, np.newaxis]
+    lat2 = np.radians(lats2)[np.newaxis, :]
+    lon2 = np.radians(lngs2)[np.newaxis, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def backfill_similarities(apps, schema_editor):
+    Dorm = apps.get_model('dormitory', 'Dorm')
+    DormSimilarity = apps.get_model('dormitory', 'DormSimilarity')
+
+    rows = list(Dorm.objects.order_by('id').values_list(
+        'id', 'price', 'accommodation_type', 'latitude', 'longitude', 'available', 'approval_status',
+    ))
+    if not rows:
+        return
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    positions = {dorm_id: position for position, dorm_id in enumerate(ids.tolist())}
+    prices = np.array([as_float(row[1]) for row in rows], dtype=np.float64)
+    type_codes = {}
+    types = np.array([type_codes.setdefault(row[2], len(type_codes)) for row in rows], dtype=np.int32)
+    lats = np.array([as_float(row[3]) for row in rows], dtype=np.float64)
+    lngs = np.array([as_float(row[4]) for row in rows], dtype=np.float64)
+    listed = np.array([bool(row[5]) and row[6] == 'approved' for row in rows], dtype=bool)
+
+    columns = {}
+    pairs = set()
+    for dorm_id, amenity_id in Dorm.amenities.through.objects.values_list('dorm_id', 'amenity_id').iterator():
+        pairs.add((positions[dorm_id], columns.setdefault(amenity_id, len(columns))))
+    amenities = np.zeros((len(rows), max(len(columns), 1)), dtype=np.float32)
+    for position, column in pairs:
+        amenities[position, column] = 1
+    amenity_counts = amenities.sum(axis=1)
+
+    targets = np.flatnonzero(listed)
+    if not len(targets):
+        return
+    k = min(SIMILAR_DORMS_STORED, len(targets))
+    DormSimilarity.objects.all().delete()
+    for start in range(0, len(rows), CHUNK_SIZE):
+        sources = np.arange(start, min(start + CHUNK_SIZE, len(rows)))
+        source_prices = prices[sources][:, np.newaxis]
+        target_prices = prices[targets][np.newaxis, :]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            relative = np.abs(source_prices - target_prices) / np.maximum(source_prices, target_prices)
+        price = np.nan_to_num(np.clip(1.0 - relative / PRICE_TOLERANCE, 0.0, 1.0))
+        same_type = types[sources][:, np.newaxis] == types[targets][np.newaxis, :]
+        shared = amenities[sources] @ amenities[targets].T
+        union = amenity_counts[sources][:, np.newaxis] + amenity_counts[targets][np.newaxis, :] - shared
+        jaccard = np.divide(shared, union, out=np.zeros_like(shared, dtype=np.float64), where=union > 0)
+        nearby = np.nan_to_num(np.clip(
+            1.0 - distances_km(lats[sources], lngs[sources], lats[targets], lngs[targets]) / SIMILAR_DISTANCE_KM,
+            0.0, 1.0,
+        ))
+        scores = (
+            WEIGHTS['price'] * price
+            + WEIGHTS['accommodation_type'] * same_type
+            + WEIGHTS['amenities'] * jaccard
+            + WEIGHTS['distance'] * nearby
+        )
+        scores[ids[sources][:, np.newaxis] == ids[targets][np.newaxis, :]] = 0.0
+
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        similarities = []
+        for source_id, row_columns, row_scores in zip(ids[sources].tolist(), best, best_scores):
+            keep = row_scores >= MIN_SIMILARITY_SCORE
+            for rank, (similar_id, score) in enumerate(
+                zip(ids[targets][row_columns[keep]].tolist(), row_scores[keep].tolist()), start=1,
+            ):
+                similarities.append(DormSimilarity(dorm_id=source_id, similar_id=similar_id, score=score, rank=rank))
+        DormSimilarity.objects.bulk_create(similarities, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0071_backfill_dorm_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_similarities, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,11 @@
+import math
+
 from django.db import models
 from accounts.models import CustomUser
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
-from django.db.models import Avg
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from math import radians, sin, cos, sqrt, atan2
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -68,9 +68,36 @@ class Dorm(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     key_features = models.TextField(null=True, blank=True, help_text="Short highlights, one per line")
 
+    # Review aggregates, kept in step by the Review signals (see dormitory/ratings.py)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0, db_index=True)
+
+    RATING_FIELDS = ('rating_sum', 'rating_count', 'avg_rating')
+
+    # Vocabulary bits of ``amenities`` (see dormitory/amenity_bits.py), kept in step by signals
+    amenity_mask = models.PositiveIntegerField(default=0, editable=False)
+
+    # Written only with queryset updates; a full save() leaves them alone.
+    DENORMALIZED_FIELDS = RATING_FIELDS + ('amenity_mask',)
+
+    class Meta:
+        indexes = [
+            # Viewport (bounding-box) queries for map panning.
+            models.Index(fields=['latitude', 'longitude'], name='dorm_lat_lng_idx'),
+        ]
+
     def get_average_rating(self):
-        average = self.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-        return round(average, 1) if average else 0
+        return round(self.avg_rating, 1) if self.rating_count else 0
+
+    @property
+    def review_count(self):
+        return self.rating_count
+
+    @property
+    def avg_rating_rounded(self):
+        """Whole-star rating for the star widgets (halves round up)."""
+        return float(math.floor(self.avg_rating + 0.5)) if self.rating_count else 0.0
     # ADD THIS METHOD HERE:
     def is_reservable(self):
         """
@@ -97,48 +124,93 @@ class Dorm(models.Model):
         return f"{self.name} - {self.landlord.username} ({self.landlord.contact_number})"
 
 
-    def associate_nearby_schools(self, max_distance_km=5.0):
-        """Associate schools that are within max_distance_km kilometers of the dorm."""
-        if not self.latitude or not self.longitude:
-            return
-
-        # Clear existing associations to prevent duplicates
-        self.nearby_schools.clear()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_coordinates = (
+            instance.__dict__.get('latitude'),
+            instance.__dict__.get('longitude'),
+        )
+        instance._loaded_values = {
+            field.attname: instance.__dict__[field.attname]
+            for field in cls._meta.concrete_fields if field.attname in instance.__dict__
+        }
+        return instance
 
-        for school in School.objects.all():
-            # Convert coordinates to radians
-            lat1 = radians(float(self.latitude))
-            lon1 = radians(float(self.longitude))
-            lat2 = radians(float(school.latitude))
-            lon2 = radians(float(school.longitude))
+    def fields_changed(self, field_names):
+        """
+        Whether the last ``save()`` wrote a new value to any of ``field_names``.
+        True when that is unknown (an insert, or an instance not loaded from
+        the database).
+        """
+        changed = getattr(self, '_changed_fields', None)
+        return changed is None or not changed.isdisjoint(field_names)
 
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            distance_km = 6371 * c  # Earth's radius is 6371 km
+    def associate_nearby_schools(self, max_distance_km=5.0):
+        """Rebuild this dorm's school distances and its nearby_schools (within max_distance_km)."""
+        from .school_distances import sync_dorm_distances
+        sync_dorm_distances([self.pk], nearby_radius_km=max_distance_km)
 
-            if distance_km <= max_distance_km:
-                self.nearby_schools.add(school)
+    def get_nearest_school(self):
+        """Return the closest DormSchoolDistance row (with its school), or None."""
+        return self.school_distances.select_related('school').order_by('distance_km').first()
 
     def save(self, *args, **kwargs):
-        """Override save to ensure schools are associated whenever a dorm is saved."""
-        super().save(*args, **kwargs)
-        self.associate_nearby_schools()
+        """Recompute school distances only when the coordinates were set or moved."""
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and update_fields is None and not kwargs.get('force_insert'):
+            # Rating aggregates and the amenity mask are only written with
+            # queryset updates (ratings.py, amenity_bits.py); a stale instance
+            # must not clobber them.
+            deferred = self.get_deferred_fields()
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+                and field.attname not in deferred
+            ]
+        loaded = getattr(self, '_loaded_values', None)
+        previous_changed = getattr(self, '_changed_fields', None)
+        written = [
+            field for field in self._meta.concrete_fields
+            if update_fields is None or field.name in update_fields or field.attname in update_fields
+        ]
+        # Read by this save's post_save receivers (see fields_changed); None means "anything may have changed".
+        if self._state.adding or loaded is None:
+            self._changed_fields = None
+        else:
+            self._changed_fields = {
+                field.name for field in written
+                if field.attname not in loaded or loaded[field.attname] != getattr(self, field.attname)
+            }
+        previous = getattr(self, '_loaded_coordinates', None)
+        current = (self.latitude, self.longitude)
+        # Mark as clean before saving so nested saves from post_save receivers skip the rebuild.
+        self._loaded_coordinates = current
+        self._loaded_values = {
+            **(loaded or {}),
+            **{field.attname: getattr(self, field.attname) for field in written if field.attname in self.__dict__},
+        }
+        # Read by post_save receivers that only care about moved coordinates.
+        self._coordinates_moved = previous != current
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self._loaded_coordinates = previous
+            self._loaded_values = loaded
+            raise
+        finally:
+            # A nested save from a post_save receiver must not hide this save's
+            # changes from the receivers that run after it.
+            self._changed_fields = previous_changed
+        if previous != current:
+            self.associate_nearby_schools()
 
 @receiver(post_save, sender=Dorm)
 def update_reservation_count(sender, instance, created, **kwargs):
     if created:
         instance.reservations_count = 0  # Initialize count on creation
         instance.save()
-                
-@receiver(post_save, sender=Dorm)
-def auto_associate_schools(sender, instance, created, **kwargs):
-    """
-    Automatically associate nearby schools when a dorm is saved or updated
-    """
-    instance.associate_nearby_schools()
 
 class DormImage(models.Model):
     dorm = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name="images")
@@ -265,6 +337,8 @@ class RoommatePost(models.Model):
         related_name="roommate_posts",
         help_text="Select your preferred amenities"
     )
+    # Vocabulary bits of ``amenities`` (see dormitory/amenity_bits.py), kept in step by signals
+    amenity_mask = models.PositiveIntegerField(default=0, editable=False)
     description = models.TextField(
         help_text="Describe yourself and what you're looking for in a roommate",
         blank=True
@@ -813,6 +887,13 @@ class Review(models.Model):
     comment = models.TextField(blank=True, default="No comment provided.")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what is currently counted in the dorm's rating aggregates.
+        instance._counted_rating = (instance.__dict__.get('dorm_id'), instance.__dict__.get('rating'))
+        return instance
+
     def __str__(self):
         return f"{self.user.username} - {self.dorm.name} ({self.rating}/5)"
 
@@ -845,6 +926,97 @@ class School(models.Model):
     def __str__(self):
         return self.name
 
+class DormSchoolDistance(models.Model):
+    """Great-circle distance between a dorm and a school, kept for pairs within SCHOOL_DISTANCE_MAX_KM."""
+    dorm = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name='school_distances')
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='dorm_distances')
+    distance_km = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dorm', 'school'], name='unique_dorm_school_distance'),
+        ]
+        indexes = [
+            models.Index(fields=['school', 'distance_km'], name='dorm_school_dist_idx'),
+            models.Index(fields=['dorm', 'distance_km'], name='school_dorm_dist_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dorm.name} → {self.school.name} ({self.distance_km:.2f} km)"
+
+class DormSimilarity(models.Model):
+    """Precomputed item-to-item neighbour: ``similar`` is the ``rank``-th closest listed dorm to ``dorm``."""
+    dorm = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dorm', 'similar'], name='unique_dorm_similarity'),
+        ]
+        indexes = [
+            models.Index(fields=['dorm', 'rank'], name='dorm_similarity_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dorm.name} ~ {self.similar.name} ({self.score:.3f})"
+
+class DormCollaborativeNeighbour(models.Model):
+    """Item-item collaborative filtering neighbour: tenants who engage with ``dorm`` also engage with ``neighbour``."""
+    dorm = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name='collaborative_neighbours')
+    neighbour = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name='collaborative_neighbour_of')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dorm', 'neighbour'], name='unique_dorm_collaborative_neighbour'),
+        ]
+        indexes = [
+            models.Index(fields=['dorm', 'rank'], name='dorm_collab_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dorm.name} ~ {self.neighbour.name} ({self.score:.3f})"
+
+class DormTrendingScore(models.Model):
+    """Exponentially decayed engagement score, advanced by the trending pass."""
+    dorm = models.OneToOneField(Dorm, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0)
+    # Dorm.recent_views already folded into ``score``.
+    views_seen = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='dorm_trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dorm.name}: {self.score:.2f}"
+
+class DormDailyStats(models.Model):
+    """Per-dorm, per-day activity rollup for landlord analytics."""
+    dorm = models.ForeignKey(Dorm, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    favorites = models.PositiveIntegerField(default=0)
+    reservations = models.PositiveIntegerField(default=0)
+    messages = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dorm', 'day'], name='unique_dorm_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='dorm_daily_stats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dorm.name} {self.day}"
+
 class RoommateMatch(models.Model):
     initiator = models.ForeignKey(RoommatePost, on_delete=models.CASCADE, related_name='initiated_matches')
     target = models.ForeignKey(RoommatePost, on_delete=models.CASCADE, related_name='received_matches')
@@ -0,0 +1,88 @@
+"""
+Nearest-first ordering for dorm lists.
+
+A scikit-learn ``BallTree`` with the haversine metric is built over listed
+(approved, available) dorms and kept warm in process. ``sort=distance``
+asks it for the dorms around the searched point, already in distance order,
+and the list views narrow and order their queryset by the result instead of
+computing a distance for every row. The tree is rebuilt when the listed
+dorm locations version (shared with the cluster index) moves.
+"""
+
+import numpy as np
+from django.db.models import Case, FloatField, Value, When
+from sklearn.neighbors import BallTree
+
+from .clusters import DORM_CLUSTERS_VERSION
+from .geo import EARTH_RADIUS_KM
+from .versioning import VersionedValue
+
+# Nearest-first lists stop after this many dorms.
+NEAREST_RESULT_LIMIT = 500
+
+
+class DormBallTree:
+    """Lazily built BallTree over listed dorm coordinates."""
+
+    def __init__(self):
+        self._tree = VersionedValue('dorm BallTree', self._build, DORM_CLUSTERS_VERSION)
+
+    def _build(self):
+        from .models import Dorm
+
+        rows = list(
+            Dorm.objects.filter(
+                available=True,
+                approval_status='approved',
+                latitude__isnull=False,
+                longitude__isnull=False,
+            ).values_list('id', 'latitude', 'longitude')
+        )
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        if not rows:
+            return None, ids
+        points = np.radians(np.array([(float(lat), float(lng)) for _id, lat, lng in rows], dtype=np.float64))
+        return BallTree(points, metric='haversine'), ids
+
+    def _current(self):
+        return self._tree.get()
+
+    def reset(self):
+        self._tree.reset()
+
+    def nearest(self, lat, lng, k=NEAREST_RESULT_LIMIT, radius_km=None):
+        """Return [(dorm_id, distance_km)] nearest first, at most ``k``, optionally within ``radius_km``."""
+        tree, ids = self._current()
+        if tree is None:
+            return []
+        point = np.radians([[float(lat), float(lng)]])
+        if radius_km is None:
+            distances, indices = tree.query(point, k=min(k, len(ids)))
+            distances, indices = distances[0], indices[0]
+        else:
+            indices, distances = tree.query_radius(
+                point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True,
+            )
+            indices, distances = indices[0][:k], distances[0][:k]
+        return [
+            (int(ids[index]), float(distance * EARTH_RADIUS_KM))
+            for index, distance in zip(indices, distances)
+        ]
+
+
+dorm_ball_tree = DormBallTree()
+
+
+def annotate_distance(queryset, lat, lng, radius_km=None, limit=NEAREST_RESULT_LIMIT):
+    """
+    Narrow a Dorm ``queryset`` to the ``limit`` dorms nearest to (lat, lng)
+    and annotate ``distance_km``; order with ``order_by('distance_km', 'id')``.
+    """
+    neighbours = dorm_ball_tree.nearest(lat, lng, k=limit, radius_km=radius_km)
+    if not neighbours:
+        return queryset.none().annotate(distance_km=Value(None, output_field=FloatField()))
+    distance = Case(
+        *[When(id=dorm_id, then=Value(km)) for dorm_id, km in neighbours],
+        output_field=FloatField(),
+    )
+    return queryset.filter(id__in=[dorm_id for dorm_id, _km in neighbours]).annotate(distance_km=distance)
@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination for dorm listings.
+
+Pages are addressed by the last row's ``(sort_key, id)`` instead of an
+OFFSET, so page N costs the same as page 1 and results do not shift when
+rows are inserted ahead of the cursor. Cursors are opaque URL-safe tokens.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Coalesce
+
+# sort param -> (key expression or field, descending)
+DORM_LIST_SORTS = {
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'rating': ('avg_rating', True),
+    'newest': ('id', True),
+}
+DEFAULT_SORT = 'newest'
+
+# Dorms matched only by school/fuzzy name have no rank; they sort after ranked hits.
+UNRANKED = -1e9
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key_value, row_id):
+    if isinstance(key_value, Decimal):
+        key_value = str(key_value)
+    payload = json.dumps([key_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return key_value, int(row_id)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str | None
+    page_size: int
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_sort(queryset, sort):
+    """
+    Return (queryset, key_name, descending) for a listing ``sort`` param.
+    Relevance sorts key on the ``search_rank`` annotation and distance sorts
+    on ``distance_km`` (see nearest.annotate_distance) when present.
+    """
+    if sort == 'distance' and 'distance_km' in queryset.query.annotations:
+        return queryset, 'distance_km', False
+    if sort == 'relevance' and 'search_rank' in queryset.query.annotations:
+        queryset = queryset.annotate(
+            keyset_rank=Coalesce(F('search_rank'), Value(UNRANKED), output_field=FloatField())
+        )
+        return queryset, 'keyset_rank', True
+    key_name, descending = DORM_LIST_SORTS.get(sort, DORM_LIST_SORTS[DEFAULT_SORT])
+    return queryset, key_name, descending
+
+
+def paginate_keyset(queryset, key_name, descending, page_size, cursor=None):
+    """Fetch one page ordered by ``(key_name, id)`` starting after ``cursor``."""
+    if cursor:
+        key_value, row_id = decode_cursor(cursor)
+        after = 'lt' if descending else 'gt'
+        if key_name == 'id':
+            queryset = queryset.filter(**{f'id__{after}': row_id})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{key_name}__{after}': key_value}) |
+                Q(**{key_name: key_value, f'id__{after}': row_id})
+            )
+
+    direction = '-' if descending else ''
+    ordering = [f'{direction}id'] if key_name == 'id' else [f'{direction}{key_name}', f'{direction}id']
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, key_name), last.id)
+    return KeysetPage(rows, next_cursor, page_size)
+
+
+def capped_count(queryset, cap):
+    """
+    Count matching rows, stopping at ``cap``. Returns (count, capped) where
+    ``capped`` means there are more than ``cap`` results.
+    """
+    count = queryset.order_by().values('pk')[:cap + 1].count()
+    return min(count, cap), count > cap
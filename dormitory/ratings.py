@@ -0,0 +1,54 @@
+"""
+Denormalized review aggregates on Dorm.
+
+``rating_sum``/``rating_count`` change through single UPDATE statements with
+F() expressions, so concurrent reviews never lose an increment, and
+``avg_rating`` is derived in the same statement. ``recompute_dorm_ratings``
+rebuilds the columns from the Review table when they drift (bulk updates,
+raw SQL, restores).
+"""
+
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef,
+    Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Dorm, Review
+
+
+def apply_rating_delta(dorm_id, sum_delta, count_delta):
+    """Atomically add ``sum_delta``/``count_delta`` to a dorm's aggregates."""
+    if dorm_id is None or (sum_delta == 0 and count_delta == 0):
+        return
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('rating_count') + count_delta
+    Dorm.objects.filter(pk=dorm_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        avg_rating=Case(
+            When(rating_count=-count_delta, then=Value(0.0)),
+            default=ExpressionWrapper(Cast(new_sum, FloatField()) / new_count, output_field=FloatField()),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def recompute_dorm_ratings(dorm_ids=None):
+    """Rebuild the aggregates from Review rows; returns the number of dorms updated."""
+    reviews = Review.objects.filter(dorm=OuterRef('pk')).order_by().values('dorm')
+    dorms = Dorm.objects.all() if dorm_ids is None else Dorm.objects.filter(pk__in=dorm_ids)
+    return dorms.update(
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum('rating')).values('total'), output_field=IntegerField()),
+            0,
+        ),
+        rating_count=Coalesce(
+            Subquery(reviews.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+            0,
+        ),
+        avg_rating=Coalesce(
+            Subquery(reviews.annotate(average=Avg('rating')).values('average'), output_field=FloatField()),
+            0.0,
+        ),
+    )
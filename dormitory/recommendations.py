@@ -0,0 +1,166 @@
+"""
+Persisted nearest-neighbour model for tenant dashboard recommendations.
+
+``train_recommender`` fits a ``StandardScaler`` and a ``NearestNeighbors``
+index over listed dorms (price, rating, amenity count, coordinates) and
+saves them with the dorm id map to ``RECOMMENDER_MODEL_PATH`` with joblib.
+Web workers load the file lazily and reload it when its modification stamp
+changes, so a request only runs ``kneighbors`` against the fitted index.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from .models import Dorm
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ('price', 'avg_rating', 'amenity_count', 'latitude', 'longitude')
+# Neighbours fetched per requested one before filtering to the candidates.
+NEIGHBOUR_OVERFETCH = 4
+
+
+def model_path():
+    return Path(getattr(settings, 'RECOMMENDER_MODEL_PATH', Path(settings.BASE_DIR) / 'ml_models' / 'dorm_recommender.joblib'))
+
+
+def dorm_feature_rows():
+    """(dorm ids, raw feature matrix) for listed dorms, in id order."""
+    rows = Dorm.objects.filter(
+        available=True,
+        approval_status='approved',
+    ).annotate(
+        amenity_count=Count('amenities'),
+    ).order_by('id').values_list('id', 'price', 'avg_rating', 'amenity_count', 'latitude', 'longitude')
+    dorm_ids = []
+    features = []
+    for dorm_id, price, avg_rating, amenity_count, lat, lng in rows.iterator():
+        dorm_ids.append(dorm_id)
+        features.append([float(price), float(avg_rating or 0), amenity_count, float(lat or 0), float(lng or 0)])
+    return np.array(dorm_ids, dtype=np.int64), np.array(features, dtype=np.float64).reshape(-1, len(FEATURES))
+
+
+def train_model():
+    """Fit the scaler and neighbour index over the current listings; returns the model bundle."""
+    dorm_ids, features = dorm_feature_rows()
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features) if len(dorm_ids) else features
+    index = None
+    if len(dorm_ids):
+        index = NearestNeighbors(metric='euclidean')
+        index.fit(scaled)
+    return {
+        'feature_names': FEATURES,
+        'scaler': scaler,
+        'index': index,
+        'dorm_ids': dorm_ids,
+        'scaled': scaled,
+        'trained_at': time.time(),
+    }
+
+
+def save_model(bundle, path=None):
+    """Write ``bundle`` with joblib, replacing the previous file atomically."""
+    path = Path(path or model_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(handle)
+    try:
+        joblib.dump(bundle, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+
+class DormRecommender:
+    """Lazily loaded model bundle, reloaded when the file on disk changes."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._positions = None
+        self._stamp = None
+        self._missing_logged = False
+
+    def model_stamp(self):
+        """``(mtime_ns, size)`` of the model file, or None when there is none."""
+        try:
+            stat = os.stat(self._path or model_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _current(self):
+        stamp = self.model_stamp()
+        if stamp == self._stamp:
+            return self._bundle, self._positions
+        with self._lock:
+            if stamp != self._stamp:
+                if stamp is None:
+                    self._bundle, self._positions = None, None
+                    if not self._missing_logged:
+                        logger.warning("No recommender model at %s; run train_recommender", self._path or model_path())
+                        self._missing_logged = True
+                else:
+                    self._bundle = joblib.load(self._path or model_path())
+                    self._positions = {
+                        dorm_id: position for position, dorm_id in enumerate(self._bundle['dorm_ids'].tolist())
+                    }
+                    self._missing_logged = False
+                    logger.info("Loaded recommender model: %s dorms", len(self._positions))
+                self._stamp = stamp
+            return self._bundle, self._positions
+
+    def reset(self):
+        with self._lock:
+            self._bundle = None
+            self._positions = None
+            self._stamp = None
+
+    def neighbours(self, dorm_ids, k=6, candidates=None):
+        """
+        Up to ``k`` dorm ids closest to the mean of ``dorm_ids`` in feature
+        space, excluding ``dorm_ids`` and anything outside ``candidates``.
+        """
+        bundle, positions = self._current()
+        if bundle is None or bundle['index'] is None:
+            return []
+        rows = [positions[dorm_id] for dorm_id in dorm_ids if dorm_id in positions]
+        if not rows:
+            return []
+        query = bundle['scaled'][rows].mean(axis=0).reshape(1, -1)
+        exclude = set(dorm_ids)
+        if candidates is not None:
+            candidates = set(candidates) - exclude
+            if not candidates:
+                return []
+        # Over-fetch from the index, then widen the search until k neighbours
+        # survive the filters: with narrow preferences a small neighbour pool
+        # can miss every candidate.
+        n_neighbors = min(max(k * NEIGHBOUR_OVERFETCH, k + len(exclude)), len(positions))
+        while True:
+            _distances, indices = bundle['index'].kneighbors(query, n_neighbors=n_neighbors)
+            found = [
+                dorm_id for dorm_id in bundle['dorm_ids'][indices[0]].tolist()
+                if dorm_id not in exclude and (candidates is None or dorm_id in candidates)
+            ]
+            if len(found) >= k or n_neighbors == len(positions):
+                return found[:k]
+            n_neighbors = min(n_neighbors * 2, len(positions))
+
+
+dorm_recommender = DormRecommender()
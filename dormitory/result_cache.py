@@ -0,0 +1,62 @@
+"""
+Cached result ids for the public dorm browse page.
+
+Popular filter combinations are answered from a short-lived cache of the
+ordered dorm ids, keyed by the normalized query signature (the known filter
+parameters and the sort; not the page or unrelated parameters) and the
+``dorm_results`` version. The view then hydrates only the ids of the
+requested page. Dorm, Review, PaymentConfiguration, School
+and amenity writes bump the version, so a cached order never outlives the
+rows it was built from. Commands run in their own process, so when the
+cache is per-process their bumps do not reach the web workers; there the
+``RESULT_CACHE_TIMEOUT`` expiry bounds how stale an order can be.
+"""
+
+import logging
+
+from django.core.cache import cache
+
+from .facets import FILTER_PARAMS, filter_signature
+from .versioning import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+DORM_RESULTS_VERSION = 'dorm_results'
+RESULT_CACHE_TIMEOUT = 60
+# Query parameters that decide the ordered result (paging picks a slice of it).
+RESULT_PARAMS = FILTER_PARAMS | {'sort'}
+
+
+class DormResultCache:
+    """Ordered result ids per (scope, catalog version, query signature)."""
+
+    def key_for(self, params, scope):
+        version = get_version(DORM_RESULTS_VERSION)
+        return f'dorm_results:{scope}:{version}:{filter_signature(params, RESULT_PARAMS)}'
+
+    def ids_for(self, queryset, params, scope):
+        """The ordered ids of ``queryset``, cached for the request's filters and sort."""
+        key = self.key_for(params, scope)
+        dorm_ids = cache.get(key)
+        if dorm_ids is None:
+            seen = set()
+            dorm_ids = []
+            # DISTINCT with an ordering on joined columns can repeat an id.
+            for dorm_id in queryset.values_list('id', flat=True).iterator():
+                if dorm_id not in seen:
+                    seen.add(dorm_id)
+                    dorm_ids.append(dorm_id)
+            cache.set(key, dorm_ids, RESULT_CACHE_TIMEOUT)
+        return dorm_ids
+
+    def invalidate(self):
+        bump_version(DORM_RESULTS_VERSION)
+
+
+dorm_results = DormResultCache()
+
+
+def hydrate(queryset, dorm_ids):
+    """Rows of ``queryset`` for ``dorm_ids``, in that order (ids no longer matching are dropped)."""
+    rows = {dorm.id: dorm for dorm in queryset.filter(id__in=list(dorm_ids))}
+    return [rows[dorm_id] for dorm_id in dorm_ids if dorm_id in rows]
@@ -0,0 +1,136 @@
+"""
+Precomputed dorm <-> school distances.
+
+``DormSchoolDistance`` holds the great-circle distance for every dorm/school
+pair within ``SCHOOL_DISTANCE_MAX_KM``. Rows are rebuilt in one vectorized
+pass when a dorm or school moves, and the ``nearby_schools`` M2M is written
+from the same matrix so existing readers keep working.
+"""
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .geo import haversine_matrix
+from .models import Dorm, DormSchoolDistance, School
+
+logger = logging.getLogger(__name__)
+
+NEARBY_SCHOOL_RADIUS_KM = 5.0
+
+
+def max_distance_km():
+    return float(getattr(settings, 'SCHOOL_DISTANCE_MAX_KM', 20.0))
+
+
+def distance_pairs(dorm_rows, school_rows, limit_km):
+    """
+    Return (dorm_id, school_id, distance_km) for every pair within ``limit_km``.
+    Both inputs are sequences of (id, latitude, longitude).
+    """
+    if not dorm_rows or not school_rows:
+        return []
+    dorm_ids, dorm_lats, dorm_lngs = zip(*dorm_rows)
+    school_ids, school_lats, school_lngs = zip(*school_rows)
+    distances = haversine_matrix(dorm_lats, dorm_lngs, school_lats, school_lngs)
+    rows, cols = np.nonzero(distances <= limit_km)
+    return [
+        (dorm_ids[row], school_ids[col], float(distances[row, col]))
+        for row, col in zip(rows.tolist(), cols.tolist())
+    ]
+
+
+def write_pairs(pairs, scope, nearby_radius_km=NEARBY_SCHOOL_RADIUS_KM, batch_size=1000):
+    """
+    Replace the distance rows and nearby_schools links matching ``scope``
+    (e.g. ``{'dorm_id__in': [...]}``) with ``pairs``.
+    """
+    NearbySchool = Dorm.nearby_schools.through
+    with transaction.atomic():
+        DormSchoolDistance.objects.filter(**scope).delete()
+        NearbySchool.objects.filter(**scope).delete()
+        DormSchoolDistance.objects.bulk_create(
+            [
+                DormSchoolDistance(dorm_id=dorm_id, school_id=school_id, distance_km=distance)
+                for dorm_id, school_id, distance in pairs
+            ],
+            batch_size=batch_size,
+        )
+        NearbySchool.objects.bulk_create(
+            [
+                NearbySchool(dorm_id=dorm_id, school_id=school_id)
+                for dorm_id, school_id, distance in pairs
+                if distance <= nearby_radius_km
+            ],
+            batch_size=batch_size,
+        )
+
+
+def sync_dorm_distances(dorm_ids, nearby_radius_km=NEARBY_SCHOOL_RADIUS_KM):
+    """Recompute distances for the given dorms against every school."""
+    dorm_ids = [dorm_id for dorm_id in dorm_ids if dorm_id is not None]
+    if not dorm_ids:
+        return 0
+    dorm_rows = list(
+        Dorm.objects.filter(id__in=dorm_ids, latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    school_rows = list(School.objects.values_list('id', 'latitude', 'longitude'))
+    pairs = distance_pairs(dorm_rows, school_rows, max(max_distance_km(), nearby_radius_km))
+    write_pairs(pairs, {'dorm_id__in': dorm_ids}, nearby_radius_km)
+    return len(pairs)
+
+
+def sync_school_distances(school_id, nearby_radius_km=NEARBY_SCHOOL_RADIUS_KM):
+    """Recompute distances for one school against every located dorm."""
+    school_rows = list(School.objects.filter(id=school_id).values_list('id', 'latitude', 'longitude'))
+    dorm_rows = list(
+        Dorm.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    pairs = distance_pairs(dorm_rows, school_rows, max(max_distance_km(), nearby_radius_km))
+    write_pairs(pairs, {'school_id': school_id}, nearby_radius_km)
+    logger.info("Recomputed %s dorm distances for school %s", len(pairs), school_id)
+    return len(pairs)
+
+
+def dorms_near_schools(queryset, school_ids, radius_km=NEARBY_SCHOOL_RADIUS_KM):
+    """
+    Narrow a Dorm queryset to dorms within ``radius_km`` of any of ``school_ids``.
+
+    The closest matching campus is annotated as ``nearest_school_id``,
+    ``nearest_school_name`` and ``nearest_school_km`` through correlated
+    subqueries on the (dorm, distance_km) index, so the filter and the
+    annotation stay a single query however many schools are given.
+    ``radius_km`` is capped at ``SCHOOL_DISTANCE_MAX_KM``; no rows are kept
+    beyond it.
+    """
+    radius_km = min(float(radius_km), max_distance_km())
+    matches = DormSchoolDistance.objects.filter(
+        dorm=OuterRef('pk'),
+        school_id__in=list(school_ids),
+        distance_km__lte=radius_km,
+    ).order_by('distance_km', 'school_id')
+    return queryset.annotate(
+        nearest_school_id=Subquery(matches.values('school_id')[:1]),
+        nearest_school_name=Subquery(matches.values('school__name')[:1]),
+        nearest_school_km=Subquery(matches.values('distance_km')[:1]),
+    ).filter(nearest_school_km__isnull=False)
+
+
+def annotate_nearest_school(queryset):
+    """
+    Annotate ``nearest_school_name`` and ``nearest_school_km`` onto a Dorm
+    queryset, unless ``dorms_near_schools`` already annotated the nearest
+    matching campus.
+    """
+    if 'nearest_school_km' in queryset.query.annotations:
+        return queryset
+    nearest = DormSchoolDistance.objects.filter(dorm=OuterRef('pk')).order_by('distance_km')
+    return queryset.annotate(
+        nearest_school_name=Subquery(nearest.values('school__name')[:1]),
+        nearest_school_km=Subquery(nearest.values('distance_km')[:1]),
+    )
@@ -0,0 +1,218 @@
+"""
+Ranked full-text search over dorms.
+
+Each dorm has one search document built from its name, address,
+description and nearby schools. Where the document lives depends on the
+database:
+
+* PostgreSQL: ``dormitory_dorm_search`` holds a weighted ``tsvector`` with a
+  GIN index, ranked with ``ts_rank_cd``.
+* SQLite: ``dormitory_dorm_fts`` is an FTS5 table keyed by dorm id, ranked
+  with ``bm25``.
+
+Both tables are created by migration 0062.
+
+Any other backend (or an SQLite build without FTS5) falls back to the old
+``icontains`` filters. Documents are refreshed from signals on Dorm/School
+writes; ``rebuild_search_index`` rebuilds everything.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import DormSchoolDistance
+from .school_distances import NEARBY_SCHOOL_RADIUS_KM
+
+POSTGRES_TABLE = 'dormitory_dorm_search'
+SQLITE_TABLE = 'dormitory_dorm_fts'
+POSTGRES_CONFIG = 'english'
+
+# Fields whose change means the search document must be rebuilt
+# (coordinates decide which schools are nearby).
+SEARCH_FIELDS = frozenset({'name', 'address', 'description', 'latitude', 'longitude'})
+
+# Column weights for bm25 (name, address, description, schools); higher wins.
+SQLITE_WEIGHTS = (10.0, 4.0, 1.0, 4.0)
+
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+_backend_by_alias = {}
+
+
+# --- Backend ----------------------------------------------------------------
+
+def search_backend(using=None):
+    """Return 'postgresql', 'sqlite' or None when no search table is available."""
+    conn = using or connection
+    if conn.alias not in _backend_by_alias:
+        table = {'postgresql': POSTGRES_TABLE, 'sqlite': SQLITE_TABLE}.get(conn.vendor)
+        available = False
+        if table:
+            with conn.cursor() as cursor:
+                available = table in conn.introspection.table_names(cursor)
+        _backend_by_alias[conn.alias] = conn.vendor if available else None
+    return _backend_by_alias[conn.alias]
+
+
+# --- Maintenance ------------------------------------------------------------
+
+_SCHOOL_TEXT_SQL = {
+    'postgresql': (
+        "(SELECT string_agg(s.name || ' ' || s.address, ' ')"
+        " FROM dormitory_dorm_nearby_schools ns JOIN dormitory_school s ON s.id = ns.school_id"
+        " WHERE ns.dorm_id = d.id)"
+    ),
+    'sqlite': (
+        "(SELECT group_concat(s.name || ' ' || s.address, ' ')"
+        " FROM dormitory_dorm_nearby_schools ns JOIN dormitory_school s ON s.id = ns.school_id"
+        " WHERE ns.dorm_id = d.id)"
+    ),
+}
+
+
+def _id_filter(dorm_ids, column):
+    if dorm_ids is None:
+        return '', []
+    return f' WHERE {column} IN ({", ".join(["%s"] * len(dorm_ids))})', list(dorm_ids)
+
+
+def reindex_dorms(dorm_ids=None, using=None, batch_size=500):
+    """Rebuild search documents for ``dorm_ids`` (all dorms when None)."""
+    conn = using or connection
+    backend = search_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        if dorm_ids is None:
+            _write_documents(cursor, backend, None)
+            return
+        dorm_ids = sorted({dorm_id for dorm_id in dorm_ids if dorm_id is not None})
+        for start in range(0, len(dorm_ids), batch_size):
+            _write_documents(cursor, backend, dorm_ids[start:start + batch_size])
+
+
+def _write_documents(cursor, backend, dorm_ids):
+    schools_sql = _SCHOOL_TEXT_SQL[backend]
+    if backend == 'postgresql':
+        where, params = _id_filter(dorm_ids, 'dorm_id')
+        cursor.execute(f'DELETE FROM {POSTGRES_TABLE}{where}', params)
+        where, params = _id_filter(dorm_ids, 'd.id')
+        cursor.execute(
+            f'INSERT INTO {POSTGRES_TABLE} (dorm_id, document)'
+            f" SELECT d.id,"
+            f" setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce(d.name, '')), 'A') ||"
+            f" setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce({schools_sql}, '')), 'B') ||"
+            f" setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce(d.address, '')), 'B') ||"
+            f" setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce(d.description, '')), 'C')"
+            f' FROM dormitory_dorm d{where}',
+            params,
+        )
+    else:
+        where, params = _id_filter(dorm_ids, 'rowid')
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE}{where}', params)
+        where, params = _id_filter(dorm_ids, 'd.id')
+        cursor.execute(
+            f'INSERT INTO {SQLITE_TABLE} (rowid, name, address, description, schools)'
+            f" SELECT d.id, d.name, d.address, d.description, coalesce({schools_sql}, '')"
+            f' FROM dormitory_dorm d{where}',
+            params,
+        )
+
+
+def remove_dorms(dorm_ids, using=None):
+    conn = using or connection
+    backend = search_backend(conn)
+    dorm_ids = [dorm_id for dorm_id in dorm_ids if dorm_id is not None]
+    if backend is None or not dorm_ids:
+        return
+    table, column = (POSTGRES_TABLE, 'dorm_id') if backend == 'postgresql' else (SQLITE_TABLE, 'rowid')
+    where, params = _id_filter(dorm_ids, column)
+    with conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}{where}', params)
+
+
+# --- Querying ---------------------------------------------------------------
+
+def query_tokens(query):
+    return [token.lower() for token in _TOKEN_RE.findall(query or '')]
+
+
+def _match_sql(backend, tokens):
+    """Return (match_sql, rank_sql, param) for a prefix AND query over ``tokens``."""
+    if backend == 'postgresql':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        match = (
+            f'SELECT dorm_id FROM {POSTGRES_TABLE}'
+            f" WHERE document @@ to_tsquery('{POSTGRES_CONFIG}', %s)"
+        )
+        rank = (
+            f"SELECT ts_rank_cd(document, to_tsquery('{POSTGRES_CONFIG}', %s))"
+            f' FROM {POSTGRES_TABLE} WHERE dorm_id = dormitory_dorm.id'
+        )
+        return match, rank, tsquery
+
+    fts_query = ' '.join(f'"{token}"*' for token in tokens)
+    weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+    match = f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s'
+    # bm25() is lower-is-better; negate it so every backend ranks descending.
+    rank = (
+        f'SELECT -bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE}'
+        f' WHERE {SQLITE_TABLE} MATCH %s AND rowid = dormitory_dorm.id'
+    )
+    return match, rank, fts_query
+
+
+def _icontains_filter(query):
+    return (
+        Q(name__icontains=query) |
+        Q(address__icontains=query) |
+        Q(description__icontains=query) |
+        Q(id__in=DormSchoolDistance.objects.filter(
+            distance_km__lte=NEARBY_SCHOOL_RADIUS_KM,
+        ).filter(
+            Q(school__name__icontains=query) | Q(school__address__icontains=query)
+        ).values('dorm_id'))
+    )
+
+
+def search_dorms(query, queryset, school_ids=None, dorm_ids=None):
+    """
+    Narrow a Dorm ``queryset`` to matches for ``query`` and annotate
+    ``search_rank`` (higher is better, NULL for dorms matched only through
+    ``school_ids``/``dorm_ids``). Dorms near any of ``school_ids`` also match,
+    which is how campus acronyms like "UST" resolve; ``dorm_ids`` carries
+    fuzzy name matches for misspelled queries.
+    """
+    tokens = query_tokens(query)
+    backend = search_backend()
+
+    if backend is None or not tokens:
+        filters = _icontains_filter(query)
+        rank = None
+    else:
+        match_sql, rank_sql, param = _match_sql(backend, tokens)
+        filters = Q(id__in=RawSQL(match_sql, [param]))
+        rank = RawSQL(rank_sql, [param], output_field=FloatField())
+
+    if school_ids:
+        filters |= Q(id__in=DormSchoolDistance.objects.filter(
+            school_id__in=school_ids,
+            distance_km__lte=NEARBY_SCHOOL_RADIUS_KM,
+        ).values('dorm_id'))
+
+    if dorm_ids:
+        filters |= Q(id__in=dorm_ids)
+
+    queryset = queryset.filter(filters)
+    if rank is not None:
+        queryset = queryset.annotate(search_rank=rank)
+    return queryset
+
+
+def order_by_relevance(queryset, *fallback):
+    """Order a ``search_dorms`` result by rank, then by ``fallback`` fields."""
+    if 'search_rank' not in queryset.query.annotations:
+        return queryset.order_by(*fallback)
+    return queryset.order_by(F('search_rank').desc(nulls_last=True), *fallback)
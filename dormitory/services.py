@@ -1,4 +1,5 @@
 from decimal import Decimal
+from django.db.models import prefetch_related_objects
 from .models import RoommatePost, RoommateMatch
 import logging
 
@@ -59,6 +60,8 @@ class RoommateMatchingService:
         post2_amenities = set(post2.amenities.all())
         common_amenities_count = 0
         
+        # Roommate amenities are user-created ("Gym", "Quiet"), mostly outside the
+        # amenity vocabulary, so they are compared as sets rather than masks.
         if post1_amenities and post2_amenities:  # Only if both have amenities
             common_amenities = post1_amenities.intersection(post2_amenities)
             all_amenities = post1_amenities.union(post2_amenities)
@@ -136,7 +139,8 @@ class RoommateMatchingService:
             received_matches__initiator=post
         ).exclude(
             initiated_matches__target=post
-        )
+        ).prefetch_related('amenities')
+        prefetch_related_objects([post], 'amenities')
         
         for potential_match in potential_matches:
             score, factors = RoommateMatchingService.calculate_compatibility(post, potential_match)
@@ -1,7 +1,22 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Dorm, PaymentConfiguration
-from accounts.models import Notification  # Import Notification model
+from .amenity_bits import mask_for_name, sync_amenity_masks
+from .clusters import dorm_cluster_index
+from .facets import dorm_facets
+from .result_cache import dorm_results
+from .map_data import MAP_DORM_FIELDS, map_data
+from .models import (
+    Amenity, Dorm, DormImage, DormSimilarity, PaymentConfiguration, Review, RoommateAmenity, RoommatePost, School,
+)
+from .ratings import apply_rating_delta, recompute_dorm_ratings
+from .school_distances import sync_school_distances
+from .similarity import SIMILARITY_FIELDS, schedule_similarity_refresh
+from .search import SEARCH_FIELDS, reindex_dorms, remove_dorms
+from .trigram import dorm_name_index, school_name_index
+from .spatial_index import dorm_spatial_index
+from accounts.models import CustomUser, Notification  # Import Notification model
 
 
 @receiver(post_save, sender=Dorm)
@@ -26,3 +41,255 @@ def dorm_approval_notification(sender, instance, created, **kwargs):
                 message=f"Your dorm '{instance.name}' has been approved!",
                 related_object_id=instance.id,  # Ensure you store dorm ID for linking
             )
+
+
+@receiver(post_save, sender=Dorm)
+def update_dorm_spatial_index(sender, instance, created, **kwargs):
+    """Move the dorm's point in the spatial index once the write is committed."""
+    if not created and not getattr(instance, '_coordinates_moved', True):
+        # Same check Dorm.save uses for school distances: untouched coordinates
+        # must not bump the version and force every worker to rebuild the grid.
+        return
+    dorm_id, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    transaction.on_commit(lambda: dorm_spatial_index.update_dorm(dorm_id, latitude, longitude))
+
+
+@receiver(post_delete, sender=Dorm)
+def remove_dorm_from_spatial_index(sender, instance, **kwargs):
+    dorm_id = instance.pk
+    transaction.on_commit(lambda: dorm_spatial_index.discard(dorm_id))
+
+
+# Fields that decide whether and where a dorm appears in map clusters.
+DORM_CLUSTER_FIELDS = frozenset({'latitude', 'longitude', 'available', 'approval_status'})
+
+
+@receiver(post_save, sender=Dorm)
+def update_dorm_clusters(sender, instance, **kwargs):
+    if not instance.fields_changed(DORM_CLUSTER_FIELDS):
+        return
+    dorm_id, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    listed = instance.available and instance.approval_status == 'approved'
+    transaction.on_commit(lambda: dorm_cluster_index.update_dorm(dorm_id, latitude, longitude, listed))
+
+
+@receiver(post_delete, sender=Dorm)
+def remove_dorm_from_clusters(sender, instance, **kwargs):
+    dorm_id = instance.pk
+    transaction.on_commit(lambda: dorm_cluster_index.discard(dorm_id))
+
+
+@receiver(post_save, sender=Dorm)
+def refresh_similar_dorms(sender, instance, **kwargs):
+    if not instance.fields_changed(SIMILARITY_FIELDS):
+        return
+    schedule_similarity_refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=Dorm)
+def refresh_similar_dorms_on_delete(sender, instance, **kwargs):
+    """Rows pointing at the dorm cascade; the lists that held it need a replacement."""
+    schedule_similarity_refresh(DormSimilarity.objects.filter(similar=instance).values_list('dorm_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Dorm.amenities.through)
+def refresh_similar_dorms_on_amenities(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    schedule_similarity_refresh(list(pk_set or ()) if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=School)
+def update_school_distances(sender, instance, **kwargs):
+    """Recompute the school's distances to every dorm, then refresh affected search documents."""
+    school_id = instance.pk
+
+    def rebuild():
+        NearbySchool = Dorm.nearby_schools.through
+        before = set(NearbySchool.objects.filter(school_id=school_id).values_list('dorm_id', flat=True))
+        sync_school_distances(school_id)
+        after = set(NearbySchool.objects.filter(school_id=school_id).values_list('dorm_id', flat=True))
+        reindex_dorms(before | after)
+        dorm_facets.invalidate()
+
+    transaction.on_commit(rebuild)
+
+
+@receiver(pre_delete, sender=School)
+def reindex_dorms_near_deleted_school(sender, instance, **kwargs):
+    """Distance rows cascade with the school; the nearby dorms' search text must drop it."""
+    dorm_ids = list(instance.nearby_dorms.values_list('id', flat=True))
+    transaction.on_commit(lambda: reindex_dorms(dorm_ids))
+    transaction.on_commit(dorm_facets.invalidate)
+
+
+@receiver(post_save, sender=Dorm)
+def update_dorm_search_document(sender, instance, **kwargs):
+    if not instance.fields_changed(SEARCH_FIELDS):
+        return
+    dorm_id = instance.pk
+    transaction.on_commit(lambda: reindex_dorms([dorm_id]))
+
+
+@receiver(post_delete, sender=Dorm)
+def remove_dorm_search_document(sender, instance, **kwargs):
+    dorm_id = instance.pk
+    transaction.on_commit(lambda: remove_dorms([dorm_id]))
+
+
+# Fields that decide whether (and under which keys) a dorm shows up in
+# name suggestions.
+DORM_NAME_INDEX_FIELDS = frozenset({'name', 'address', 'available', 'approval_status'})
+
+
+@receiver(post_save, sender=Dorm)
+@receiver(post_delete, sender=Dorm)
+def invalidate_dorm_name_index(sender, instance, signal, **kwargs):
+    if signal is post_save and not instance.fields_changed(DORM_NAME_INDEX_FIELDS):
+        return
+    transaction.on_commit(dorm_name_index.invalidate)
+
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def invalidate_school_name_index(sender, instance, **kwargs):
+    transaction.on_commit(school_name_index.invalidate)
+
+
+# Fields that decide whether a dorm is listed or which facet values it counts under.
+DORM_FACET_FIELDS = frozenset({
+    'available', 'approval_status', 'accommodation_type', 'price', 'landlord',
+    'latitude', 'longitude',
+})
+
+
+@receiver(post_save, sender=Dorm)
+@receiver(post_delete, sender=Dorm)
+def invalidate_dorm_facets(sender, instance, signal, **kwargs):
+    if signal is post_save and not instance.fields_changed(DORM_FACET_FIELDS):
+        return
+    transaction.on_commit(dorm_facets.invalidate)
+
+
+@receiver(m2m_changed, sender=Dorm.amenities.through)
+def invalidate_dorm_facets_on_amenities(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(dorm_facets.invalidate)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_dorm_facets_on_landlord(sender, instance, update_fields=None, **kwargs):
+    """The verified-landlord facet follows the landlord's identity verification."""
+    if instance.user_type != 'landlord':
+        return
+    if update_fields is not None and 'is_identity_verified' not in update_fields:
+        return
+    transaction.on_commit(dorm_facets.invalidate)
+    transaction.on_commit(dorm_results.invalidate)
+
+
+@receiver(post_save, sender=Dorm)
+@receiver(post_delete, sender=Dorm)
+def invalidate_map_data_on_dorm(sender, instance, signal, **kwargs):
+    if signal is post_save and not instance.fields_changed(MAP_DORM_FIELDS):
+        return
+    transaction.on_commit(map_data.invalidate)
+
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+@receiver(post_save, sender=DormImage)
+@receiver(post_delete, sender=DormImage)
+def invalidate_map_data(sender, instance, **kwargs):
+    transaction.on_commit(map_data.invalidate)
+
+
+@receiver(post_save, sender=Review)
+def update_dorm_rating_on_review_save(sender, instance, created, **kwargs):
+    """Fold a new or edited review into its dorm's rating aggregates."""
+    rating = int(instance.rating)
+    counted = getattr(instance, '_counted_rating', None)
+    if created:
+        apply_rating_delta(instance.dorm_id, rating, 1)
+    elif counted is None:
+        # Saved without being loaded first: the previous rating is unknown.
+        recompute_dorm_ratings([instance.dorm_id])
+    else:
+        old_dorm_id, old_rating = counted
+        if old_dorm_id == instance.dorm_id:
+            apply_rating_delta(instance.dorm_id, rating - old_rating, 0)
+        else:
+            apply_rating_delta(old_dorm_id, -old_rating, -1)
+            apply_rating_delta(instance.dorm_id, rating, 1)
+    instance._counted_rating = (instance.dorm_id, rating)
+    transaction.on_commit(dorm_facets.invalidate)
+
+
+@receiver(post_delete, sender=Review)
+def update_dorm_rating_on_review_delete(sender, instance, **kwargs):
+    dorm_id, rating = getattr(instance, '_counted_rating', (instance.dorm_id, instance.rating))
+    apply_rating_delta(dorm_id, -int(rating), -1)
+    transaction.on_commit(dorm_facets.invalidate)
+
+
+# Dorm fields that browse filters and sorts read (ratings change through Review writes).
+DORM_RESULT_FIELDS = DORM_FACET_FIELDS | SEARCH_FIELDS | {'key_features'}
+
+
+@receiver(post_save, sender=Dorm)
+@receiver(post_delete, sender=Dorm)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=PaymentConfiguration)
+@receiver(post_delete, sender=PaymentConfiguration)
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def invalidate_dorm_results(sender, instance, signal, **kwargs):
+    """Any write that can change which dorms match a browse query, or their order."""
+    if sender is Dorm and signal is post_save and not instance.fields_changed(DORM_RESULT_FIELDS):
+        return
+    transaction.on_commit(dorm_results.invalidate)
+
+
+@receiver(m2m_changed, sender=Dorm.amenities.through)
+def invalidate_dorm_results_on_amenities(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(dorm_results.invalidate)
+
+
+@receiver(m2m_changed, sender=Dorm.amenities.through)
+@receiver(m2m_changed, sender=RoommatePost.amenities.through)
+def sync_amenity_masks_on_amenities(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Keep ``amenity_mask`` in step with the amenities many-to-many, in the same transaction."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_amenity_masks(type(instance), [instance.pk])
+        return
+    owner_model = model
+    if pk_set is None:
+        # Cleared from the amenity side: only owners carrying its bits can change.
+        bits = mask_for_name(instance.name)
+        pk_set = owner_model.objects.alias(
+            amenity_bits=F('amenity_mask').bitand(bits),
+        ).filter(amenity_bits__gt=0).values_list('pk', flat=True) if bits else ()
+    sync_amenity_masks(owner_model, pk_set)
+
+
+@receiver(post_save, sender=Amenity)
+@receiver(post_save, sender=RoommateAmenity)
+def sync_amenity_masks_on_rename(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    owners = instance.dorms if sender is Amenity else instance.roommate_posts
+    sync_amenity_masks(owners.model, owners.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Amenity)
+@receiver(pre_delete, sender=RoommateAmenity)
+def sync_amenity_masks_on_delete(sender, instance, **kwargs):
+    """Join rows cascade without m2m_changed; recompute the owners once they are gone."""
+    owners = instance.dorms if sender is Amenity else instance.roommate_posts
+    owner_model, owner_ids = owners.model, list(owners.values_list('pk', flat=True))
+    if owner_ids:
+        transaction.on_commit(lambda: sync_amenity_masks(owner_model, owner_ids))
@@ -0,0 +1,255 @@
+"""
+Materialized "similar dorms" for detail pages.
+
+Each dorm's nearest neighbours among listed (approved, available) dorms are
+stored in ``DormSimilarity`` with their rank, so a detail page reads its top
+four with one indexed lookup on (dorm, rank). Scores blend price closeness,
+matching accommodation type, amenity Jaccard overlap and distance, computed
+for a block of dorms at a time with NumPy arrays and a sparse dorm x amenity
+matrix. The ``rebuild_dorm_similarities`` command fills the whole table
+(migration 0072 backfilled it, and railway.toml reruns it hourly). Saving a
+dorm only rebuilds that dorm's own list, once per transaction
+(``schedule_similarity_refresh``), against the listed dorms. Other lists
+pick up the change at the next full rebuild; until then a delisted dorm is
+filtered out on read.
+"""
+
+import logging
+import threading
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from scipy import sparse
+
+from .geo import haversine_matrix
+from .models import Dorm, DormSimilarity
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_DORMS_SHOWN = 4
+# Neighbours kept per dorm, so a few can drop out of the listing between refreshes.
+SIMILAR_DORMS_STORED = 12
+MIN_SIMILARITY_SCORE = 0.3
+# Relative price difference at which the price component reaches zero
+# (the old ±30% window).
+PRICE_TOLERANCE = 0.3
+SIMILAR_DISTANCE_KM = 10.0
+WEIGHTS = {
+    'price': 0.35,
+    'accommodation_type': 0.25,
+    'amenities': 0.25,
+    'distance': 0.15,
+}
+
+# Dorm fields that feed the score or decide whether a dorm can be a neighbour.
+SIMILARITY_FIELDS = frozenset({
+    'price', 'accommodation_type', 'latitude', 'longitude', 'available', 'approval_status',
+})
+
+
+def _as_float(value):
+    return float(value) if value is not None else np.nan
+
+
+class DormFeatures:
+    """Per-dorm feature arrays, aligned by position with ``ids``."""
+
+    def __init__(self, rows, amenity_pairs):
+        rows = list(rows)
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.positions = {dorm_id: position for position, dorm_id in enumerate(self.ids.tolist())}
+        self.prices = np.array([_as_float(row[1]) for row in rows], dtype=np.float64)
+        type_codes = {}
+        self.types = np.array([type_codes.setdefault(row[2], len(type_codes)) for row in rows], dtype=np.int32)
+        self.lats = np.array([_as_float(row[3]) for row in rows], dtype=np.float64)
+        self.lngs = np.array([_as_float(row[4]) for row in rows], dtype=np.float64)
+        self.listed = np.array([bool(row[5]) for row in rows], dtype=bool)
+
+        columns = {}
+        row_index, col_index = [], []
+        for dorm_id, amenity_id in amenity_pairs:
+            position = self.positions.get(dorm_id)
+            if position is not None:
+                row_index.append(position)
+                col_index.append(columns.setdefault(amenity_id, len(columns)))
+        self.amenities = sparse.csr_matrix(
+            (np.ones(len(row_index), dtype=np.float32), (row_index, col_index)),
+            shape=(len(rows), max(len(columns), 1)),
+        )
+        # Duplicate (dorm, amenity) pairs would otherwise sum above 1.
+        self.amenities.data[:] = 1
+        self.amenity_counts = np.asarray(self.amenities.sum(axis=1)).ravel()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, dorm_ids=None):
+        """Every dorm, or only the listed ones plus ``dorm_ids`` when given."""
+        dorms = Dorm.objects.all()
+        if dorm_ids is not None:
+            dorms = dorms.filter(Q(available=True, approval_status='approved') | Q(id__in=list(dorm_ids)))
+        rows = [
+            (dorm_id, price, accommodation_type, lat, lng, available and approval_status == 'approved')
+            for dorm_id, price, accommodation_type, lat, lng, available, approval_status in dorms.order_by('id').values_list(
+                'id', 'price', 'accommodation_type', 'latitude', 'longitude', 'available', 'approval_status',
+            ).iterator()
+        ]
+        amenity_pairs = Dorm.amenities.through.objects.values_list('dorm_id', 'amenity_id')
+        if dorm_ids is not None:
+            amenity_pairs = amenity_pairs.filter(dorm__in=dorms)
+        return cls(rows, amenity_pairs.iterator())
+
+    def listed_positions(self):
+        return np.flatnonzero(self.listed)
+
+    def positions_of(self, dorm_ids):
+        return np.array(
+            sorted(self.positions[dorm_id] for dorm_id in set(dorm_ids) if dorm_id in self.positions),
+            dtype=np.int64,
+        )
+
+
+def score_block(features, sources, targets):
+    """Similarity in [0, 1] between dorms at ``sources`` and ``targets``, shape (len(sources), len(targets))."""
+    source_prices = features.prices[sources][:, np.newaxis]
+    target_prices = features.prices[targets][np.newaxis, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        relative = np.abs(source_prices - target_prices) / np.maximum(source_prices, target_prices)
+    price = np.nan_to_num(np.clip(1.0 - relative / PRICE_TOLERANCE, 0.0, 1.0))
+
+    same_type = features.types[sources][:, np.newaxis] == features.types[targets][np.newaxis, :]
+
+    shared = (features.amenities[sources] @ features.amenities[targets].T).toarray()
+    union = (
+        features.amenity_counts[sources][:, np.newaxis]
+        + features.amenity_counts[targets][np.newaxis, :]
+        - shared
+    )
+    jaccard = np.divide(shared, union, out=np.zeros_like(shared, dtype=np.float64), where=union > 0)
+
+    distances = haversine_matrix(
+        features.lats[sources], features.lngs[sources], features.lats[targets], features.lngs[targets],
+    )
+    nearby = np.nan_to_num(np.clip(1.0 - distances / SIMILAR_DISTANCE_KM, 0.0, 1.0))
+
+    scores = (
+        WEIGHTS['price'] * price
+        + WEIGHTS['accommodation_type'] * same_type
+        + WEIGHTS['amenities'] * jaccard
+        + WEIGHTS['distance'] * nearby
+    )
+    scores[features.ids[sources][:, np.newaxis] == features.ids[targets][np.newaxis, :]] = 0.0
+    return scores
+
+
+def top_neighbours(features, sources, targets, k=SIMILAR_DORMS_STORED):
+    """Rows ``(dorm_id, similar_id, score, rank)`` for each source's best ``k`` targets."""
+    if not len(sources) or not len(targets):
+        return []
+    scores = score_block(features, sources, targets)
+    k = min(k, len(targets))
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+    source_ids = features.ids[sources].tolist()
+    target_ids = features.ids[targets]
+    rows = []
+    for source_id, columns, column_scores in zip(source_ids, best, best_scores):
+        keep = column_scores >= MIN_SIMILARITY_SCORE
+        for rank, (similar_id, score) in enumerate(
+            zip(target_ids[columns[keep]].tolist(), column_scores[keep].tolist()), start=1,
+        ):
+            rows.append((source_id, similar_id, score, rank))
+    return rows
+
+
+def write_similarities(rows, dorm_ids, batch_size=1000):
+    """Replace the stored neighbours of ``dorm_ids`` with ``rows``."""
+    with transaction.atomic():
+        DormSimilarity.objects.filter(dorm_id__in=list(dorm_ids)).delete()
+        DormSimilarity.objects.bulk_create(
+            [
+                DormSimilarity(dorm_id=dorm_id, similar_id=similar_id, score=score, rank=rank)
+                for dorm_id, similar_id, score, rank in rows
+            ],
+            batch_size=batch_size,
+        )
+
+
+def rebuild_positions(features, sources, chunk_size=500):
+    """Recompute and store neighbour lists for dorms at ``sources``; returns rows written."""
+    targets = features.listed_positions()
+    stored = 0
+    for start in range(0, len(sources), chunk_size):
+        chunk = sources[start:start + chunk_size]
+        rows = top_neighbours(features, chunk, targets)
+        write_similarities(rows, features.ids[chunk].tolist())
+        stored += len(rows)
+    return stored
+
+
+def refresh_dorm_similarities(dorm_ids):
+    """Rebuild the stored lists of the given dorms (not the lists they appear in)."""
+    dorm_ids = [dorm_id for dorm_id in dorm_ids if dorm_id is not None]
+    if not dorm_ids:
+        return 0
+    features = DormFeatures.load(dorm_ids)
+    stored = rebuild_positions(features, features.positions_of(dorm_ids))
+    logger.info("Refreshed similar dorms for %s dorms", len(dorm_ids))
+    return stored
+
+
+_pending = threading.local()
+
+
+class _PendingRefresh:
+    """The dorm ids queued for one on_commit refresh."""
+
+    def __init__(self):
+        self.dorm_ids = set()
+
+    def __call__(self):
+        if getattr(_pending, 'refresh', None) is self:
+            _pending.refresh = None
+        refresh_dorm_similarities(sorted(self.dorm_ids))
+
+    def is_queued(self):
+        # Rolled-back (savepoint) blocks drop their callbacks; a dropped batch must not collect more ids.
+        connection = transaction.get_connection()
+        return any(callback is self for _sids, callback, *_rest in connection.run_on_commit)
+
+
+def schedule_similarity_refresh(dorm_ids):
+    """
+    Rebuild the lists of ``dorm_ids`` when the current transaction
+    commits. Every call in one transaction (a dorm save, the nested save and
+    its amenity changes) joins a single refresh, so the catalog features are
+    loaded once per write instead of once per signal.
+    """
+    dorm_ids = {dorm_id for dorm_id in dorm_ids if dorm_id is not None}
+    if not dorm_ids:
+        return
+    pending = getattr(_pending, 'refresh', None)
+    if pending is not None and pending.is_queued():
+        pending.dorm_ids.update(dorm_ids)
+        return
+    pending = _pending.refresh = _PendingRefresh()
+    # Filled before registering: outside a transaction on_commit runs it right away.
+    pending.dorm_ids.update(dorm_ids)
+    transaction.on_commit(pending)
+
+
+def similar_dorms_for(dorm, limit=SIMILAR_DORMS_SHOWN):
+    """The dorm's top listed neighbours, best first."""
+    return Dorm.objects.select_related('landlord').prefetch_related(
+        'images', 'amenities'
+    ).filter(
+        similar_to__dorm=dorm,
+        available=True,
+        approval_status='approved',
+    ).order_by('similar_to__rank')[:limit]
@@ -0,0 +1,162 @@
+"""
+In-process spatial index for dorm coordinates.
+
+A fixed-cell grid over latitude/longitude answers "which dorms are inside
+this bounding box / radius" without hydrating every Dorm row. Views use the
+returned IDs to narrow the queryset before the ORM runs.
+"""
+
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_KM, haversine_one_to_many
+from .versioning import VersionedValue
+
+DORM_LOCATIONS_VERSION = 'dorm_locations'
+
+
+def radius_to_bbox(lat, lng, radius_km):
+    """Return (min_lat, min_lng, max_lat, max_lng) enclosing a circle."""
+    angular = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    ratio = math.sin(angular) / max(math.cos(math.radians(lat)), 1e-12)
+    dlng = math.degrees(math.asin(ratio)) if ratio < 1 else 180.0
+    # Pad slightly so float rounding never drops a point sitting on the edge.
+    pad = 1e-9
+    return lat - dlat - pad, lng - dlng - pad, lat + dlat + pad, lng + dlng + pad
+
+
+class GridIndex:
+    """Fixed-cell grid over (lat, lng) points keyed by integer ID."""
+
+    def __init__(self, cell_size_deg=0.01):
+        self.cell_size = float(cell_size_deg)
+        self._cells = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, item_id):
+        return item_id in self._points
+
+    def _cell_for(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def insert(self, item_id, lat, lng):
+        self.remove(item_id)
+        lat = float(lat)
+        lng = float(lng)
+        cell = self._cell_for(lat, lng)
+        self._cells.setdefault(cell, set()).add(item_id)
+        self._points[item_id] = (lat, lng, cell)
+
+    def remove(self, item_id):
+        point = self._points.pop(item_id, None)
+        if point is None:
+            return
+        members = self._cells.get(point[2])
+        if members is not None:
+            members.discard(item_id)
+            if not members:
+                del self._cells[point[2]]
+
+    def get_point(self, item_id):
+        point = self._points.get(item_id)
+        return (point[0], point[1]) if point else None
+
+    def _candidate_cells(self, min_lat, min_lng, max_lat, max_lng):
+        min_row, min_col = self._cell_for(min_lat, min_lng)
+        max_row, max_col = self._cell_for(max_lat, max_lng)
+        span = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if span > len(self._cells):
+            # Huge boxes cover more cells than are occupied: scan the occupied ones.
+            return [
+                members for (row, col), members in self._cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            ]
+        cells = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                members = self._cells.get((row, col))
+                if members:
+                    cells.append(members)
+        return cells
+
+    def ids_in_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """IDs whose point lies inside the box (edges inclusive)."""
+        result = []
+        for members in self._candidate_cells(min_lat, min_lng, max_lat, max_lng):
+            for item_id in members:
+                lat, lng, _cell = self._points[item_id]
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                    result.append(item_id)
+        return result
+
+    def ids_within_radius(self, lat, lng, radius_km):
+        """IDs within ``radius_km`` of the point (great-circle distance)."""
+        candidates = self.ids_in_bbox(*radius_to_bbox(lat, lng, radius_km))
+        if not candidates:
+            return []
+        points = np.array([self._points[item_id][:2] for item_id in candidates], dtype=np.float64)
+        distances = haversine_one_to_many(lat, lng, points[:, 0], points[:, 1])
+        return [item_id for item_id, distance in zip(candidates, distances) if distance <= radius_km]
+
+
+class DormSpatialIndex:
+    """
+    Process-wide grid of dorm coordinates, built lazily from the database.
+
+    Local writes are applied in place through signals. Writes from other
+    worker processes are picked up through the shared version stamp, and
+    ``max_age`` bounds staleness when the cache is not shared.
+    """
+
+    def __init__(self, cell_size_deg=None, max_age=None):
+        self.cell_size_deg = cell_size_deg
+        self.max_age = max_age
+        self._grid = VersionedValue('dorm spatial index', self._build, DORM_LOCATIONS_VERSION, self._max_age)
+
+    def _max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, 'DORM_SPATIAL_INDEX_MAX_AGE', 300)
+
+    def _build(self):
+        from .models import Dorm
+
+        grid = GridIndex(self.cell_size_deg or getattr(settings, 'DORM_SPATIAL_INDEX_CELL_DEG', 0.01))
+        rows = Dorm.objects.filter(
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).values_list('id', 'latitude', 'longitude')
+        for dorm_id, lat, lng in rows.iterator():
+            grid.insert(dorm_id, lat, lng)
+        return grid
+
+    def grid(self):
+        """Return an up-to-date grid, rebuilding it if another writer moved the version."""
+        return self._grid.get()
+
+    def update_dorm(self, dorm_id, latitude, longitude):
+        if latitude is None or longitude is None:
+            self.discard(dorm_id)
+            return
+        self._grid.apply_local_write(lambda grid: grid.insert(dorm_id, latitude, longitude))
+
+    def discard(self, dorm_id):
+        self._grid.apply_local_write(lambda grid: grid.remove(dorm_id))
+
+    def reset(self):
+        self._grid.reset()
+
+    def ids_in_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        return self.grid().ids_in_bbox(min_lat, min_lng, max_lat, max_lng)
+
+    def ids_within_radius(self, lat, lng, radius_km):
+        return self.grid().ids_within_radius(lat, lng, radius_km)
+
+
+dorm_spatial_index = DormSpatialIndex()
@@ -0,0 +1,192 @@
+"""
+Process-level autocomplete index for the search box.
+
+School names, dorm names/addresses and the built-in campus list are
+expanded into lowercase keys (every word-suffix of the name plus the
+school's acronym) and kept in one sorted array. A lookup is a binary
+search followed by a short forward scan, so suggestions come from memory
+without touching the database. Misspelled queries fall back to trigram
+indexes over the same names, also held in memory (never pg_trgm, which
+would cost a query per keystroke). The index is rebuilt when the school or
+dorm name version stamps move.
+"""
+
+import bisect
+
+from .trigram import (
+    DORM_NAMES_VERSION,
+    MIN_QUERY_LENGTH,
+    SCHOOL_NAMES_VERSION,
+    TrigramIndex,
+    normalize,
+)
+from .versioning import VersionedValue
+
+ACRONYM_STOP_WORDS = frozenset({"of", "the", "and", "for", "at", "in", "on", "de", "la", "ng", "sa"})
+
+FALLBACK_SCHOOL_SUGGESTIONS = [
+    'Far Eastern University',
+    'University of Santo Tomas',
+    'Polytechnic University of the Philippines',
+    'National University Manila',
+    'Centro Escolar University',
+    'University of the East',
+    'Adamson University',
+    'San Beda University',
+]
+
+KIND_SCHOOL = 0
+KIND_DORM = 1
+KIND_FALLBACK = 2
+
+# Match quality, best first.
+MATCH_NAME = 0
+MATCH_WORD = 1
+MATCH_ACRONYM = 2
+
+
+def build_acronym(name):
+    """Generate a school acronym for keyword matching (e.g., University of Santo Tomas -> ust)."""
+    return ''.join(word[0] for word in normalize(name) if word not in ACRONYM_STOP_WORDS)
+
+
+def normalize_query(text):
+    return ' '.join(normalize(text))
+
+
+def _name_keys(name):
+    words = normalize(name)
+    keys = [(' '.join(words[i:]), MATCH_NAME if i == 0 else MATCH_WORD) for i in range(len(words))]
+    return keys
+
+
+class SuggestionIndex:
+    """Sorted (key, match, kind, item_id) entries answering prefix lookups."""
+
+    def __init__(self, schools=(), dorms=(), fallback=()):
+        self.labels = {}
+        self._acronyms = {}
+        self._trigrams = {KIND_SCHOOL: TrigramIndex(schools), KIND_DORM: TrigramIndex()}
+        entries = []
+
+        for school_id, name in schools:
+            self.labels[(KIND_SCHOOL, school_id)] = name
+            entries.extend((key, match, KIND_SCHOOL, school_id) for key, match in _name_keys(name))
+            acronym = build_acronym(name)
+            if acronym:
+                entries.append((acronym, MATCH_ACRONYM, KIND_SCHOOL, school_id))
+                self._acronyms.setdefault(acronym, []).append(school_id)
+
+        for dorm_id, name, address in dorms:
+            self.labels[(KIND_DORM, dorm_id)] = name
+            self._trigrams[KIND_DORM].add(dorm_id, name)
+            entries.extend((key, match, KIND_DORM, dorm_id) for key, match in _name_keys(name))
+            entries.extend((key, MATCH_WORD, KIND_DORM, dorm_id) for key, _match in _name_keys(address))
+
+        for position, name in enumerate(fallback):
+            self.labels[(KIND_FALLBACK, position)] = name
+            entries.extend((key, match, KIND_FALLBACK, position) for key, match in _name_keys(name))
+            acronym = build_acronym(name)
+            if acronym:
+                entries.append((acronym, MATCH_ACRONYM, KIND_FALLBACK, position))
+
+        entries.sort()
+        self._keys = [entry[0] for entry in entries]
+        self._entries = entries
+        self._sorted_acronyms = sorted(self._acronyms)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _prefix_matches(self, prefix):
+        """Best match quality per (kind, item_id) for keys starting with ``prefix``."""
+        best = {}
+        position = bisect.bisect_left(self._keys, prefix)
+        while position < len(self._keys) and self._keys[position].startswith(prefix):
+            _key, match, kind, item_id = self._entries[position]
+            item = (kind, item_id)
+            if match < best.get(item, MATCH_ACRONYM + 1):
+                best[item] = match
+            position += 1
+        return best
+
+    def school_ids_for_acronym(self, acronym_prefix):
+        """School IDs whose acronym starts with ``acronym_prefix`` (e.g. 'ust', 'fe')."""
+        school_ids = []
+        position = bisect.bisect_left(self._sorted_acronyms, acronym_prefix)
+        while position < len(self._sorted_acronyms) and self._sorted_acronyms[position].startswith(acronym_prefix):
+            school_ids.extend(self._acronyms[self._sorted_acronyms[position]])
+            position += 1
+        return school_ids
+
+    def suggest(self, query, limit=10, per_kind=8, fuzzy=True):
+        prefix = normalize_query(query)
+        if not prefix:
+            return []
+        matches = self._prefix_matches(prefix)
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (item[0][0], item[1], len(self.labels[item[0]]), self.labels[item[0]]),
+        )
+        by_kind = {KIND_SCHOOL: [], KIND_DORM: [], KIND_FALLBACK: []}
+        for (kind, item_id), _match in ranked:
+            if len(by_kind[kind]) < per_kind:
+                by_kind[kind].append(self.labels[(kind, item_id)])
+
+        # Misspelled names fill the remaining slots, most similar first.
+        if fuzzy and len(query.strip()) >= MIN_QUERY_LENGTH:
+            for kind, trigram_index in self._trigrams.items():
+                if len(by_kind[kind]) >= per_kind:
+                    continue
+                for item_id, _score in trigram_index.search(query):
+                    label = self.labels.get((kind, item_id))
+                    if label and label not in by_kind[kind]:
+                        by_kind[kind].append(label)
+                        if len(by_kind[kind]) >= per_kind:
+                            break
+
+        suggestions = []
+        seen = set()
+        for label in by_kind[KIND_SCHOOL] + by_kind[KIND_DORM] + by_kind[KIND_FALLBACK]:
+            key = (label or '').strip().lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            suggestions.append(label)
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+
+class VersionedSuggestionIndex:
+    """Lazily built SuggestionIndex, rebuilt when school or dorm names change."""
+
+    def __init__(self):
+        self._index = VersionedValue(
+            'search suggestion index', self._build, (SCHOOL_NAMES_VERSION, DORM_NAMES_VERSION),
+        )
+
+    def _build(self):
+        from .models import Dorm, School
+
+        schools = list(School.objects.values_list('id', 'name'))
+        dorms = list(
+            Dorm.objects.filter(available=True, approval_status='approved')
+            .values_list('id', 'name', 'address')
+        )
+        return SuggestionIndex(schools, dorms, FALLBACK_SCHOOL_SUGGESTIONS)
+
+    def index(self):
+        return self._index.get()
+
+    def reset(self):
+        self._index.reset()
+
+    def suggest(self, query, limit=10):
+        return self.index().suggest(query, limit=limit)
+
+    def school_ids_for_acronym(self, acronym_prefix):
+        return self.index().school_ids_for_acronym(acronym_prefix)
+
+
+suggestion_index = VersionedSuggestionIndex()
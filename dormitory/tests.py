@@ -1,3 +1,1407 @@
-from django.test import TestCase
+from decimal import Decimal
+from math import atan2, cos, radians, sin, sqrt
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from sklearn.neighbors import NearestNeighbors
+
+from accounts.models import CustomUser
+from user_profile.models import TenantPreferences
+
+from .amenity_bits import AMENITY_BITS, mask_for_name
+from .dashboard_ranking import DashboardRanking
+from .models import Amenity, Dorm, DormSchoolDistance, RoommateAmenity, RoommatePost, School
+from .school_distances import NEARBY_SCHOOL_RADIUS_KM
+from .services import RoommateMatchingService
+
+
+def legacy_dashboard_scores(dorms, preferences, matched_school_ids, favorite_dorms, viewed_dorms, collab_dorm_ids):
+    """
+    The tenant dashboard's scoring code as it was before DashboardRanking,
+    copied verbatim from accounts/views.py, kept as the reference ranking.
+    Returns the sorted ``(dorm, score, explanation, amenity_matches)`` rows
+    and the positions in ``dorms`` that got the ML bonus.
+    """
+    # --- Prepare dorm features for ML ---
+    dorm_features = []
+    for dorm in dorms:
+        dorm_features.append([
+            float(dorm.price),
+            float(getattr(dorm, 'avg_rating', dorm.get_average_rating())),
+            dorm.amenity_count,
+            float(dorm.latitude or 0),
+            float(dorm.longitude or 0),
+        ])
+    dorm_features = np.array(dorm_features)
+
+    # --- ML: Find similar dorms to favorites/views ---
+    if favorite_dorms.exists():
+        user_pref_indices = [i for i, d in enumerate(dorms) if d in favorite_dorms]
+    else:
+        user_pref_indices = [i for i, d in enumerate(dorms) if d in viewed_dorms]
+    if user_pref_indices:
+        user_pref_features = dorm_features[user_pref_indices]
+        n_neighbors = min(6, len(dorms))
+        nn = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean')
+        nn.fit(dorm_features)
+        user_vector = np.mean(user_pref_features, axis=0).reshape(1, -1)
+        distances, indices = nn.kneighbors(user_vector)
+        ml_recommended_indices = indices[0]
+    else:
+        ml_recommended_indices = []
+
+    # --- Calculate distance score based on location range (not exact text) ---
+    if preferences and preferences.preferred_location:
+        preferred_location = preferences.preferred_location.lower().strip()
+        max_distance_km = float(preferences.max_distance_km or 5.0)
+
+        matched_school_coords = []
+        if matched_school_ids:
+            matched_school_coords = list(
+                School.objects.filter(id__in=matched_school_ids)
+                .exclude(latitude__isnull=True)
+                .exclude(longitude__isnull=True)
+                .values_list('latitude', 'longitude')
+            )
+
+        normalized_location = ''.join(ch if ch.isalnum() else ' ' for ch in preferred_location)
+        location_tokens = [token for token in normalized_location.split() if len(token) >= 3]
+
+        def haversine_km(lat1, lon1, lat2, lon2):
+            r = 6371.0
+            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+            dlat = lat2 - lat1
+            dlon = lon2 - lon1
+            a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+            return r * (2 * atan2(sqrt(a), sqrt(1 - a)))
+
+        for dorm in dorms:
+            if matched_school_ids:
+                dorm_school_ids = set(dorm.nearby_schools.values_list('id', flat=True))
+                dorm_has_school_match = bool(dorm_school_ids.intersection(matched_school_ids))
+
+                if matched_school_coords and dorm.latitude and dorm.longitude:
+                    dorm_lat = float(dorm.latitude)
+                    dorm_lng = float(dorm.longitude)
+                    nearest = min(
+                        haversine_km(dorm_lat, dorm_lng, float(s_lat), float(s_lng))
+                        for s_lat, s_lng in matched_school_coords
+                    )
+
+                    if nearest <= max_distance_km:
+                        dorm.distance_score = 1.0 - ((nearest / max_distance_km) * 0.25)
+                    elif nearest <= (max_distance_km * 2):
+                        dorm.distance_score = 0.75 - (((nearest - max_distance_km) / max_distance_km) * 0.25)
+                    else:
+                        dorm.distance_score = 0.35
+
+                    if dorm_has_school_match:
+                        dorm.distance_score = min(1.0, dorm.distance_score + 0.12)
+                elif dorm_has_school_match:
+                    dorm.distance_score = 0.85
+                else:
+                    dorm.distance_score = 0.45
+            else:
+                searchable_text = f"{dorm.name or ''} {dorm.address or ''}".lower()
+                if preferred_location in searchable_text:
+                    dorm.distance_score = 0.85
+                else:
+                    token_hits = sum(1 for token in location_tokens if token in searchable_text)
+                    token_ratio = (token_hits / len(location_tokens)) if location_tokens else 0
+                    if token_ratio >= 0.67:
+                        dorm.distance_score = 0.8
+                    elif token_ratio >= 0.34:
+                        dorm.distance_score = 0.65
+                    elif token_hits > 0:
+                        dorm.distance_score = 0.55
+                    else:
+                        dorm.distance_score = 0.45
+    else:
+        # No preferences, use default distance scoring
+        for dorm in dorms:
+            dorm.distance_score = 0.5
+
+    # --- AI-POWERED scoring with preferences ---
+    scored_dorms = []
+    for i, dorm in enumerate(dorms):
+        # Base scoring
+        final_score = (
+            float(getattr(dorm, 'avg_rating', dorm.get_average_rating())) * 0.20 +
+            dorm.distance_score * 0.20 +
+            (dorm.amenity_count / 10) * 0.15 +
+            float(getattr(dorm, 'review_count', 0)) * 0.05 +
+            float(dorm.price) * -0.00001
+        )
+
+        # AI bonuses
+        ml_bonus = 0.15 if i in ml_recommended_indices else 0
+        collab_bonus = 0.15 if dorm.id in collab_dorm_ids else 0
+
+        # PREFERENCE-BASED BONUS (makes it smart!)
+        preference_bonus = 0
+        amenity_matches = 0
+        if preferences:
+            # Get dorm amenities
+            dorm_amenity_names = set(dorm.amenities.values_list('name', flat=True))
+
+            # Check amenity matches
+            if preferences.wifi_required and any('wifi' in a.lower() or 'internet' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.parking_required and any('parking' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.laundry_required and any('laundry' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.kitchen_required and any('kitchen' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.aircon_required and any('aircon' in a.lower() or 'air con' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.security_required and any('security' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.pet_friendly_required and any('pet' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.study_area_required and any('study' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+            if preferences.near_public_transport and any('transport' in a.lower() or 'jeep' in a.lower() or 'mrt' in a.lower() for a in dorm_amenity_names):
+                amenity_matches += 1
+
+            # Calculate preference bonus (0-0.30 based on amenity matches)
+            total_required_amenities = sum([
+                preferences.wifi_required,
+                preferences.parking_required,
+                preferences.laundry_required,
+                preferences.kitchen_required,
+                preferences.aircon_required,
+                preferences.security_required,
+                preferences.pet_friendly_required,
+                preferences.study_area_required,
+                preferences.near_public_transport
+            ])
+            if total_required_amenities > 0:
+                preference_bonus = (amenity_matches / total_required_amenities) * 0.30
+
+            # Budget match bonus
+            if preferences.min_budget <= dorm.price <= preferences.max_budget:
+                preference_bonus += 0.10
+
+        total_score = final_score + ml_bonus + collab_bonus + preference_bonus
+
+        # --- Enhanced explanation logic with preferences ---
+        reasons = []
+        dorm.preference_match_percentage = 0
+        if preferences and total_required_amenities > 0:
+            match_pct = int((amenity_matches / total_required_amenities) * 100)
+            dorm.preference_match_percentage = match_pct
+            if match_pct >= 80:
+                reasons.append(f" {match_pct}% match with your preferences")
+            elif match_pct >= 50:
+                reasons.append(f" {match_pct}% match with your preferences")
+
+        if preferences and preferences.min_budget <= dorm.price <= preferences.max_budget:
+            reasons.append(" Within your budget")
+
+        if i in ml_recommended_indices:
+            reasons.append(" Similar to your favorites")
+        if dorm.id in collab_dorm_ids:
+            reasons.append(" Popular among similar tenants")
+        if getattr(dorm, 'avg_rating', dorm.get_average_rating()) >= 4.5:
+            reasons.append(" Highly rated")
+        if dorm.distance_score >= 0.8:
+            reasons.append(" Near your preferred location")
+        if dorm.amenity_count >= 7:
+            reasons.append(" Many amenities")
+
+        explanation = " • ".join(reasons[:3]) if reasons else "Recommended for you"
+
+        scored_dorms.append((dorm, total_score, explanation, amenity_matches if preferences else 0))
+
+    # --- Sort by score (AI-powered ranking!) ---
+    scored_dorms.sort(key=lambda x: x[1], reverse=True)
+    return scored_dorms, ml_recommended_indices
+
+
+class DashboardRankingTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.school = School.objects.create(
+            name='University of Santo Tomas', address='España, Sampaloc',
+            latitude=Decimal('14.609600'), longitude=Decimal('120.989900'),
+        )
+        # "Carpeted Rooms" contains 'pet' but not at a word start.
+        amenities = [
+            Amenity.objects.create(name=name)
+            for name in ('WiFi', 'Parking', 'Laundry Area', 'Study Room', 'Carpeted Rooms')
+        ]
+        coordinates = [
+            (Decimal('14.609100'), Decimal('120.989700')),
+            (Decimal('14.580000'), Decimal('120.980000')),
+            (Decimal('14.700000'), Decimal('121.050000')),
+            (None, None),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(16):
+                lat, lng = coordinates[index % len(coordinates)]
+                dorm = Dorm.objects.create(
+                    landlord=self.landlord,
+                    name=f'Dorm {index}' + (' Sampaloc' if index % 5 == 0 else ''),
+                    address='España Blvd' if index % 3 == 0 else 'Taft Avenue',
+                    # Repeated prices and ratings produce exact score ties.
+                    price=Decimal(3000 + (index % 4) * 1500),
+                    description='desc',
+                    latitude=lat,
+                    longitude=lng,
+                    avg_rating=(index % 3) * 2.0,
+                    rating_count=index % 3,
+                    approval_status='approved',
+                    accommodation_type='whole_unit' if index % 2 else 'bedspace',
+                )
+                dorm.amenities.set(amenities[:index % (len(amenities) + 1)])
+        self.tenant = CustomUser.objects.create_user(
+            username='tenant', password='x', email='tenant@example.com', user_type='tenant',
+        )
+        self.profile = self.tenant.userprofile
+
+    def candidates(self):
+        from django.db.models import Count
+        return list(Dorm.objects.annotate(amenity_count=Count('amenities')).order_by('id'))
+
+    def rank_both(self, preferences, matched_school_ids=(), favorite_ids=(), collab_ids=()):
+        """(legacy rows, ids the legacy code gave the ML bonus, DashboardRanking over the same candidates)."""
+        self.profile.favorite_dorms.set(favorite_ids)
+        dorms = self.candidates()
+        rows, ml_indices = legacy_dashboard_scores(
+            dorms, preferences, matched_school_ids,
+            self.profile.favorite_dorms.all(), Dorm.objects.none(), set(collab_ids),
+        )
+        legacy_ml_ids = {dorms[position].id for position in ml_indices}
+        # The recommender never returns the dorms it was asked about.
+        ranking = DashboardRanking(
+            dorms, preferences, matched_school_ids=matched_school_ids,
+            ml_ids=legacy_ml_ids - set(favorite_ids), collab_ids=collab_ids,
+        )
+        return rows, legacy_ml_ids, ranking
+
+    def assertSameRanking(self, preferences, matched_school_ids=(), collab_ids=()):
+        rows, _legacy_ml_ids, ranking = self.rank_both(preferences, matched_school_ids, collab_ids=collab_ids)
+        self.assertEqual(ranking.ranked_ids(), [dorm.id for dorm, _score, _explanation, _matches in rows])
+        self.assertEqual(ranking.scores[ranking.order].tolist(), [score for _dorm, score, _explanation, _matches in rows])
+        self.assertEqual(
+            [ranking.explanation(position) for position in ranking.order.tolist()],
+            [explanation for _dorm, _score, explanation, _matches in rows],
+        )
+        return ranking
+
+    def test_ranking_without_preferences(self):
+        dorm_ids = [dorm.id for dorm in self.candidates()]
+        self.assertSameRanking(None, collab_ids=dorm_ids[2:5])
+
+    def test_ranking_with_school_preference(self):
+        preferences = TenantPreferences(
+            user=self.tenant, preferred_location='Santo Tomas', max_distance_km=3,
+            min_budget=Decimal('3000'), max_budget=Decimal('6000'),
+            wifi_required=True, parking_required=True, laundry_required=True, study_area_required=True,
+        )
+        ranking = self.assertSameRanking(preferences, matched_school_ids={self.school.id})
+        matches = ranking.top_preference_matches()
+        self.assertTrue(matches)
+        for dorm, explanation, amenity_matches in matches:
+            self.assertGreaterEqual(amenity_matches, 3)
+            self.assertEqual(dorm.preference_match_percentage, int(amenity_matches / 4 * 100))
+            self.assertTrue(explanation)
+
+    def test_ranking_with_text_location(self):
+        preferences = TenantPreferences(
+            user=self.tenant, preferred_location='España Sampaloc', min_budget=Decimal('0'),
+            max_budget=Decimal('4500'), wifi_required=True,
+        )
+        self.assertSameRanking(preferences)
+
+    def test_sections_follow_ranking(self):
+        ranking = self.assertSameRanking(None)
+        ranked = [dorm for dorm in (ranking.dorms[position] for position in ranking.order.tolist())]
+        whole_units = [dorm for dorm, _explanation in ranking.section(('whole_unit',), limit=5)]
+        self.assertEqual(whole_units, [dorm for dorm in ranked if dorm.accommodation_type == 'whole_unit'][:5])
+        self.assertTrue(all(hasattr(dorm, 'distance_score') for dorm in whole_units))
+
+    def test_favorites_no_longer_get_the_ml_bonus(self):
+        favorite = self.candidates()[5]
+        rows, legacy_ml_ids, ranking = self.rank_both(None, favorite_ids=[favorite.id])
+        self.assertIn(favorite.id, legacy_ml_ids)
+        scores = dict(zip(ranking.ranked_ids(), ranking.scores[ranking.order].tolist()))
+        for dorm, score, _explanation, _matches in rows:
+            if dorm.id == favorite.id:
+                self.assertAlmostEqual(score - scores[dorm.id], 0.15)
+            else:
+                self.assertEqual(scores[dorm.id], score)
+
+    def test_amenity_keywords_match_at_word_start(self):
+        preferences = TenantPreferences(
+            user=self.tenant, min_budget=Decimal('0'), max_budget=Decimal('100000'),
+            wifi_required=True, pet_friendly_required=True,
+        )
+        rows, _legacy_ml_ids, ranking = self.rank_both(preferences)
+        positions = {dorm.id: position for position, dorm in enumerate(ranking.dorms)}
+        carpeted = set(Dorm.objects.filter(amenities__name='Carpeted Rooms').values_list('id', flat=True))
+        self.assertTrue(carpeted)
+        for dorm, score, _explanation, legacy_matches in rows:
+            position = positions[dorm.id]
+            matches = int(ranking.amenity_matches[position])
+            if dorm.id in carpeted:
+                # Substring matching counted "Carpeted" as pet friendly.
+                self.assertEqual(legacy_matches, matches + 1)
+                self.assertAlmostEqual(score - ranking.scores[position], 0.30 / 2)
+            else:
+                self.assertEqual(legacy_matches, matches)
+                self.assertEqual(ranking.scores[position], score)
+
+
+class AmenityMatchingTests(TestCase):
+    def test_keywords_match_at_word_start(self):
+        self.assertEqual(mask_for_name('Pets Allowed'), AMENITY_BITS['pet_friendly'])
+        self.assertEqual(mask_for_name('Carpeted Rooms'), 0)
+        self.assertEqual(mask_for_name('Free WiFi + Airconditioned'), AMENITY_BITS['wifi'] | AMENITY_BITS['aircon'])
+
+    def test_roommate_amenities_outside_vocabulary_count(self):
+        gym, quiet, wifi = (RoommateAmenity.objects.create(name=name) for name in ('Gym', 'Quiet', 'WiFi'))
+        posts = []
+        for index, amenities in enumerate(((gym, quiet), (gym, wifi))):
+            user = CustomUser.objects.create_user(
+                username=f'tenant{index}', password='x', email=f'tenant{index}@example.com', user_type='tenant',
+            )
+            post = RoommatePost.objects.create(
+                user=user, name=f'Tenant {index}', contact_number='9123456789', preferred_location='Sampaloc',
+                preferred_budget_min=Decimal('3000'), preferred_budget_max=Decimal('5000'),
+            )
+            post.amenities.set(amenities)
+            posts.append(post)
+
+        _score, factors = RoommateMatchingService.calculate_compatibility(*posts)
+        self.assertEqual(factors['common_amenities_count'], 1)
+        self.assertAlmostEqual(factors['amenities_score'], 100 / 3)
+
+
+class HaversineTests(TestCase):
+    def test_batched_distances_match_the_scalar_formula(self):
+        from .geo import haversine_km, haversine_matrix, haversine_one_to_many
+
+        rng = np.random.default_rng(7)
+        lats = rng.uniform(14.4, 14.8, 20)
+        lngs = rng.uniform(120.9, 121.1, 20)
+        school_lats = [Decimal('14.609600'), Decimal('14.563600')]
+        school_lngs = [Decimal('120.989900'), Decimal('120.993200')]
+        expected = [
+            [haversine_km(lat, lng, school_lat, school_lng) for school_lat, school_lng in zip(school_lats, school_lngs)]
+            for lat, lng in zip(lats, lngs)
+        ]
+        np.testing.assert_allclose(haversine_matrix(lats, lngs, school_lats, school_lngs), expected, rtol=1e-12)
+        np.testing.assert_allclose(
+            haversine_one_to_many(school_lats[0], school_lngs[0], lats, lngs),
+            [row[0] for row in expected], rtol=1e-12,
+        )
+
+    def test_radius_filter_skips_items_without_coordinates(self):
+        from types import SimpleNamespace
+
+        from .views import _filter_items_within_radius
+
+        items = [
+            SimpleNamespace(name='near', latitude=Decimal('14.6100'), longitude=Decimal('120.9900')),
+            SimpleNamespace(name='unlocated', latitude=None, longitude=Decimal('120.9900')),
+            SimpleNamespace(name='far', latitude=Decimal('14.7000'), longitude=Decimal('121.0500')),
+            SimpleNamespace(name='edge', latitude=Decimal('14.6300'), longitude=Decimal('120.9899')),
+        ]
+        found = _filter_items_within_radius(items, 14.6096, 120.9899, 3.0)
+        self.assertEqual([item.name for item in found], ['near', 'edge'])
+        self.assertEqual(_filter_items_within_radius(items[1:2], 14.6096, 120.9899, 3.0), [])
+
+
+class SchoolDistanceTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.ust = School.objects.create(
+            name='University of Santo Tomas', address='España, Sampaloc',
+            latitude=Decimal('14.609600'), longitude=Decimal('120.989900'),
+        )
+        self.dlsu = School.objects.create(
+            name='De La Salle University', address='Taft Avenue, Malate',
+            latitude=Decimal('14.564700'), longitude=Decimal('120.993200'),
+        )
+        coordinates = [
+            ('Sampaloc', Decimal('14.610000'), Decimal('120.990000')),
+            ('Malate', Decimal('14.565000'), Decimal('120.993000')),
+            ('Quezon City', Decimal('14.676000'), Decimal('121.043700')),
+            ('Unlocated', None, None),
+        ]
+        # bulk_create skips the signals that would fill the distance table.
+        self.dorms = Dorm.objects.bulk_create([
+            Dorm(
+                landlord=self.landlord, name=name, address='x', price=Decimal('4000'), description='desc',
+                latitude=lat, longitude=lng, approval_status='approved',
+            )
+            for name, lat, lng in coordinates
+        ])
+
+    def stored_pairs(self):
+        return {
+            (dorm_id, school_id): distance
+            for dorm_id, school_id, distance in DormSchoolDistance.objects.values_list('dorm_id', 'school_id', 'distance_km')
+        }
+
+    def test_rebuild_command_matches_per_dorm_sync(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from .school_distances import sync_dorm_distances
+
+        call_command('rebuild_school_distances', workers=2, chunk_size=1, stdout=StringIO())
+        rebuilt = self.stored_pairs()
+        nearby = set(Dorm.nearby_schools.through.objects.values_list('dorm_id', 'school_id'))
+
+        sync_dorm_distances([dorm.id for dorm in self.dorms])
+        self.assertEqual(rebuilt.keys(), self.stored_pairs().keys())
+        for pair, distance in self.stored_pairs().items():
+            self.assertAlmostEqual(rebuilt[pair], distance, places=9)
+        self.assertNotIn(self.dorms[3].id, {dorm_id for dorm_id, _school_id in rebuilt})
+        self.assertEqual(nearby, {pair for pair, distance in rebuilt.items() if distance <= NEARBY_SCHOOL_RADIUS_KM})
+        self.assertIn((self.dorms[0].id, self.ust.id), nearby)
+
+        # --schools only replaces the given school's rows.
+        DormSchoolDistance.objects.all().delete()
+        call_command('rebuild_school_distances', workers=1, schools=str(self.ust.id), stdout=StringIO())
+        self.assertEqual({school_id for _dorm_id, school_id in self.stored_pairs()}, {self.ust.id})
+
+    def test_dorms_near_any_of_several_schools(self):
+        from django.http import QueryDict
+
+        from .school_distances import dorms_near_schools, sync_dorm_distances
+        from .views import _school_filter
+
+        sync_dorm_distances([dorm.id for dorm in self.dorms])
+        school_ids, radius_km = _school_filter(QueryDict(f'school={self.ust.id},{self.dlsu.id}&school={self.ust.id}&school_radius=2'))
+        self.assertEqual((school_ids, radius_km), ([self.ust.id, self.dlsu.id], 2.0))
+
+        found = dorms_near_schools(Dorm.objects.order_by('id'), school_ids, radius_km)
+        self.assertEqual(
+            [(dorm.name, dorm.nearest_school_name) for dorm in found],
+            [('Sampaloc', self.ust.name), ('Malate', self.dlsu.name)],
+        )
+        self.assertLess(found[0].nearest_school_km, 0.1)
+        self.assertEqual([dorm.name for dorm in dorms_near_schools(Dorm.objects.all(), [self.dlsu.id], 2)], ['Malate'])
+        # A radius past SCHOOL_DISTANCE_MAX_KM is capped to the stored rows.
+        self.assertEqual(dorms_near_schools(Dorm.objects.all(), school_ids, 500).count(), 3)
+
+
+class DormSearchTests(TestCase):
+    def setUp(self):
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        rows = (
+            ('Sampaloc Suites', 'España Blvd', 'A quiet building.'),
+            ('Quiet Place', 'Dapitan Street', 'A short walk to Sampaloc markets.'),
+            ('Taft Residences', 'Malate', 'Near the university belt.'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorms = [
+                Dorm.objects.create(
+                    landlord=landlord, name=name, address=address, price=Decimal('4000'), description=description,
+                )
+                for name, address, description in rows
+            ]
+
+    def search(self, query):
+        from .search import order_by_relevance, search_dorms
+
+        return [dorm.name for dorm in order_by_relevance(search_dorms(query, Dorm.objects.all()), 'id')]
+
+    def test_ranked_prefix_search_follows_writes(self):
+        from django.db import connection
+
+        from .search import SQLITE_TABLE, search_backend
+
+        self.assertEqual(search_backend(), 'sqlite')
+        # Name hits outrank description hits; tokens are prefixes and all must match.
+        self.assertEqual(self.search('sampa'), ['Sampaloc Suites', 'Quiet Place'])
+        self.assertEqual(self.search('quiet sampaloc'), ['Sampaloc Suites', 'Quiet Place'])
+        self.assertEqual(self.search('taft malate'), ['Taft Residences'])
+        self.assertEqual(self.search('taft sampaloc'), [])
+
+        taft = Dorm.objects.get(pk=self.dorms[2].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            taft.name = 'Malate Lofts'
+            taft.save()
+        self.assertEqual(self.search('taft'), [])
+        self.assertEqual(self.search('lofts'), ['Malate Lofts'])
+        taft_id = taft.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            taft.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {SQLITE_TABLE} WHERE rowid = %s', [taft_id])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        # Repeated prices, so pages have to break ties on id.
+        self.dorms = [
+            Dorm.objects.create(
+                landlord=self.landlord, name=f'Dorm {index}', address='Taft Avenue',
+                price=Decimal(3000 + (index % 3) * 1000), description='desc', approval_status='approved',
+            )
+            for index in range(7)
+        ]
+        self.tenant = CustomUser.objects.create_user(
+            username='tenant', password='x', email='tenant@example.com', user_type='tenant',
+        )
+
+    def test_cursor_pages_walk_the_sort_order_once(self):
+        self.client.force_login(self.tenant)
+        expected = [dorm.id for dorm in sorted(self.dorms, key=lambda dorm: (dorm.price, dorm.id))]
+        response = self.client.get('/dormitory/list/', {'sort': 'price_asc', 'page_size': 3})
+        seen = [dorm.id for dorm in response.context['dorms']]
+        self.assertEqual(response.context['total_dorm_count'], 7)
+        self.assertFalse(response.context['dorm_count_capped'])
+        cursor = response.context['next_cursor']
+
+        # A dorm listed ahead of the cursor does not shift the next pages.
+        Dorm.objects.create(
+            landlord=self.landlord, name='Cheap', address='Taft Avenue', price=Decimal('1000'),
+            description='desc', approval_status='approved',
+        )
+        while cursor:
+            page = self.client.get('/dormitory/list/page/', {'sort': 'price_asc', 'page_size': 3, 'cursor': cursor}).json()
+            cursor = page['next_cursor']
+            seen.extend(dorm['id'] for dorm in page['dorms'])
+            self.assertEqual(page['has_next'], cursor is not None)
+        self.assertEqual(seen, expected)
+
+        self.assertEqual(self.client.get('/dormitory/list/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_count_stops_at_the_cap(self):
+        from .pagination import capped_count
+
+        self.assertEqual(capped_count(Dorm.objects.all(), 5), (5, True))
+        self.assertEqual(capped_count(Dorm.objects.all(), 7), (7, False))
+
+
+class SpatialIndexSignalTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorm = Dorm.objects.create(
+                landlord=self.landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'),
+                description='desc', latitude=Decimal('14.609100'), longitude=Decimal('120.989700'),
+            )
+
+    def test_version_only_moves_with_coordinates(self):
+        from .spatial_index import DORM_LOCATIONS_VERSION
+        from .versioning import get_version
+
+        dorm = Dorm.objects.get(pk=self.dorm.pk)
+        version = get_version(DORM_LOCATIONS_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            dorm.name = 'Renamed'
+            dorm.save()
+        self.assertEqual(get_version(DORM_LOCATIONS_VERSION), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            dorm.latitude = Decimal('14.600000')
+            dorm.save()
+        self.assertGreater(get_version(DORM_LOCATIONS_VERSION), version)
+
+
+class DormChangedFieldsTests(TestCase):
+    def setUp(self):
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorm = Dorm.objects.create(
+                landlord=landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'),
+                description='desc', latitude=Decimal('14.609100'), longitude=Decimal('120.989700'),
+                approval_status='approved',
+            )
+
+    def save_with_receivers_watched(self, dorm, **kwargs):
+        from . import signals
+
+        with mock.patch.object(signals, 'reindex_dorms') as reindex, \
+                mock.patch.object(signals, 'schedule_similarity_refresh') as similarity, \
+                mock.patch.object(signals.dorm_facets, 'invalidate') as facets, \
+                mock.patch.object(signals.dorm_results, 'invalidate') as results, \
+                mock.patch.object(signals.map_data, 'invalidate') as map_invalidate, \
+                mock.patch.object(signals.dorm_name_index, 'invalidate') as names:
+            with self.captureOnCommitCallbacks(execute=True):
+                dorm.save(**kwargs)
+        return {
+            'search': reindex.called, 'similarity': similarity.called, 'facets': facets.called,
+            'results': results.called, 'map': map_invalidate.called, 'names': names.called,
+        }
+
+    def test_counter_only_save_touches_no_index(self):
+        dorm = Dorm.objects.get(pk=self.dorm.pk)
+        dorm.reservations_count += 1
+        self.assertFalse(any(self.save_with_receivers_watched(dorm).values()))
+        self.assertEqual(Dorm.objects.get(pk=dorm.pk).reservations_count, 1)
+
+    def test_listed_field_change_refreshes_what_reads_it(self):
+        dorm = Dorm.objects.get(pk=self.dorm.pk)
+        dorm.price = Decimal('4500')
+        called = self.save_with_receivers_watched(dorm)
+        self.assertEqual(called, {
+            'search': False, 'similarity': True, 'facets': True, 'results': True, 'map': True, 'names': False,
+        })
+        dorm.name = 'Renamed'
+        called = self.save_with_receivers_watched(dorm, update_fields=['name', 'reservations_count'])
+        self.assertTrue(called['search'] and called['names'] and called['map'])
+        self.assertFalse(called['similarity'] or called['facets'])
+
+    def test_full_save_of_stale_instance_keeps_denormalized_fields(self):
+        stale = Dorm.objects.get(pk=self.dorm.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorm.amenities.add(Amenity.objects.create(name='WiFi'))
+        Dorm.objects.filter(pk=self.dorm.pk).update(rating_sum=5, rating_count=1, avg_rating=5.0)
+        stale.description = 'Updated'
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.save()
+        fresh = Dorm.objects.get(pk=self.dorm.pk)
+        self.assertEqual(fresh.amenity_mask, AMENITY_BITS['wifi'])
+        self.assertEqual((fresh.rating_count, fresh.avg_rating, fresh.description), (1, 5.0, 'Updated'))
+
+
+class SuggestionIndexTests(TestCase):
+    def test_fuzzy_fallback_stays_in_memory(self):
+        from .suggestions import SuggestionIndex
+
+        index = SuggestionIndex(
+            schools=[(1, 'University of Santo Tomas')],
+            dorms=[(1, 'Sunrise Residences', 'Dapitan Street')],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(index.suggest('Sunrse'), ['Sunrise Residences'])
+            self.assertEqual(index.suggest('Santo Tomass'), ['University of Santo Tomas'])
+            self.assertEqual(index.suggest('Su', fuzzy=True), ['Sunrise Residences'])
+
+
+class FacetCatalogTests(TestCase):
+    def test_counts_match_set_arithmetic(self):
+        from .facets import FacetCatalog
+
+        dorms = [
+            (dorm_id, 'bedspace' if dorm_id % 2 else 'whole_unit', 1000.0 * dorm_id, dorm_id % 6, dorm_id % 3 == 0)
+            for dorm_id in range(1, 21)
+        ]
+        amenity_pairs = [(dorm_id, dorm_id % 4) for dorm_id in range(1, 21)] + [(99, 1)]
+        catalog = FacetCatalog(dorms, amenity_pairs, [(3, 7), (4, 7)])
+        counts = catalog.counts([2, 3, 4, 5, 99])
+        self.assertEqual(counts['total'], 4)
+        self.assertEqual(counts['accommodation_types'], {'bedspace': 2, 'whole_unit': 2})
+        self.assertEqual(counts['amenities'], {0: 1, 1: 1, 2: 1, 3: 1})
+        self.assertEqual(counts['schools'], {7: 2})
+        self.assertEqual(counts['verified'], 1)
+        self.assertEqual([band['count'] for band in counts['price_bands']], [1, 2, 1, 0, 0])
+        self.assertEqual(counts['min_rating']['4'], 2)
+
+    @override_settings(DORM_FACET_CATALOG_MAX_AGE=60)
+    def test_catalog_and_counts_expire_without_a_version_bump(self):
+        from django.http import QueryDict
+
+        from .facets import VersionedFacetCatalog
+
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        Dorm.objects.create(
+            landlord=landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'),
+            description='desc', approval_status='approved',
+        )
+        facets = VersionedFacetCatalog()
+        listed = Dorm.objects.filter(available=True, approval_status='approved')
+        params = QueryDict('')
+        cache.clear()
+        self.assertEqual(facets.counts_for(listed, params, 'test')['total'], 1)
+
+        # Written by a command process whose version bump this process never sees.
+        Dorm.objects.create(
+            landlord=landlord, name='Other', address='Taft Avenue', price=Decimal('4000'),
+            description='desc', approval_status='approved',
+        )
+        self.assertEqual(facets.counts_for(listed, params, 'test')['total'], 1)
+        facets._catalog._built_at -= 61
+        self.assertEqual(facets.counts_for(listed, params, 'test')['total'], 2)
+
+
+class VersionedValueTests(TestCase):
+    def test_rebuilds_only_when_another_writer_moves_the_version(self):
+        from .versioning import VersionedValue, bump_version
+
+        builds = []
+        value = VersionedValue('test value', lambda: builds.append(1) or [len(builds)], 'test_versioned_value')
+        self.assertEqual(value.get(), [1])
+        value.apply_local_write(lambda items: items.append('local'))
+        self.assertEqual(value.get(), [1, 'local'])
+        self.assertEqual(len(builds), 1)
+        bump_version('test_versioned_value')
+        self.assertEqual(value.get(), [2])
+
+
+class MapDataApiTests(TestCase):
+    def setUp(self):
+        from .map_data import map_data
+
+        map_data.reset()
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        School.objects.create(
+            name='University of Santo Tomas', address='España, Sampaloc',
+            latitude=Decimal('14.609600'), longitude=Decimal('120.989900'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorm = Dorm.objects.create(
+                landlord=landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'), description='desc',
+                latitude=Decimal('14.609100'), longitude=Decimal('120.989700'), approval_status='approved',
+            )
+
+    def test_payload_revalidates_until_a_listed_dorm_changes(self):
+        response = self.client.get('/dormitory/api/map/data/')
+        etag = response['ETag']
+        payload = response.json()
+        self.assertEqual([dorm['id'] for dorm in payload['dorms']], [self.dorm.id])
+        self.assertEqual(len(payload['schools']), 1)
+        self.assertEqual(self.client.get('/dormitory/api/map/data/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        schools = self.client.get('/dormitory/api/map/data/', {'layer': 'schools'})
+        self.assertEqual(list(schools.json()), ['schools'])
+        self.assertNotEqual(schools['ETag'], etag)
+
+        dorm = Dorm.objects.get(pk=self.dorm.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            dorm.price = Decimal('4500')
+            dorm.save()
+        response = self.client.get('/dormitory/api/map/data/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['dorms'][0]['price'], 4500.0)
+        # Schools did not change, so their layer still revalidates.
+        self.assertEqual(
+            self.client.get('/dormitory/api/map/data/', {'layer': 'schools'}, HTTP_IF_NONE_MATCH=schools['ETag']).status_code,
+            304,
+        )
+
+
+class ClusterGridTests(TestCase):
+    BOX = (14.4, 120.8, 14.8, 121.2)
+
+    def setUp(self):
+        from .clusters import ClusterGrid
+
+        self.grid = ClusterGrid()
+        points = {
+            1: (14.60000, 120.98000),
+            2: (14.60030, 120.98030),
+            3: (14.60060, 120.98060),
+            4: (14.67600, 121.04370),
+        }
+        for item_id, (lat, lng) in points.items():
+            self.grid.insert(item_id, lat, lng)
+
+    def test_counts_split_as_the_map_zooms_in(self):
+        from .clusters import MAX_CLUSTER_ZOOM
+
+        for zoom in range(MAX_CLUSTER_ZOOM + 1):
+            self.assertEqual(sum(marker['count'] for marker in self.grid.clusters(*self.BOX, zoom)), 4, zoom)
+        world, = self.grid.clusters(*self.BOX, 0)
+        self.assertEqual(world['count'], 4)
+        self.assertAlmostEqual(world['lat'], (14.6 + 14.6003 + 14.6006 + 14.676) / 4)
+        split = self.grid.clusters(*self.BOX, world['expansion_zoom'])
+        self.assertGreater(len(split), 1)
+        self.assertIn({'id': 4, 'lat': 14.676, 'lng': 121.0437, 'count': 1}, split)
+
+        # Past the deepest level every dorm in the box is its own marker.
+        street = self.grid.clusters(14.599, 120.979, 14.601, 120.981, MAX_CLUSTER_ZOOM + 1)
+        self.assertEqual(sorted(marker['id'] for marker in street), [1, 2, 3])
+
+    def test_moves_and_removals_update_the_aggregates(self):
+        self.grid.remove(4)
+        self.grid.insert(2, 14.67600, 121.04370)
+        world, = self.grid.clusters(*self.BOX, 0)
+        self.assertEqual(world['count'], 3)
+        self.assertAlmostEqual(world['lng'], (120.98 + 121.0437 + 120.9806) / 3)
+        self.grid.remove(2)
+        self.grid.remove(99)
+        self.assertEqual(len(self.grid), 2)
+
+
+class MapClustersApiTests(TestCase):
+    def setUp(self):
+        from .clusters import dorm_cluster_index
+        from .map_data import map_data
+
+        dorm_cluster_index.reset()
+        map_data.reset()
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorms = [
+                Dorm.objects.create(
+                    landlord=landlord, name=f'Dorm {i}', address='España', price=Decimal('4000'), description='desc',
+                    latitude=Decimal('14.609100') + Decimal('0.000300') * i, longitude=Decimal('120.989700'),
+                    approval_status=status,
+                )
+                for i, status in enumerate(['approved', 'approved', 'pending'])
+            ]
+
+    def test_listed_dorms_cluster_and_split_by_zoom(self):
+        bbox = '120.98,14.60,121.00,14.62'
+        response = self.client.get('/dormitory/api/map/clusters/', {'bbox': bbox, 'zoom': 5})
+        cluster, = response.json()['clusters']
+        self.assertEqual(cluster['count'], 2)
+
+        markers = self.client.get('/dormitory/api/map/clusters/', {'bbox': bbox, 'zoom': 20}).json()['clusters']
+        self.assertEqual(sorted(marker['id'] for marker in markers), [self.dorms[0].id, self.dorms[1].id])
+        self.assertEqual({marker['dorm']['name'] for marker in markers}, {'Dorm 0', 'Dorm 1'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dorms[1].delete()
+        markers = self.client.get('/dormitory/api/map/clusters/', {'bbox': bbox, 'zoom': 5}).json()['clusters']
+        self.assertEqual([marker['id'] for marker in markers], [self.dorms[0].id])
+
+    def test_bad_viewport_is_rejected(self):
+        self.assertEqual(self.client.get('/dormitory/api/map/clusters/', {'bbox': '1,2,3'}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/dormitory/api/map/clusters/', {'bbox': '120.98,14.60,121.00,14.62', 'zoom': 'x'}).status_code,
+            400,
+        )
+
+
+class MapViewportApiTests(TestCase):
+    def setUp(self):
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        for name, price in (('Cheap', '3000'), ('Pricey', '9000')):
+            Dorm.objects.create(
+                landlord=landlord, name=name, address='Taft Avenue', price=Decimal(price), description='desc',
+                latitude=Decimal('14.600000'), longitude=Decimal('120.980000'), approval_status='approved',
+            )
+        self.bbox = {'min_lat': '14.5', 'max_lat': '14.7', 'min_lng': '120.9', 'max_lng': '121.1'}
+
+    def test_price_filters(self):
+        response = self.client.get('/dormitory/api/map/dorms/', {**self.bbox, 'target_price': '5000'})
+        self.assertEqual([dorm['name'] for dorm in response.json()['dorms']], ['Cheap'])
+
+    def test_malformed_price_is_rejected(self):
+        for value in ('abc', 'NaN', '-1', '1e99'):
+            response = self.client.get('/dormitory/api/map/dorms/', {**self.bbox, 'min_price': value})
+            self.assertEqual(response.status_code, 400, value)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class LocationFilterTests(TestCase):
+    def setUp(self):
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            # Near the Intramuros preset, and about 9 km north of it.
+            self.near = Dorm.objects.create(
+                landlord=landlord, name='Near', address='Intramuros', price=Decimal('4000'), description='desc',
+                latitude=Decimal('14.590000'), longitude=Decimal('120.975000'), approval_status='approved',
+            )
+            Dorm.objects.create(
+                landlord=landlord, name='Far', address='Quezon City', price=Decimal('4000'), description='desc',
+                latitude=Decimal('14.670000'), longitude=Decimal('121.000000'), approval_status='approved',
+            )
+        self.tenant = CustomUser.objects.create_user(
+            username='tenant', password='x', email='tenant@example.com', user_type='tenant',
+        )
+
+    def test_preset_location_limits_nearest_first_on_both_lists(self):
+        self.client.force_login(self.tenant)
+        params = {'location': 'intramuros', 'sort': 'distance'}
+        for url in ('/dormitory/list/', '/dormitory/browse/'):
+            response = self.client.get(url, params)
+            self.assertEqual([dorm.name for dorm in response.context['dorms']], ['Near'], url)
+
+    def test_must_have_checkboxes_filter_both_lists(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near.amenities.add(Amenity.objects.create(name='Free WiFi'))
+        self.client.force_login(self.tenant)
+        for url in ('/dormitory/list/', '/dormitory/browse/'):
+            response = self.client.get(url, {'must_have': ['wifi', 'bogus']})
+            self.assertEqual([dorm.name for dorm in response.context['dorms']], ['Near'], url)
+            self.assertEqual(response.context['selected_must_have'], ['wifi'], url)
+            self.assertContains(response, 'name="_must_have" value="wifi" checked')
+            self.assertContains(response, '<input type="hidden" name="must_have" value="wifi">')
+
+
+class SimilarityRefreshTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.wifi = Amenity.objects.create(name='WiFi')
+
+    def test_one_refresh_per_transaction(self):
+        with mock.patch('dormitory.similarity.refresh_dorm_similarities') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                dorm = Dorm.objects.create(
+                    landlord=self.landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'),
+                    description='desc', latitude=Decimal('14.6'), longitude=Decimal('120.98'),
+                )
+                dorm.amenities.add(self.wifi)
+                dorm.price = Decimal('4500')
+                dorm.save()
+        refresh.assert_called_once_with([dorm.pk])
+
+    def create_listed(self, name, price):
+        dorm = Dorm.objects.create(
+            landlord=self.landlord, name=name, address='Taft Avenue', price=Decimal(price), description='desc',
+            latitude=Decimal('14.6'), longitude=Decimal('120.98'), approval_status='approved',
+        )
+        dorm.amenities.add(self.wifi)
+        return dorm
+
+    def test_save_rebuilds_only_the_saved_dorms_list(self):
+        from .models import DormSimilarity
+        from .similarity import similar_dorms_for
+
+        with self.captureOnCommitCallbacks(execute=True):
+            base = self.create_listed('Base', '4000')
+            twin = self.create_listed('Twin', '4000')
+        self.assertEqual([dorm.id for dorm in similar_dorms_for(base)], [twin.id])
+        before = list(DormSimilarity.objects.filter(dorm=base).values_list('similar_id', 'score', 'rank'))
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = self.create_listed('Newcomer', '4000')
+        self.assertEqual(
+            list(DormSimilarity.objects.filter(dorm=base).values_list('similar_id', 'score', 'rank')), before,
+        )
+        self.assertEqual({dorm.id for dorm in similar_dorms_for(newcomer)}, {base.id, twin.id})
+
+    def test_backfill_migration_matches_the_rebuild_command(self):
+        import importlib
+
+        from django.apps import apps
+        from django.core.management import call_command
+
+        from .models import DormSimilarity
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(6):
+                self.create_listed(f'Dorm {index}', 3000 + index * 250)
+            Dorm.objects.create(
+                landlord=self.landlord, name='Pending', address='x', price=Decimal('3000'), description='d',
+            )
+        call_command('rebuild_dorm_similarities', stdout=open('/dev/null', 'w'))
+        rebuilt = set(DormSimilarity.objects.values_list('dorm_id', 'similar_id', 'rank'))
+        migration = importlib.import_module('dormitory.migrations.0072_backfill_dorm_similarity')
+        migration.backfill_similarities(apps, None)
+        self.assertEqual(set(DormSimilarity.objects.values_list('dorm_id', 'similar_id', 'rank')), rebuilt)
+
+    def test_rolled_back_batch_is_not_reused(self):
+        with mock.patch('dormitory.similarity.refresh_dorm_similarities') as refresh:
+            try:
+                with transaction.atomic():
+                    Dorm.objects.create(
+                        landlord=self.landlord, name='Gone', address='x', price=Decimal('4000'), description='d',
+                    )
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with self.captureOnCommitCallbacks(execute=True):
+                dorm = Dorm.objects.create(
+                    landlord=self.landlord, name='Kept', address='x', price=Decimal('4000'), description='d',
+                )
+        refresh.assert_called_once_with([dorm.pk])
+
+
+@override_settings(DORM_VIEW_FLUSH_INTERVAL=0, DORM_VIEW_DEDUPE_WINDOW=0, DORM_VIEW_BUCKET_SECONDS=10)
+class ViewCountTests(TestCase):
+    def setUp(self):
+        from .view_counts import _counters
+
+        _counters().clear()
+        cache.clear()
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.dorm = Dorm.objects.create(
+            landlord=landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'), description='desc',
+        )
+        self.now = 1_000_000.0
+
+    def view(self, ip='10.0.0.1'):
+        from .view_counts import record_view
+
+        request = RequestFactory().get('/', REMOTE_ADDR=ip)
+        request.user = AnonymousUser()
+        with mock.patch('dormitory.view_counts.time.time', return_value=self.now):
+            return record_view(request, self.dorm.pk)
+
+    def flush(self):
+        from .view_counts import flush_view_counts
+
+        with mock.patch('dormitory.view_counts.time.time', return_value=self.now):
+            return flush_view_counts()
+
+    def test_views_flush_once_their_bucket_closes(self):
+        from .models import DormDailyStats
+        from .view_counts import _counters, _pending_key, current_bucket
+
+        for _view in range(3):
+            self.assertTrue(self.view())
+        with mock.patch('dormitory.view_counts.time.time', return_value=self.now):
+            bucket = current_bucket()
+        self.assertEqual(self.flush(), (0, 0))
+
+        self.now += 20
+        self.view()
+        self.assertEqual(self.flush(), (1, 3))
+        self.dorm.refresh_from_db()
+        self.assertEqual(self.dorm.recent_views, 3)
+        self.assertEqual(DormDailyStats.objects.get(dorm=self.dorm).views, 3)
+        self.assertIsNone(_counters().get(_pending_key(bucket, self.dorm.pk)))
+
+        self.assertEqual(self.flush(), (0, 0))
+        self.now += 20
+        self.assertEqual(self.flush(), (1, 1))
+        self.dorm.refresh_from_db()
+        self.assertEqual(self.dorm.recent_views, 4)
+
+    @override_settings(DORM_VIEW_FLUSH_INTERVAL=3600, DORM_VIEW_FLUSH_MAX_PENDING=2)
+    def test_requests_flush_every_max_pending_views_between_intervals(self):
+        self.view()
+        self.now += 20
+        self.view()
+        self.dorm.refresh_from_db()
+        self.assertEqual(self.dorm.recent_views, 1)
+        self.now += 20
+        self.view()
+        self.dorm.refresh_from_db()
+        self.assertEqual(self.dorm.recent_views, 1)
+        self.view()
+        self.dorm.refresh_from_db()
+        self.assertEqual(self.dorm.recent_views, 2)
+
+    @override_settings(DORM_VIEW_DEDUPE_WINDOW=60)
+    def test_repeat_views_are_deduplicated(self):
+        self.assertTrue(self.view())
+        self.assertFalse(self.view())
+        self.assertTrue(self.view(ip='10.0.0.2'))
+        self.now += 20
+        self.assertEqual(self.flush(), (1, 2))
+
+
+class ResultCacheKeyTests(TestCase):
+    def test_only_filter_and_sort_params_split_the_cache(self):
+        from django.http import QueryDict
+
+        from .result_cache import dorm_results
+
+        key = dorm_results.key_for(QueryDict('search=taft&amenities=2&amenities=1&sort=price_asc'), 'View')
+        self.assertEqual(
+            dorm_results.key_for(QueryDict('amenities=1&amenities=2&search=taft&sort=price_asc&utm_source=x&page=3'), 'View'),
+            key,
+        )
+        self.assertNotEqual(dorm_results.key_for(QueryDict('search=taft&amenities=1&sort=price_asc'), 'View'), key)
+
+
+class DormRecommenderTests(TestCase):
+    def setUp(self):
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.dorms = [
+            Dorm.objects.create(
+                landlord=landlord, name=f'Dorm {i}', address='Taft Avenue', price=Decimal(2000 + i * 100),
+                description='desc', latitude=Decimal('14.6'), longitude=Decimal('120.98'), approval_status='approved',
+            )
+            for i in range(80)
+        ]
+
+    def test_narrow_candidates_still_get_neighbours(self):
+        import os
+        import tempfile
+
+        from .recommendations import DormRecommender, save_model, train_model
+
+        path = os.path.join(tempfile.mkdtemp(), 'recommender.joblib')
+        save_model(train_model(), path)
+        recommender = DormRecommender(path)
+        # Only the most expensive dorms pass the tenant's filters, far outside any small neighbour pool.
+        candidates = {dorm.id for dorm in self.dorms[-5:]}
+        bundle, _positions = recommender._current()
+        with mock.patch.object(bundle['index'], 'kneighbors', wraps=bundle['index'].kneighbors) as kneighbors:
+            found = recommender.neighbours([self.dorms[0].id], k=3, candidates=candidates)
+        self.assertEqual(found, [dorm.id for dorm in self.dorms[-5:-2]])
+        # The fitted index answers the query, widening past the first over-fetch.
+        self.assertEqual([call.kwargs['n_neighbors'] for call in kneighbors.call_args_list], [12, 24, 48, 80])
+        self.assertEqual(recommender.neighbours([self.dorms[0].id], k=2), [self.dorms[1].id, self.dorms[2].id])
+
+
+class DashboardCacheKeyTests(TestCase):
+    def test_rebuilds_in_other_processes_change_the_key(self):
+        import os
+        import tempfile
+
+        from .dashboard_cache import cache_key
+        from .models import DormCollaborativeNeighbour
+        from .recommendations import save_model, train_model
+
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        dorms = [
+            Dorm.objects.create(
+                landlord=landlord, name=f'Dorm {i}', address='Taft Avenue', price=Decimal(2000 + i * 100),
+                description='desc', latitude=Decimal('14.6'), longitude=Decimal('120.98'), approval_status='approved',
+            )
+            for i in range(3)
+        ]
+        path = os.path.join(tempfile.mkdtemp(), 'recommender.joblib')
+        with override_settings(RECOMMENDER_MODEL_PATH=path):
+            before = cache_key(7)
+            save_model(train_model(), path)
+            after_training = cache_key(7)
+            DormCollaborativeNeighbour.objects.create(dorm=dorms[0], neighbour=dorms[1], score=1.0, rank=1)
+            after_rebuild = cache_key(7)
+            self.assertEqual(len({before, after_training, after_rebuild}), 3)
+            self.assertEqual(cache_key(7), after_rebuild)
+
+
+@override_settings(COLLABORATIVE_HALF_LIFE_DAYS=30)
+class CollaborativeFilterTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        self.now = timezone.now()
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.tenants = [
+            CustomUser.objects.create_user(
+                username=f'tenant{i}', password='x', email=f'tenant{i}@example.com', user_type='tenant',
+            )
+            for i in range(3)
+        ]
+        self.dorms = {
+            name: Dorm.objects.create(
+                landlord=landlord, name=name, address='Taft Avenue', price=Decimal('4000'), description='desc',
+                approval_status=status,
+            )
+            for name, status in [('A', 'approved'), ('B', 'approved'), ('C', 'approved'), ('D', 'pending')]
+        }
+
+    def interact(self, tenant, dorm, kind, days_ago=0, seconds_ago=0):
+        from datetime import timedelta
+
+        from user_profile.models import FavoriteDorm, UserInteraction
+
+        moment = self.now - timedelta(days=days_ago, seconds=seconds_ago)
+        if kind == 'favorite':
+            favorite = FavoriteDorm.objects.create(user_profile=tenant.userprofile, dorm=self.dorms[dorm])
+            FavoriteDorm.objects.filter(pk=favorite.pk).update(added_date=moment)
+        else:
+            interaction = UserInteraction.objects.create(user=tenant, dorm=self.dorms[dorm], interaction_type=kind)
+            UserInteraction.objects.filter(pk=interaction.pk).update(timestamp=moment)
+
+    def test_stored_neighbours_match_dense_cosine_similarity(self):
+        from .collaborative import collaborative_dorm_ids, rebuild_collaborative_neighbours
+        from .models import DormCollaborativeNeighbour
+
+        first, second, third = self.tenants
+        events = [
+            (first, 'A', 'view', 0, 0),
+            (first, 'B', 'view', 0, 0),
+            (first, 'B', 'view', 0, 60),
+            (second, 'A', 'favorite', 0, 0),
+            (second, 'C', 'book', 30, 0),
+            (third, 'B', 'view', 0, 0),
+            (third, 'D', 'view', 0, 0),
+            # Past the horizon of ten half-lives: ignored.
+            (third, 'C', 'view', 400, 0),
+        ]
+        for event in events:
+            self.interact(*event)
+        self.assertEqual(rebuild_collaborative_neighbours(now=self.now), (4, 5))
+
+        weights = {'view': 1.0, 'favorite': 3.0, 'book': 5.0}
+        names = 'ABCD'
+        matrix = np.zeros((len(self.tenants), len(names)))
+        for tenant, dorm, kind, days_ago, seconds_ago in events[:-1]:
+            age_days = days_ago + seconds_ago / 86400
+            matrix[self.tenants.index(tenant), names.index(dorm)] += weights[kind] * 0.5 ** (age_days / 30)
+        matrix = np.log1p(matrix)
+        matrix /= np.linalg.norm(matrix, axis=0)
+        expected = matrix.T @ matrix
+
+        stored = {
+            (row.dorm.name, row.neighbour.name): (row.score, row.rank)
+            for row in DormCollaborativeNeighbour.objects.select_related('dorm', 'neighbour')
+        }
+        # The pending dorm D has neighbours of its own but is never one.
+        self.assertEqual(sorted(stored), [('A', 'B'), ('A', 'C'), ('B', 'A'), ('C', 'A'), ('D', 'B')])
+        for (dorm, neighbour), (score, _rank) in stored.items():
+            self.assertAlmostEqual(score, expected[names.index(dorm), names.index(neighbour)])
+        self.assertGreater(stored[('A', 'C')][0], stored[('A', 'B')][0])
+        self.assertEqual((stored[('A', 'C')][1], stored[('A', 'B')][1]), (1, 2))
+
+        # Scores are summed across the seeds, and excluded dorms are skipped.
+        ids = {dorm.id: name for name, dorm in self.dorms.items()}
+        self.assertEqual([ids[i] for i in collaborative_dorm_ids([self.dorms['B'].id, self.dorms['C'].id])], ['A'])
+        self.assertEqual(
+            [ids[i] for i in collaborative_dorm_ids([self.dorms['A'].id], exclude=[self.dorms['C'].id])], ['B'],
+        )
+
+
+class DailyStatsTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.tenant = CustomUser.objects.create_user(
+            username='tenant', password='x', email='tenant@example.com', user_type='tenant',
+        )
+        self.dorm = Dorm.objects.create(
+            landlord=self.landlord, name='Dorm', address='Taft Avenue', price=Decimal('4000'),
+            description='desc', approval_status='approved',
+        )
+
+    def record_activity(self):
+        from user_profile.models import FavoriteDorm, UserProfile
+
+        from .models import Message, Reservation
+        from .models_transaction import TransactionLog
+
+        profile, _created = UserProfile.objects.get_or_create(user=self.tenant)
+        FavoriteDorm.objects.create(user_profile=profile, dorm=self.dorm)
+        reservation = Reservation.objects.create(dorm=self.dorm, tenant=self.tenant)
+        Message.objects.create(sender=self.tenant, receiver=self.landlord, dorm=self.dorm, content='hi')
+        # Logged without a dorm: attributed through the reservation.
+        TransactionLog.objects.create(
+            landlord=self.landlord, transaction_type='payment_received', reservation=reservation,
+            amount=Decimal('1500'), description='x',
+        )
+
+    def test_rollup_counts_each_dorm_day_once(self):
+        from django.utils import timezone
+
+        from .daily_stats import rollup_daily_stats
+        from .models import DormDailyStats
+
+        self.record_activity()
+        today = timezone.localdate()
+        rollup_daily_stats(today, today)
+        rollup_daily_stats(today, today)
+        row = DormDailyStats.objects.get(dorm=self.dorm, day=today)
+        self.assertEqual(
+            (row.favorites, row.reservations, row.messages, row.revenue), (1, 1, 1, Decimal('1500')),
+        )
+        self.assertEqual(DormDailyStats.objects.count(), 1)
+
+    def test_charts_count_days_the_rollup_has_not_reached(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .daily_stats import landlord_monthly_stats
+        from .models import DormDailyStats
+
+        today = timezone.localdate()
+        month = today.replace(day=1)
+        # A stale rollup row for today (the cron last ran before the activity) and views flushed today.
+        DormDailyStats.objects.create(dorm=self.dorm, day=today, views=3, reservations=7)
+        self.record_activity()
+        stats = landlord_monthly_stats(self.landlord, today - timedelta(days=180))
+        self.assertEqual(stats[month]['views'], 3)
+        self.assertEqual(stats[month]['reservations'], 1)
+        self.assertEqual(stats[month]['revenue'], Decimal('1500'))
+
+        older = today - timedelta(days=40)
+        DormDailyStats.objects.create(dorm=self.dorm, day=older, reservations=2, revenue=Decimal('300'))
+        stats = landlord_monthly_stats(self.landlord, today - timedelta(days=180))
+        self.assertEqual(stats[older.replace(day=1)]['reservations'], 2)
+        self.assertEqual(stats[month]['reservations'], 1)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        from . import trending
+
+        trending._ranking.reset()
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.tenant = CustomUser.objects.create_user(
+            username='tenant', password='x', email='tenant@example.com', user_type='tenant',
+        )
+        self.old, self.new = [
+            Dorm.objects.create(
+                landlord=landlord, name=name, address='Taft Avenue', price=Decimal('4000'),
+                description='desc', approval_status='approved', recent_views=views,
+            )
+            for name, views in (('Old', 1000), ('New', 20))
+        ]
+
+    def tearDown(self):
+        from . import trending
+
+        trending._ranking.reset()
+
+    def test_recent_engagement_outranks_old_views_and_decays(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from user_profile.models import FavoriteDorm, UserProfile
+
+        from .models import DormTrendingScore
+        from .trending import trending_dorm_ids, update_trending_scores
+
+        now = timezone.now()
+        Dorm.objects.filter(pk=self.old.pk).update(created_at=now - timedelta(days=365))
+        update_trending_scores(now)
+        self.assertEqual(trending_dorm_ids(), [self.new.id, self.old.id])
+
+        profile, _created = UserProfile.objects.get_or_create(user=self.tenant)
+        FavoriteDorm.objects.create(user_profile=profile, dorm=self.old)
+        Dorm.objects.filter(pk=self.old.pk).update(recent_views=1030)
+        update_trending_scores(now + timedelta(hours=1))
+        self.assertEqual(trending_dorm_ids(), [self.old.id, self.new.id])
+
+        score = DormTrendingScore.objects.get(dorm=self.old).score
+        update_trending_scores(now + timedelta(hours=73))
+        self.assertAlmostEqual(DormTrendingScore.objects.get(dorm=self.old).score, score / 2, places=3)
+
+    def test_ranking_follows_the_stored_scores_within_max_age(self):
+        from django.utils import timezone
+
+        from .models import DormTrendingScore
+        from .trending import TRENDING_MAX_AGE, _ranking, trending_dorm_ids
+
+        now = timezone.now()
+        DormTrendingScore.objects.create(dorm=self.old, score=1.0, updated_at=now)
+        DormTrendingScore.objects.create(dorm=self.new, score=2.0, updated_at=now)
+        self.assertEqual(trending_dorm_ids(), [self.new.id, self.old.id])
+
+        # A pass in the cron process: scores change without touching this process's cache.
+        DormTrendingScore.objects.filter(dorm=self.old).update(score=3.0)
+        Dorm.objects.filter(pk=self.new.pk).update(available=False)
+        self.assertEqual(trending_dorm_ids(), [self.new.id, self.old.id])
+        _ranking._built_at -= TRENDING_MAX_AGE + 1
+        self.assertEqual(trending_dorm_ids(), [self.old.id])
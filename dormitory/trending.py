@@ -0,0 +1,159 @@
+"""
+Time-decayed trending scores for the "popular dorms" sections.
+
+Each dorm's score is a sum of engagement events (views, favorites,
+reservations) weighted by ``exp(-ln 2 * age / half_life)``, so a burst of
+interest fades instead of accumulating forever like ``recent_views``. The
+``update_trending`` pass advances every stored score to "now" (one
+multiplication) and folds in the events since the dorm's last pass; railway
+runs it every 15 minutes. Web processes rank the top listed dorms from the
+stored scores and keep that list for at most ``TRENDING_MAX_AGE`` seconds,
+so each worker sees a pass within one refresh however the cache is set up.
+
+Views have no per-event timestamps: the pass counts the growth of
+``Dorm.recent_views`` since the previous pass as happening now, and on a
+dorm's first pass dates its existing views at the listing's creation.
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Dorm, DormTrendingScore, Reservation
+from .versioning import VersionedValue
+
+logger = logging.getLogger(__name__)
+
+TRENDING_VERSION = 'dorm_trending'
+TRENDING_MAX_AGE = 300
+TRENDING_LIST_SIZE = 24
+EVENT_WEIGHTS = {
+    'view': 1.0,
+    'favorite': 5.0,
+    'reservation': 10.0,
+}
+# Events older than this many half-lives add less than 0.1% of their weight.
+HORIZON_HALF_LIVES = 10
+
+
+def half_life_seconds():
+    return float(getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72)) * 3600
+
+
+def _decay(ages_seconds, half_life):
+    return np.exp(-math.log(2) * np.maximum(ages_seconds, 0.0) / half_life)
+
+
+def _seconds_before(now, moments):
+    return np.array([(now - moment).total_seconds() for moment in moments], dtype=np.float64)
+
+
+def update_trending_scores(now=None, batch_size=1000):
+    """Advance every dorm's score to ``now`` and store it; returns dorms scored."""
+    from user_profile.models import FavoriteDorm
+
+    now = now or timezone.now()
+    half_life = half_life_seconds()
+    horizon = now - timedelta(seconds=half_life * HORIZON_HALF_LIVES)
+
+    dorms = list(Dorm.objects.order_by('id').values_list('id', 'recent_views', 'created_at'))
+    if not dorms:
+        return 0
+    ids = np.array([row[0] for row in dorms], dtype=np.int64)
+    positions = {dorm_id: position for position, dorm_id in enumerate(ids.tolist())}
+    views = np.array([row[1] for row in dorms], dtype=np.float64)
+
+    # Previous scores decay to now; new dorms start from zero.
+    scores = np.zeros(len(ids))
+    views_seen = np.zeros(len(ids))
+    last_pass = np.full(len(ids), horizon.timestamp())
+    known = np.zeros(len(ids), dtype=bool)
+    for dorm_id, score, seen, updated_at in DormTrendingScore.objects.values_list(
+        'dorm_id', 'score', 'views_seen', 'updated_at',
+    ).iterator():
+        position = positions.get(dorm_id)
+        if position is None:
+            continue
+        scores[position] = score * _decay((now - updated_at).total_seconds(), half_life)
+        views_seen[position] = seen
+        last_pass[position] = updated_at.timestamp()
+        known[position] = True
+
+    new_views = np.maximum(views - views_seen, 0.0)
+    view_age = np.where(known, 0.0, _seconds_before(now, [row[2] for row in dorms]))
+    scores += EVENT_WEIGHTS['view'] * new_views * _decay(view_age, half_life)
+
+    since = datetime.fromtimestamp(last_pass.min(), tz=dt_timezone.utc)
+    events = (
+        ('favorite', FavoriteDorm.objects.filter(added_date__gt=since, added_date__lte=now)
+         .values_list('dorm_id', 'added_date')),
+        ('reservation', Reservation.objects.filter(created_at__gt=since, created_at__lte=now)
+         .values_list('dorm_id', 'created_at')),
+    )
+    for kind, rows in events:
+        rows = [(positions[dorm_id], moment) for dorm_id, moment in rows.iterator() if dorm_id in positions]
+        if not rows:
+            continue
+        event_positions = np.array([position for position, _moment in rows], dtype=np.int64)
+        moments = np.array([moment.timestamp() for _position, moment in rows], dtype=np.float64)
+        # Events a dorm's previous pass already counted are skipped.
+        fresh = moments > last_pass[event_positions]
+        weights = EVENT_WEIGHTS[kind] * _decay(now.timestamp() - moments[fresh], half_life)
+        np.add.at(scores, event_positions[fresh], weights)
+
+    with transaction.atomic():
+        DormTrendingScore.objects.bulk_create(
+            [
+                DormTrendingScore(dorm_id=dorm_id, score=score, views_seen=seen, updated_at=now)
+                for dorm_id, score, seen in zip(ids.tolist(), scores.tolist(), views.astype(np.int64).tolist())
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['dorm'],
+            update_fields=['score', 'views_seen', 'updated_at'],
+        )
+    _ranking.invalidate()
+    logger.info("Updated trending scores for %s dorms", len(ids))
+    return len(ids)
+
+
+def _load_ranking():
+    return list(
+        DormTrendingScore.objects.filter(
+            score__gt=0,
+            dorm__available=True,
+            dorm__approval_status='approved',
+        ).order_by('-score', 'dorm_id').values_list('dorm_id', flat=True)[:TRENDING_LIST_SIZE]
+    )
+
+
+_ranking = VersionedValue('trending ranking', _load_ranking, TRENDING_VERSION, TRENDING_MAX_AGE)
+
+
+def trending_dorm_ids():
+    """Ranked ids of the top listed dorms as of the last trending pass."""
+    return _ranking.get()
+
+
+def trending_dorms(limit=6):
+    """
+    The ``limit`` top trending listed dorms, in rank order. Falls back to
+    most viewed when no trending pass has run yet.
+    """
+    listed = Dorm.objects.select_related('landlord').prefetch_related(
+        'images', 'amenities'
+    ).filter(
+        available=True,
+        approval_status='approved',
+    )
+    dorm_ids = trending_dorm_ids()
+    if not dorm_ids:
+        return list(listed.order_by('-recent_views', '-avg_rating')[:limit])
+    rank = {dorm_id: position for position, dorm_id in enumerate(dorm_ids)}
+    dorms = sorted(listed.filter(id__in=dorm_ids), key=lambda dorm: rank[dorm.id])
+    return dorms[:limit]
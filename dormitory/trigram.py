@@ -0,0 +1,154 @@
+"""
+Typo-tolerant name matching for schools and dorms.
+
+On PostgreSQL the ``pg_trgm`` extension answers with ``word_similarity`` over
+GIN trigram indexes. Elsewhere a process-level trigram inverted index is
+built from the database and rebuilt when the names' version stamp moves.
+
+Scores follow pg_trgm's word similarity: the share of the query's trigrams
+found in the name, so "Adamsun" still finds "Adamson University".
+"""
+
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import connection
+
+from .versioning import VersionedValue
+
+SCHOOL_NAMES_VERSION = 'school_names'
+DORM_NAMES_VERSION = 'dorm_names'
+
+DEFAULT_THRESHOLD = 0.5
+MIN_QUERY_LENGTH = 3
+
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    """Lowercase, strip accents and split into words."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WORD_RE.findall(stripped.lower())
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in normalize(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Inverted index from trigram to the IDs whose name contains it."""
+
+    def __init__(self, items=()):
+        self._postings = {}
+        self._names = {}
+        for item_id, name in items:
+            self.add(item_id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, item_id, name):
+        self._names[item_id] = name
+        for gram in trigrams(name):
+            self._postings.setdefault(gram, []).append(item_id)
+
+    def search(self, query, threshold=DEFAULT_THRESHOLD, limit=10):
+        """Return [(item_id, score)] sorted by score, best first."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        hits = Counter()
+        for gram in query_grams:
+            hits.update(self._postings.get(gram, ()))
+        total = len(query_grams)
+        matches = [
+            (item_id, count / total) for item_id, count in hits.items()
+            if count / total >= threshold
+        ]
+        matches.sort(key=lambda match: (-match[1], len(self._names[match[0]])))
+        return matches[:limit]
+
+
+class NameTrigramIndex:
+    """Lazily built TrigramIndex over one table's names, refreshed by version stamp."""
+
+    def __init__(self, version_name, load_items):
+        self.version_name = version_name
+        self._index = VersionedValue(
+            f'{version_name} trigram index', lambda: TrigramIndex(load_items()), version_name,
+        )
+
+    def index(self):
+        return self._index.get()
+
+    def invalidate(self):
+        self._index.invalidate()
+
+    def search(self, query, threshold=DEFAULT_THRESHOLD, limit=10):
+        return self.index().search(query, threshold=threshold, limit=limit)
+
+
+def _school_items():
+    from .models import School
+    return list(School.objects.values_list('id', 'name'))
+
+
+def _dorm_items():
+    from .models import Dorm
+    return list(
+        Dorm.objects.filter(available=True, approval_status='approved').values_list('id', 'name')
+    )
+
+
+school_name_index = NameTrigramIndex(SCHOOL_NAMES_VERSION, _school_items)
+dorm_name_index = NameTrigramIndex(DORM_NAMES_VERSION, _dorm_items)
+
+
+# --- pg_trgm (extension and name indexes from migration 0063) ---------------
+
+def _pg_search(table, query, threshold, limit, extra_where=''):
+    # ``<%`` is the indexable form of word_similarity(...) >= threshold.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+            [str(threshold)],
+        )
+        cursor.execute(
+            f'SELECT id, word_similarity(%s, name) AS score FROM {table}'
+            f' WHERE %s <%% name{extra_where}'
+            f' ORDER BY score DESC, length(name) LIMIT %s',
+            [query, query, limit],
+        )
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+# --- Public API -------------------------------------------------------------
+
+def fuzzy_school_matches(query, threshold=DEFAULT_THRESHOLD, limit=10):
+    """Similarity-ranked [(school_id, score)] for a possibly misspelled school name."""
+    query = (query or '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    if connection.vendor == 'postgresql':
+        return _pg_search('dormitory_school', query, threshold, limit)
+    return school_name_index.search(query, threshold=threshold, limit=limit)
+
+
+def fuzzy_dorm_matches(query, threshold=DEFAULT_THRESHOLD, limit=10):
+    """Similarity-ranked [(dorm_id, score)] over approved, available dorm names."""
+    query = (query or '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    if connection.vendor == 'postgresql':
+        return _pg_search(
+            'dormitory_dorm', query, threshold, limit,
+            extra_where=" AND available AND approval_status = 'approved'",
+        )
+    return dorm_name_index.search(query, threshold=threshold, limit=limit)
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    AddDormView, DormListView, DormDetailView,
+    AddDormView, DormListView, DormListPageView, DormDetailView,
     MyDormsView, EditDormView, DeleteDormView,
     RoommateListView, RoommateCreateView, RoommateDetailView,
     RoommateUpdateView, RoommateDeleteView, ToggleRoommateVisibilityView, ReviewListView, 
@@ -33,6 +33,7 @@ urlpatterns = [
     # Protected URLs (login required)
     path("add/", AddDormView.as_view(), name="add_dorm"),
     path("list/", DormListView.as_view(), name="dorm_list"),
+    path("list/page/", DormListPageView.as_view(), name="dorm_list_page"),
     path("dormitory/<int:pk>/", DormDetailView.as_view(), name="dorm_detail"),
     path("my-dorms/", MyDormsView.as_view(), name="my_dorms"),
     path("dormitory/edit/<int:pk>/", EditDormView.as_view(), name="edit_dorm"),
@@ -99,4 +100,7 @@ urlpatterns = [
 
     # Search autocomplete suggestions
     path('api/search-suggestions/', views.search_suggestions, name='search_suggestions'),
+    path('api/map/data/', views.map_data_api, name='map_data'),
+    path('api/map/clusters/', views.map_clusters_api, name='map_clusters'),
+    path('api/map/dorms/', views.map_viewport_api, name='map_viewport'),
 ]
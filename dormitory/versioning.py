@@ -0,0 +1,121 @@
+"""
+Cache-backed version stamps for in-process indexes and cached payloads.
+
+Writers bump a named version after changing the underlying rows; readers
+remember the version they were built against and rebuild when it moves
+(``VersionedValue`` wraps that lifecycle for in-process indexes).
+"""
+
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = 'data_version:'
+
+
+def _version_key(name):
+    return f'{VERSION_KEY_PREFIX}{name}'
+
+
+def get_version(name):
+    """Return the current version number for ``name`` (starts at 1)."""
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(name):
+    """Increment the version for ``name`` and return the new value."""
+    key = _version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing or evicted: start over above the initial version.
+        cache.add(key, 2, timeout=None)
+        return cache.get(key, 2)
+
+
+class VersionedValue:
+    """
+    A process-local value built lazily by ``build()`` and rebuilt once any of
+    ``version_names`` moves (or ``max_age`` seconds after the last build,
+    which bounds staleness when the cache is not shared between processes).
+
+    Used by the in-process indexes (spatial grid, map clusters, BallTree,
+    trigram/suggestion indexes, facet catalog, map payload) so they share one
+    build/version/lock lifecycle. ``max_age`` may be a callable so settings
+    are read at call time.
+    """
+
+    def __init__(self, label, build, version_names, max_age=None):
+        self.label = label
+        self._build = build
+        self.version_names = (version_names,) if isinstance(version_names, str) else tuple(version_names)
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._built_at = 0.0
+
+    def current_version(self):
+        versions = tuple(get_version(name) for name in self.version_names)
+        return versions[0] if len(versions) == 1 else versions
+
+    def _is_stale(self, version):
+        if self._version is None:
+            return True
+        max_age = self._max_age() if callable(self._max_age) else self._max_age
+        if max_age and time.monotonic() - self._built_at > max_age:
+            return True
+        return version != self._version
+
+    def get_with_version(self):
+        """``(value, version it was built against)``, rebuilding it first if stale."""
+        version = self.current_version()
+        if not self._is_stale(version):
+            return self._value, self._version
+        with self._lock:
+            version = self.current_version()
+            if self._is_stale(version):
+                started = time.monotonic()
+                self._value = self._build()
+                self._version = version
+                self._built_at = time.monotonic()
+                logger.info("Built %s in %.1f ms", self.label, (self._built_at - started) * 1000)
+            return self._value, self._version
+
+    def get(self):
+        return self.get_with_version()[0]
+
+    def invalidate(self):
+        """Make every process rebuild on its next read."""
+        for name in self.version_names:
+            bump_version(name)
+
+    def apply_local_write(self, apply):
+        """
+        Bump the (single) version and ``apply(value)`` in place when this
+        process holds a built value. The in-place result is only kept as
+        current if no other writer bumped the version in between.
+        """
+        name, = self.version_names
+        with self._lock:
+            previous = self._version
+            new_version = bump_version(name)
+            if self._value is None:
+                return
+            apply(self._value)
+            if previous is not None and new_version == previous + 1:
+                self._version = new_version
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._version = None
@@ -0,0 +1,209 @@
+"""
+Buffered ``recent_views`` counter.
+
+Detail pages add a view to a cache counter (atomic ``incr``) rather than
+writing the dorm row. Counters live in time buckets of
+``DORM_VIEW_BUCKET_SECONDS``: a view goes into the current bucket, and the
+first view of a dorm in a bucket appends the dorm id to that bucket's dirty
+list. ``flush_view_counts`` only drains closed buckets (older than the
+previous one, so a request that read the clock just before the boundary can
+still finish its ``incr``). It reads the dirty ids and their counts, moves
+them into the database with ``F()`` updates, one UPDATE per distinct delta
+(and into today's ``DormDailyStats`` row), and deletes the bucket's keys.
+Nothing writes to a closed bucket, so deleting it cannot drop a view, and a
+flush touches only the dorms that were viewed.
+
+Requests run the flush themselves: at most once per
+``DORM_VIEW_FLUSH_INTERVAL`` seconds, and also every
+``DORM_VIEW_FLUSH_MAX_PENDING`` recorded views, so a burst of traffic does
+not pile up views in memory until the interval ends. The counters are
+per-process with the configured locmem caches, where a separate command
+process could not see them, so there is no flush command. A worker that
+restarts loses at most its unflushed views: the open buckets plus what it
+recorded since its last flush. The counters use the ``dorm_views`` cache
+when it is configured, so entries culled from the default cache cannot take
+unflushed views with them.
+
+With ``DORM_VIEW_DEDUPE_WINDOW`` > 0, repeat views of a dorm by the same
+user, session or IP within that many seconds are not counted.
+"""
+
+import hashlib
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models import F
+
+from .daily_stats import add_daily_views
+from .models import Dorm
+
+logger = logging.getLogger(__name__)
+
+VIEW_CACHE_ALIAS = 'dorm_views'
+PENDING_KEY_PREFIX = 'dorm_views:pending:'
+DIRTY_KEY_PREFIX = 'dorm_views:dirty:'
+DIRTY_COUNT_KEY_PREFIX = 'dorm_views:dirty_count:'
+SEEN_KEY_PREFIX = 'dorm_views:seen:'
+FLUSHED_THROUGH_KEY = 'dorm_views:flushed_through'
+FLUSH_LOCK_KEY = 'dorm_views:flush_lock'
+RECORDED_KEY = 'dorm_views:recorded'
+FLUSH_RUNNING_KEY = 'dorm_views:flush_running'
+FLUSH_RUNNING_TIMEOUT = 300
+# Buckets looked at when the flushed-through marker is missing (first flush or eviction).
+MAX_UNFLUSHED_BUCKETS = 720
+
+
+def _counters():
+    return caches[VIEW_CACHE_ALIAS] if VIEW_CACHE_ALIAS in settings.CACHES else cache
+
+
+def _pending_key(bucket, dorm_id):
+    return f'{PENDING_KEY_PREFIX}{bucket}:{dorm_id}'
+
+
+def _dirty_key(bucket, position):
+    return f'{DIRTY_KEY_PREFIX}{bucket}:{position}'
+
+
+def _dirty_count_key(bucket):
+    return f'{DIRTY_COUNT_KEY_PREFIX}{bucket}'
+
+
+def dedupe_window():
+    return int(getattr(settings, 'DORM_VIEW_DEDUPE_WINDOW', 0))
+
+
+def flush_interval():
+    return int(getattr(settings, 'DORM_VIEW_FLUSH_INTERVAL', 60))
+
+
+def flush_max_pending():
+    return int(getattr(settings, 'DORM_VIEW_FLUSH_MAX_PENDING', 500))
+
+
+def bucket_seconds():
+    return max(1, int(getattr(settings, 'DORM_VIEW_BUCKET_SECONDS', 10)))
+
+
+def current_bucket():
+    return int(time.time() // bucket_seconds())
+
+
+def _visitor(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key:
+        return f'session:{session_key}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def _incr(counters, key):
+    try:
+        return counters.incr(key)
+    except ValueError:
+        if counters.add(key, 1, timeout=None):
+            return 1
+        return counters.incr(key)
+
+
+def _increment(dorm_id):
+    counters = _counters()
+    bucket = current_bucket()
+    key = _pending_key(bucket, dorm_id)
+    try:
+        counters.incr(key)
+        return
+    except ValueError:
+        pass
+    if not counters.add(key, 1, timeout=None):
+        counters.incr(key)
+        return
+    # First view of this dorm in the bucket: add it to the bucket's dirty list.
+    position = _incr(counters, _dirty_count_key(bucket))
+    counters.set(_dirty_key(bucket, position), dorm_id, timeout=None)
+
+
+def record_view(request, dorm_id):
+    """Count a view of ``dorm_id``; returns False when deduplicated."""
+    window = dedupe_window()
+    if window > 0:
+        visitor = hashlib.sha1(_visitor(request).encode()).hexdigest()
+        if not cache.add(f'{SEEN_KEY_PREFIX}{dorm_id}:{visitor}', 1, timeout=window):
+            return False
+    _increment(dorm_id)
+    counters = _counters()
+    interval = flush_interval()
+    max_pending = flush_max_pending()
+    due = max_pending > 0 and _incr(counters, RECORDED_KEY) % max_pending == 0
+    if (interval > 0 and counters.add(FLUSH_LOCK_KEY, 1, timeout=interval)) or due:
+        flush_view_counts()
+    return True
+
+
+def _bucket_counts(counters, bucket, dirty_count, batch_size):
+    """``({dorm_id: views}, keys to delete)`` for a closed bucket with ``dirty_count`` dirty ids."""
+    keys = [_dirty_count_key(bucket)]
+    counts = {}
+    for start in range(1, dirty_count + 1, batch_size):
+        positions = range(start, min(start + batch_size, dirty_count + 1))
+        dirty_keys = [_dirty_key(bucket, position) for position in positions]
+        dorm_ids = set(counters.get_many(dirty_keys).values())
+        pending_keys = {_pending_key(bucket, dorm_id): dorm_id for dorm_id in dorm_ids}
+        for key, count in counters.get_many(list(pending_keys)).items():
+            if count:
+                counts[pending_keys[key]] = count
+        keys.extend(dirty_keys)
+        keys.extend(pending_keys)
+    return counts, keys
+
+
+def _write_counts(pending):
+    by_delta = defaultdict(list)
+    for dorm_id, count in pending.items():
+        by_delta[count].append(dorm_id)
+    with transaction.atomic():
+        for delta, ids in by_delta.items():
+            Dorm.objects.filter(id__in=ids).update(recent_views=F('recent_views') + delta)
+        add_daily_views(pending)
+
+
+def flush_view_counts(batch_size=1000):
+    """
+    Add the views in closed buckets to ``Dorm.recent_views``; returns
+    (dorms updated, views written). One flush runs at a time across
+    processes that share the cache.
+    """
+    counters = _counters()
+    if not counters.add(FLUSH_RUNNING_KEY, 1, timeout=FLUSH_RUNNING_TIMEOUT):
+        return 0, 0
+    try:
+        last_closed = current_bucket() - 2
+        flushed_through = counters.get(FLUSHED_THROUGH_KEY)
+        first = last_closed - MAX_UNFLUSHED_BUCKETS + 1
+        if flushed_through is not None:
+            first = max(first, flushed_through + 1)
+        dirty_counts = counters.get_many([_dirty_count_key(bucket) for bucket in range(first, last_closed + 1)])
+        pending = defaultdict(int)
+        drained_keys = []
+        for bucket in range(first, last_closed + 1):
+            dirty_count = dirty_counts.get(_dirty_count_key(bucket))
+            if not dirty_count:
+                continue
+            counts, keys = _bucket_counts(counters, bucket, dirty_count, batch_size)
+            for dorm_id, count in counts.items():
+                pending[dorm_id] += count
+            drained_keys.extend(keys)
+        if pending:
+            _write_counts(dict(pending))
+        counters.set(FLUSHED_THROUGH_KEY, max(last_closed, first - 1), timeout=None)
+        counters.delete_many(drained_keys)
+    finally:
+        counters.delete(FLUSH_RUNNING_KEY)
+    if pending:
+        logger.info("Flushed %s views for %s dorms", sum(pending.values()), len(pending))
+    return len(pending), sum(pending.values())
@@ -26,23 +26,43 @@ import os
 from .payment_views import _validate_payment_proof_image, _extract_manual_payment_reference_from_image
 from django.views.generic import View
 from django.utils import timezone
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.db import connection
 from django.db.models import Count, Max
 import time
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from django.db import models
 from .services import RoommateMatchingService
+from .spatial_index import dorm_spatial_index
+from .amenity_bits import AMENITY_BITS, AMENITY_VOCABULARY, mask_for_keys, with_all_amenities
+from .geo import coordinates_of, haversine_km, haversine_one_to_many
+from .school_distances import NEARBY_SCHOOL_RADIUS_KM, annotate_nearest_school, dorms_near_schools
+from .similarity import similar_dorms_for
+from .search import order_by_relevance, search_dorms
+from .trigram import fuzzy_dorm_matches, fuzzy_school_matches
+from .suggestions import suggestion_index
+from .pagination import InvalidCursor, capped_count, keyset_sort, paginate_keyset
+from .facets import dorm_facets
+from .result_cache import dorm_results, hydrate
+from .map_data import MAP_LAYERS, map_data
+from .clusters import dorm_cluster_index
+from .nearest import annotate_distance
+from .view_counts import record_view
+from .trending import trending_dorms
 from django.views.decorators.csrf import csrf_exempt
 from .forms import RoomForm, RoomImageForm
 from django.forms import modelformset_factory
 from django.views.generic import TemplateView
 import json
+import logging
 import re
 from django_ratelimit.decorators import ratelimit
 from django_ratelimit.exceptions import Ratelimited
 
+logger = logging.getLogger(__name__)
 
 
 
@@ -57,16 +77,6 @@ def notify_user(user, message, related_object_id=None):
     )
 
 
-def _build_school_acronym(school_name):
-    """Generate school acronym for keyword matching (e.g., University of Santo Tomas -> ust)."""
-    stop_words = {"of", "the", "and", "for", "at", "in", "on", "de", "la", "ng", "sa"}
-    tokens = [
-        token for token in re.split(r"[^a-zA-Z0-9]+", (school_name or "").lower())
-        if token and token not in stop_words
-    ]
-    return "".join(token[0] for token in tokens)
-
-
 def _get_matching_school_ids(search_query):
     """Find schools by name/address and common acronym inputs like UST, FEU, PUP."""
     if not search_query:
@@ -82,84 +92,127 @@ def _get_matching_school_ids(search_query):
 
     # Acronym fallback covers cases where users type short campus codes (UST, FEU, etc.).
     if normalized_query and normalized_query.isalpha() and len(normalized_query) <= 8:
-        for school in School.objects.only("id", "name"):
-            acronym = _build_school_acronym(school.name)
-            if acronym and (acronym == normalized_query or acronym.startswith(normalized_query)):
-                matching_school_ids.add(school.id)
+        matching_school_ids.update(suggestion_index.school_ids_for_acronym(normalized_query))
+
+    # Typo tolerance ("Adamsun", "Sto. Tomas") via trigram similarity.
+    matching_school_ids.update(school_id for school_id, _score in fuzzy_school_matches(search_query))
 
     return list(matching_school_ids)
 
 
+def _get_fuzzy_dorm_ids(search_query):
+    return [dorm_id for dorm_id, _score in fuzzy_dorm_matches(search_query)]
+
+
 def search_suggestions(request):
     query = (request.GET.get('q') or '').strip()
     if len(query) < 2:
         return JsonResponse({'suggestions': []})
 
-    q_lower = query.lower()
+    return JsonResponse({'suggestions': suggestion_index.suggest(query, limit=10)})
 
-    school_ids = _get_matching_school_ids(query)
-    school_names_qs = list(
-        School.objects.filter(
-            Q(name__icontains=query) |
-            Q(address__icontains=query) |
-            Q(id__in=school_ids)
-        ).values_list('name', flat=True)
-    )
 
-    school_names = []
-    for school_name in school_names_qs:
-        tokens = [t for t in re.split(r'[^a-zA-Z0-9]+', (school_name or '').lower()) if t]
-        acronym = _build_school_acronym(school_name)
-        if (
-            q_lower in (school_name or '').lower() or
-            any(token.startswith(q_lower) for token in tokens) or
-            (acronym and acronym.startswith(q_lower))
-        ):
-            school_names.append(school_name)
-        if len(school_names) >= 8:
-            break
-
-    dorm_names = list(
-        Dorm.objects.filter(available=True, approval_status='approved').filter(
-            Q(name__icontains=query) |
-            Q(address__icontains=query)
-        ).values_list('name', flat=True)[:8]
-    )
+def _map_layer(request):
+    layer = request.GET.get('layer', 'all')
+    return layer if layer in MAP_LAYERS else 'all'
 
-    fallback_school_suggestions = [
-        'Far Eastern University',
-        'University of Santo Tomas',
-        'Polytechnic University of the Philippines',
-        'National University Manila',
-        'Centro Escolar University',
-        'University of the East',
-        'Adamson University',
-        'San Beda University',
-    ]
 
-    fallback_matches = []
-    for item in fallback_school_suggestions:
-        tokens = [t for t in re.split(r'[^a-zA-Z0-9]+', item.lower()) if t]
-        acronym = _build_school_acronym(item)
-        if (
-            q_lower in item.lower() or
-            any(token.startswith(q_lower) for token in tokens) or
-            (acronym and acronym.startswith(q_lower))
-        ):
-            fallback_matches.append(item)
-
-    suggestions = []
-    seen = set()
-    for item in school_names + dorm_names + fallback_matches:
-        key = (item or '').strip().lower()
-        if not key or key in seen:
-            continue
-        seen.add(key)
-        suggestions.append(item)
-        if len(suggestions) >= 10:
-            break
+@require_GET
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=lambda request: map_data.current().etags[_map_layer(request)])
+def map_data_api(request):
+    """
+    Schools and listed dorms for the map (``?layer=schools`` for schools only);
+    revalidated with If-None-Match.
+    """
+    return HttpResponse(map_data.current().blobs[_map_layer(request)], content_type='application/json')
+
+
+def _parse_bbox(value):
+    """Parse Leaflet's ``west,south,east,north`` into (min_lat, min_lng, max_lat, max_lng)."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        return None
+    return south, west, north, east
+
+
+@require_GET
+def map_clusters_api(request):
+    """
+    Dorm markers for a viewport, pre-clustered for the requested zoom level
+    (drawn by the browse page's map beyond the dorms on the current page).
+    """
+    bbox = _parse_bbox(request.GET.get('bbox'))
+    if bbox is None:
+        return JsonResponse({'error': 'bbox must be west,south,east,north'}, status=400)
+    try:
+        zoom = int(request.GET.get('zoom', 11))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'zoom must be an integer'}, status=400)
+
+    clusters = dorm_cluster_index.clusters(*bbox, zoom)
+    # Single dorms carry their map entry so the page can show a full popup.
+    dorms_by_id = map_data.current().dorms_by_id
+    for marker in clusters:
+        if marker['count'] == 1:
+            marker['dorm'] = dorms_by_id.get(marker['id'])
+    return JsonResponse({'zoom': zoom, 'clusters': clusters})
+
+
+MAP_VIEWPORT_RESULT_CAP = 500
+
 
-    return JsonResponse({'suggestions': suggestions})
+@require_GET
+def map_viewport_api(request):
+    """
+    Listed dorms inside ``min_lat/max_lat/min_lng/max_lng``, narrowed by the
+    same filters as the public browse page (its map uses this instead of
+    the unfiltered clusters when filters are active). Returns at most
+    MAP_VIEWPORT_RESULT_CAP dorms (best rated first); malformed prices are
+    rejected with 400.
+    """
+    try:
+        min_lat, max_lat, min_lng, max_lng = (
+            float(request.GET[key]) for key in ('min_lat', 'max_lat', 'min_lng', 'max_lng')
+        )
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'min_lat, max_lat, min_lng and max_lng are required'}, status=400)
+    if min_lat > max_lat or min_lng > max_lng:
+        return JsonResponse({'error': 'Invalid bounding box'}, status=400)
+    try:
+        _price_filters(request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'min_price and target_price must be prices'}, status=400)
+
+    queryset = Dorm.objects.filter(
+        available=True,
+        approval_status='approved',
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    )
+    queryset = _apply_public_dorm_filters(queryset, request.GET, _resolve_location_filter(request))
+    rows = list(
+        queryset.order_by('-avg_rating', '-id')
+        .values('id', 'name', 'address', 'price', 'latitude', 'longitude')[:MAP_VIEWPORT_RESULT_CAP + 1]
+    )
+    truncated = len(rows) > MAP_VIEWPORT_RESULT_CAP
+    return JsonResponse({
+        'dorms': [
+            {
+                'id': row['id'],
+                'name': row['name'],
+                'address': row['address'],
+                'price': float(row['price']),
+                'lat': float(row['latitude']),
+                'lng': float(row['longitude']),
+            }
+            for row in rows[:MAP_VIEWPORT_RESULT_CAP]
+        ],
+        'truncated': truncated,
+    })
 
 
 def _build_amenity_cards(dorm):
@@ -228,30 +281,23 @@ MANILA_LOCATION_FILTERS = [
     },
 ]
 
+# Radius around the selected location (preset or lat/lng) for filtering and nearest-first.
+LOCATION_FILTER_RADIUS_KM = 5.0
+
+# (key, label) checkboxes for the ``must_have`` filter.
+MUST_HAVE_OPTIONS = [(key, label) for key, label, _field, _keywords in AMENITY_VOCABULARY]
+
 
 def _calculate_distance_km(lat1, lon1, lat2, lon2):
-    from math import radians, sin, cos, sqrt, atan2
-
-    earth_radius_km = 6371
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return earth_radius_km * c
-
-
-def _filter_items_within_radius(items, lat, lng, radius_km=5.0):
-    nearby_items = []
-    for item in items:
-        item_lat = getattr(item, 'latitude', None)
-        item_lng = getattr(item, 'longitude', None)
-        if item_lat is None or item_lng is None:
-            continue
-        distance = _calculate_distance_km(lat, lng, float(item_lat), float(item_lng))
-        if distance <= radius_km:
-            nearby_items.append(item)
-    return nearby_items
+    return haversine_km(lat1, lon1, lat2, lon2)
+
+
+def _filter_items_within_radius(items, lat, lng, radius_km):
+    located, lats, lngs = coordinates_of(items)
+    if not located:
+        return []
+    distances = haversine_one_to_many(lat, lng, lats, lngs)
+    return [item for item, distance in zip(located, distances) if distance <= radius_km]
 
 
 def _resolve_location_filter(request):
@@ -276,6 +322,168 @@ def _resolve_location_filter(request):
     return None
 
 
+# Radius options offered next to the school filter.
+SCHOOL_RADIUS_CHOICES_KM = (1, 2, 3, 5, 10, 15, 20)
+
+
+def _school_filter(params):
+    """
+    Selected school ids and radius from ``school`` (repeated or comma-separated)
+    and ``school_radius`` (km, defaults to the nearby-school radius).
+    """
+    school_ids = []
+    for value in params.getlist('school'):
+        for part in value.split(','):
+            part = part.strip()
+            if part.isdigit() and int(part) not in school_ids:
+                school_ids.append(int(part))
+    try:
+        radius_km = float(params.get('school_radius') or NEARBY_SCHOOL_RADIUS_KM)
+    except (TypeError, ValueError):
+        radius_km = NEARBY_SCHOOL_RADIUS_KM
+    if not radius_km > 0:
+        radius_km = NEARBY_SCHOOL_RADIUS_KM
+    return school_ids, radius_km
+
+
+def _dorm_map_payload(dorms):
+    """Map marker data for a page of dorms, taken from the shared map snapshot."""
+    return map_data.dorm_entries(dorms)
+
+
+def _add_facet_counts(view, context):
+    """Attach filter-sidebar counts for the view's current result set."""
+    facets = dorm_facets.counts_for(view.object_list, view.request.GET, type(view).__name__)
+    context['amenities'] = list(context['amenities'])
+    for amenity in context['amenities']:
+        amenity.facet_count = facets['amenities'].get(amenity.id, 0)
+    for school in context['schools']:
+        school.facet_count = facets['schools'].get(school.id, 0)
+    context['facets'] = facets
+    return context
+
+
+def _favorite_dorm_ids(user):
+    if not user.is_authenticated or user.user_type != 'tenant':
+        return set()
+    return set(Dorm.objects.filter(favorited_by__user=user).values_list('id', flat=True))
+
+
+PRICE_FILTER_PARAMS = ('min_price', 'target_price')
+# Dorm.price is DecimalField(max_digits=10, decimal_places=2).
+MAX_FILTER_PRICE = Decimal('99999999.99')
+
+
+def _parse_price(value):
+    """``value`` as a Decimal price filter; ValueError if it is not a usable price."""
+    try:
+        price = Decimal(value.strip())
+    except (AttributeError, InvalidOperation):
+        raise ValueError(f'{value!r} is not a number') from None
+    if not price.is_finite() or not 0 <= price <= MAX_FILTER_PRICE:
+        raise ValueError(f'{value!r} is not a valid price')
+    return price
+
+
+def _price_filters(params):
+    """``{param: Decimal}`` for the non-blank price filters in ``params``; ValueError on bad input."""
+    return {
+        key: _parse_price(params[key])
+        for key in PRICE_FILTER_PARAMS
+        if (params.get(key) or '').strip()
+    }
+
+
+def _apply_public_dorm_filters(queryset, params, location_filter=None):
+    """
+    Apply the public browse filters in ``params`` (request.GET) to a Dorm
+    queryset. Parameters read here must be listed in facets.FILTER_PARAMS.
+    """
+    # Search functionality
+    search_query = params.get('search')
+    if search_query:
+        queryset = search_dorms(
+            search_query,
+            queryset,
+            school_ids=_get_matching_school_ids(search_query),
+            dorm_ids=_get_fuzzy_dorm_ids(search_query),
+        )
+
+    # Price filtering (malformed prices are ignored here; the JSON API rejects them)
+    try:
+        prices = _price_filters(params)
+    except ValueError:
+        prices = {}
+    if 'min_price' in prices:
+        queryset = queryset.filter(price__gte=prices['min_price'])
+    if 'target_price' in prices:
+        queryset = queryset.filter(price__lte=prices['target_price'])
+
+    # Amenities filtering
+    amenities = params.getlist('amenities')
+    if amenities:
+        queryset = queryset.filter(amenities__id__in=amenities).distinct()
+
+    amenity_keyword = (params.get('amenity_keyword') or '').strip()
+    if amenity_keyword:
+        queryset = queryset.filter(
+            models.Q(amenities__name__icontains=amenity_keyword) |
+            models.Q(description__icontains=amenity_keyword) |
+            models.Q(key_features__icontains=amenity_keyword)
+        ).distinct()
+
+    # Must-have amenities (vocabulary keys), matched on the stored bitmask
+    queryset = with_all_amenities(queryset, mask_for_keys(params.getlist('must_have')))
+
+    # School filtering (near any of the selected campuses)
+    school_ids, school_radius = _school_filter(params)
+    if school_ids:
+        queryset = dorms_near_schools(queryset, school_ids, school_radius)
+
+    # Location-based filtering
+    if location_filter:
+        nearby_dorm_ids = dorm_spatial_index.ids_within_radius(
+            location_filter['lat'],
+            location_filter['lng'],
+            LOCATION_FILTER_RADIUS_KM,
+        )
+        queryset = queryset.filter(id__in=nearby_dorm_ids)
+
+    # Accommodation type filtering
+    accommodation_type = params.get('accommodation_type')
+    if accommodation_type and accommodation_type != 'all':
+        queryset = queryset.filter(accommodation_type=accommodation_type)
+
+    # Verified landlord filtering
+    verified = params.get('verified')
+    if verified == 'true':
+        queryset = queryset.filter(landlord__is_identity_verified=True)
+
+    # Minimum rating filter
+    min_rating = params.get('min_rating')
+    if min_rating:
+        try:
+            queryset = queryset.filter(avg_rating__gte=float(min_rating))
+        except (ValueError, TypeError):
+            pass
+
+    # Payment terms filter (advance/deposit months — filter dorms where config <= selected max)
+    advance_months = params.get('advance_months')
+    if advance_months:
+        try:
+            queryset = queryset.filter(payment_config__advance_months__lte=int(advance_months))
+        except (ValueError, TypeError):
+            pass
+    deposit_months = params.get('deposit_months')
+    if deposit_months:
+        try:
+            queryset = queryset.filter(payment_config__deposit_months__lte=int(deposit_months))
+        except (ValueError, TypeError):
+            pass
+
+    return queryset
+
+
 class LoginRequiredActionMixin:
     """Mixin to handle login required actions with proper redirect"""
     
@@ -301,110 +509,40 @@ class PublicDormListView(ListView):
 
     def get_queryset(self):
         queryset = Dorm.objects.select_related('landlord').prefetch_related(
-            'images', 'amenities', 'reviews', 'nearby_schools'
+            'images', 'amenities', 'nearby_schools'
         ).filter(
             available=True, 
             approval_status="approved"
-        ).annotate(
-            avg_rating=models.Avg('reviews__rating'),
-            review_count=models.Count('reviews')
         )
 
-        # Search functionality
-        search_query = self.request.GET.get('search')
-        if search_query:
-            school_match_ids = _get_matching_school_ids(search_query)
-            search_filters = (
-                models.Q(name__icontains=search_query) |
-                models.Q(address__icontains=search_query) |
-                models.Q(description__icontains=search_query) |
-                models.Q(nearby_schools__name__icontains=search_query) |
-                models.Q(nearby_schools__address__icontains=search_query)
-            )
-            if school_match_ids:
-                search_filters |= models.Q(nearby_schools__id__in=school_match_ids)
-            queryset = queryset.filter(search_filters).distinct()
-
-        # Price filtering
-        min_price = self.request.GET.get('min_price')
-        target_price = self.request.GET.get('target_price')
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if target_price:
-            queryset = queryset.filter(price__lte=target_price)
-
-        # Amenities filtering
-        amenities = self.request.GET.getlist('amenities')
-        if amenities:
-            queryset = queryset.filter(amenities__id__in=amenities).distinct()
-
-        amenity_keyword = (self.request.GET.get('amenity_keyword') or '').strip()
-        if amenity_keyword:
-            queryset = queryset.filter(
-                models.Q(amenities__name__icontains=amenity_keyword) |
-                models.Q(description__icontains=amenity_keyword) |
-                models.Q(key_features__icontains=amenity_keyword)
-            ).distinct()
-
-        # School filtering
-        school_id = self.request.GET.get('school')
-        if school_id:
-            queryset = queryset.filter(nearby_schools__id=school_id).distinct()
-
-        # Location-based filtering
         location_filter = self.get_location_filter()
-        if location_filter:
-            nearby_dorms = _filter_items_within_radius(
-                queryset,
-                location_filter['lat'],
-                location_filter['lng'],
-            )
-            queryset = queryset.filter(id__in=[dorm.id for dorm in nearby_dorms])
-
-        # Accommodation type filtering
-        accommodation_type = self.request.GET.get('accommodation_type')
-        if accommodation_type and accommodation_type != 'all':
-            queryset = queryset.filter(accommodation_type=accommodation_type)
-
-        # Verified landlord filtering
-        verified = self.request.GET.get('verified')
-        if verified == 'true':
-            queryset = queryset.filter(landlord__is_identity_verified=True)
-
-        # Minimum rating filter
-        min_rating = self.request.GET.get('min_rating')
-        if min_rating:
-            try:
-                queryset = queryset.filter(avg_rating__gte=float(min_rating))
-            except (ValueError, TypeError):
-                pass
-
-        # Payment terms filter (advance/deposit months — filter dorms where config <= selected max)
-        advance_months = self.request.GET.get('advance_months')
-        if advance_months:
-            try:
-                queryset = queryset.filter(payment_config__advance_months__lte=int(advance_months))
-            except (ValueError, TypeError):
-                pass
-        deposit_months = self.request.GET.get('deposit_months')
-        if deposit_months:
-            try:
-                queryset = queryset.filter(payment_config__deposit_months__lte=int(deposit_months))
-            except (ValueError, TypeError):
-                pass
+        queryset = _apply_public_dorm_filters(queryset, self.request.GET, location_filter)
 
         # Sorting
         sort_by = self.request.GET.get('sort')
-        if sort_by == 'price_asc':
+        if sort_by == 'distance' and location_filter:
+            queryset = annotate_distance(
+                queryset, location_filter['lat'], location_filter['lng'], radius_km=LOCATION_FILTER_RADIUS_KM,
+            ).order_by('distance_km', 'id')
+        elif sort_by == 'price_asc':
             queryset = queryset.order_by('price')
         elif sort_by == 'price_desc':
             queryset = queryset.order_by('-price')
         elif sort_by == 'rating':
             queryset = queryset.order_by('-avg_rating')
+        elif sort_by == 'relevance':
+            queryset = order_by_relevance(queryset, '-created_at')
         else:
             queryset = queryset.order_by('-created_at')
 
-        return queryset
+        return annotate_nearest_school(queryset)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Page through the cached result ids and load only the current page's dorms."""
+        dorm_ids = dorm_results.ids_for(queryset, self.request.GET, type(self).__name__)
+        paginator, page, page_ids, is_paginated = super().paginate_queryset(dorm_ids, page_size)
+        page.object_list = hydrate(queryset, page_ids)
+        return paginator, page, page.object_list, is_paginated
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -416,43 +554,28 @@ class PublicDormListView(ListView):
                 schools,
                 location_filter['lat'],
                 location_filter['lng'],
+                LOCATION_FILTER_RADIUS_KM,
             )
 
         context['schools'] = schools
+        _add_facet_counts(self, context)
         context['selected_amenities'] = [int(aid) for aid in self.request.GET.getlist('amenities') if str(aid).isdigit()]
         context['selected_amenity_keyword'] = (self.request.GET.get('amenity_keyword') or '').strip()
+        context['must_have_options'] = MUST_HAVE_OPTIONS
+        context['selected_must_have'] = [key for key in self.request.GET.getlist('must_have') if key in AMENITY_BITS]
         context['selected_school'] = self.request.GET.get('school', '')
+        context['selected_school_ids'], context['school_radius'] = _school_filter(self.request.GET)
+        context['school_radius_choices'] = SCHOOL_RADIUS_CHOICES_KM
         context['location_options'] = MANILA_LOCATION_FILTERS
         context['selected_location'] = location_filter['value'] if location_filter else ''
         context['selected_location_label'] = location_filter['label'] if location_filter else ''
         context['selected_location_lat'] = location_filter['lat'] if location_filter else ''
         context['selected_location_lng'] = location_filter['lng'] if location_filter else ''
+        # Map schools are fetched client-side and narrowed to this point's radius.
+        context['map_school_center'] = [location_filter['lat'], location_filter['lng']] if location_filter else None
         
         # Add dorm data for map
-        dorms_data = []
-        for dorm in context['dorms']:
-            dorms_data.append({
-                'id': dorm.id,
-                'name': dorm.name,
-                'address': dorm.address,
-                'price': float(dorm.price),  # Convert Decimal to float
-                'latitude': float(dorm.latitude) if dorm.latitude else None,  # Convert Decimal to float
-                'longitude': float(dorm.longitude) if dorm.longitude else None,  # Convert Decimal to float
-            })
-        context['dorms_json'] = json.dumps(dorms_data)
-        
-        # Add schools data for map
-        schools_data = []
-        for school in schools:
-            if school.latitude and school.longitude:
-                schools_data.append({
-                    'id': school.id,
-                    'name': school.name,
-                    'address': school.address,
-                    'latitude': float(school.latitude),
-                    'longitude': float(school.longitude),
-                })
-        context['schools_json'] = json.dumps(schools_data)
+        context['dorms_json'] = json.dumps(_dorm_map_payload(context['dorms']))
         
         return context
 
@@ -464,11 +587,9 @@ class PublicDormDetailView(DetailView):
     context_object_name = "dorm"
 
     def get(self, request, *args, **kwargs):
-        """Increment the view count when the dorm is viewed"""
+        """Count the view (buffered in the cache, flushed to recent_views in batches)"""
         response = super().get(request, *args, **kwargs)
-        dorm = self.object
-        dorm.recent_views += 1
-        dorm.save(update_fields=['recent_views'])
+        record_view(request, self.object.pk)
         return response
 
     def get_context_data(self, **kwargs):
@@ -482,45 +603,8 @@ class PublicDormDetailView(DetailView):
         # Add schools to the context
         context['schools'] = School.objects.all()
         
-        # Add schools JSON for map functionality
-        schools_data = []
-        for school in School.objects.all():
-            if school.latitude and school.longitude:
-                schools_data.append({
-                    'id': school.id,
-                    'name': school.name,
-                    'address': school.address,
-                    'latitude': float(school.latitude),
-                    'longitude': float(school.longitude),
-                })
-        context['schools_json'] = json.dumps(schools_data)
-        
-        # Get similar dorms based on price range, amenities, and location
-        current_dorm = self.object
-        price_range = (
-            current_dorm.price * Decimal('0.7'), 
-            current_dorm.price * Decimal('1.3')
-        )
-        
-        similar_dorms = Dorm.objects.select_related('landlord').prefetch_related(
-            'images', 'amenities', 'reviews'
-        ).filter(
-            available=True,
-            approval_status="approved",
-            price__range=price_range,
-            accommodation_type=current_dorm.accommodation_type
-        ).exclude(
-            id=current_dorm.id
-        ).annotate(
-            avg_rating=models.Avg('reviews__rating'),
-            review_count=models.Count('reviews'),
-            amenity_match=models.Count(
-                'amenities',
-                filter=models.Q(amenities__in=current_dorm.amenities.all())
-            )
-        ).order_by('-amenity_match', '-avg_rating')[:4]
-
-        context['similar_dorms'] = similar_dorms
+        # Similar dorms come from the precomputed neighbour table
+        context['similar_dorms'] = similar_dorms_for(self.object)
         
         return context
 
@@ -656,15 +740,42 @@ class AddDormView(LoginRequiredMixin, CreateView):
         return context
 
 
+DORM_LIST_PAGE_SIZE = 12
+DORM_LIST_MAX_PAGE_SIZE = 48
+DORM_LIST_COUNT_CAP = 500
+
+
 class DormListView(LoginRequiredMixin, ListView):
+    """
+    Logged-in dorm browser. Results are paged with a keyset cursor on
+    (sort key, id) so deep pages cost the same as the first one.
+    """
     model = Dorm
     template_name = "dormitory/dorm_list.html"
     context_object_name = "dorms"
-    paginate_by = None
+    paginate_by = DORM_LIST_PAGE_SIZE
 
     def get_location_filter(self):
         return _resolve_location_filter(self.request)
 
+    def get_paginate_by(self, queryset):
+        try:
+            page_size = int(self.request.GET.get('page_size', self.paginate_by))
+        except (TypeError, ValueError):
+            page_size = self.paginate_by
+        return max(1, min(page_size, DORM_LIST_MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset, key_name, descending = keyset_sort(queryset, self.request.GET.get('sort'))
+        try:
+            page = paginate_keyset(
+                queryset, key_name, descending, page_size,
+                cursor=self.request.GET.get('cursor'),
+            )
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return None, page, page.object_list, page.has_next
+
     def get_queryset(self):
         """Filter dorms based on search parameters with optimized queries"""
         start_time = time.time()
@@ -673,23 +784,9 @@ class DormListView(LoginRequiredMixin, ListView):
         queryset = Dorm.objects.select_related('landlord').prefetch_related(
             'images',
             'amenities',
-            'reviews',
-            'nearby_schools'
         ).filter(
             available=True, 
             approval_status="approved"
-        ).annotate(
-            avg_rating=models.Avg('reviews__rating'),
-            review_count=models.Count('reviews')
-        ).annotate(
-            avg_rating_rounded=models.Case(
-                models.When(avg_rating__isnull=True, then=0),
-                default=models.ExpressionWrapper(
-                    models.functions.Round(models.F('avg_rating')), 
-                    output_field=models.FloatField()
-                ),
-                output_field=models.FloatField()
-            )
         )
 
         # Get filter parameters from request
@@ -697,58 +794,45 @@ class DormListView(LoginRequiredMixin, ListView):
         target_price = self.request.GET.get('target_price')
         amenities = self.request.GET.getlist('amenities')
         amenity_keyword = (self.request.GET.get('amenity_keyword') or '').strip()
-        school_id = self.request.GET.get('school')
-        sort_by = self.request.GET.get('sort')
         accommodation_type = self.request.GET.get('accommodation_type')
         
-        # Debug print statements
-        print(f"Received filters - accommodation_type: {accommodation_type}, target_price: {target_price}")
+        logger.debug("Received filters - accommodation_type: %s, target_price: %s", accommodation_type, target_price)
         
         # Apply search filter if provided
         if search_query:
-            school_match_ids = _get_matching_school_ids(search_query)
-            search_filters = (
-                Q(name__icontains=search_query) | 
-                Q(address__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(nearby_schools__name__icontains=search_query) |
-                Q(nearby_schools__address__icontains=search_query)
+            queryset = search_dorms(
+                search_query,
+                queryset,
+                school_ids=_get_matching_school_ids(search_query),
+                dorm_ids=_get_fuzzy_dorm_ids(search_query),
             )
-            if school_match_ids:
-                search_filters |= Q(nearby_schools__id__in=school_match_ids)
-            queryset = queryset.filter(search_filters)
             
         # Apply price filter if provided and not default max value
         if target_price and target_price != '50000':
             try:
-                target_price = Decimal(target_price)
+                target_price = _parse_price(target_price)
                 queryset = queryset.filter(price__lte=target_price)
-                print(f"Applying price filter: <= {target_price}")
-                # Debug the filtered queryset
-                print("Filtered dorms:")
-                for dorm in queryset:
-                    print(f"Dorm: {dorm.name}, Price: {dorm.price}")
-            except (ValueError, TypeError) as e:
-                print(f"Error converting price: {e}")
-                pass
+                logger.debug("Applying price filter: <= %s", target_price)
+            except ValueError as e:
+                logger.debug("Error converting price: %s", e)
 
         # Apply accommodation type filter if provided and not 'all'
         if accommodation_type and accommodation_type != 'all':
             queryset = queryset.filter(accommodation_type=accommodation_type)
-            print(f"Applying accommodation filter: {accommodation_type}")
+            logger.debug("Applying accommodation filter: %s", accommodation_type)
             
         # Apply verified landlord filter if provided
         verified = self.request.GET.get('verified')
         if verified == 'true':
             queryset = queryset.filter(landlord__is_identity_verified=True)
-            print(f"Applying verified landlord filter")
+            logger.debug("Applying verified landlord filter")
 
         # Apply min_price filter if provided
         min_price = self.request.GET.get('min_price')
         if min_price:
             try:
-                queryset = queryset.filter(price__gte=Decimal(min_price))
-            except (ValueError, TypeError):
+                queryset = queryset.filter(price__gte=_parse_price(min_price))
+            except ValueError:
                 pass
 
         # Apply minimum rating filter
@@ -783,60 +867,49 @@ class DormListView(LoginRequiredMixin, ListView):
                 Q(description__icontains=amenity_keyword) |
                 Q(key_features__icontains=amenity_keyword)
             ).distinct()
+
+        queryset = with_all_amenities(queryset, mask_for_keys(self.request.GET.getlist('must_have')))
             
-        # Apply school filter if provided
-        if school_id:
-            queryset = queryset.filter(nearby_schools__id=school_id)
+        # Apply school filter if provided (near any of the selected campuses)
+        school_ids, school_radius = _school_filter(self.request.GET)
+        if school_ids:
+            queryset = dorms_near_schools(queryset, school_ids, school_radius)
 
-        # Location-based filtering (within 5km radius)
-        lat = self.request.GET.get('lat')
-        lng = self.request.GET.get('lng')
-        if lat and lng:
-            try:
-                lat = float(lat)
-                lng = float(lng)
-                from math import radians, sin, cos, sqrt, atan2
-
-                def calculate_distance(lat1, lon1, lat2, lon2):
-                    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-                    dlat = lat2 - lat1
-                    dlon = lon2 - lon1
-                    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-                    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-                    return 6371 * c
-
-                nearby_dorm_ids = []
-                for dorm in queryset:
-                    if dorm.latitude and dorm.longitude:
-                        distance = calculate_distance(lat, lng, float(dorm.latitude), float(dorm.longitude))
-                        if distance <= 5.0:
-                            nearby_dorm_ids.append(dorm.id)
-
-                if nearby_dorm_ids:
-                    queryset = queryset.filter(id__in=nearby_dorm_ids)
-                else:
-                    queryset = queryset.none()
-            except (ValueError, TypeError):
-                pass
+        # Location-based filtering (preset location or lat/lng, within LOCATION_FILTER_RADIUS_KM)
+        location_filter = self.get_location_filter()
+        if location_filter:
+            nearby_dorm_ids = dorm_spatial_index.ids_within_radius(
+                location_filter['lat'], location_filter['lng'], LOCATION_FILTER_RADIUS_KM,
+            )
+            queryset = queryset.filter(id__in=nearby_dorm_ids)
 
-        # Apply sorting
-        if sort_by == 'price_asc':
-            queryset = queryset.order_by('price')
-        elif sort_by == 'price_desc':
-            queryset = queryset.order_by('-price')
-        else:
-            # Default sorting by newest
-            queryset = queryset.order_by('-id')
+        # Nearest-first needs a point; the order itself is applied by paginate_queryset
+        # (keyset on sort key + id).
+        if self.request.GET.get('sort') == 'distance' and location_filter:
+            queryset = annotate_distance(
+                queryset,
+                location_filter['lat'],
+                location_filter['lng'],
+                radius_km=LOCATION_FILTER_RADIUS_KM,
+            )
 
-        # Keep lightweight diagnostics without forcing SQL compilation of empty sets.
-        print(f"Number of results: {queryset.count()}")
-        end_time = time.time()
-        print(f"Query execution time: {end_time - start_time:.2f} seconds")
+        logger.debug("Built dorm list queryset in %.2f seconds", time.time() - start_time)
         
-        return queryset.distinct()
+        return annotate_nearest_school(queryset.distinct())
+
+    def get_page_context(self, context):
+        page = context['page_obj']
+        context['next_cursor'] = page.next_cursor
+        context['favorite_dorm_ids'] = _favorite_dorm_ids(self.request.user)
+        context['dorms_json'] = json.dumps(_dorm_map_payload(page.object_list))
+        return context
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        context = self.get_page_context(super().get_context_data(**kwargs))
+        context['page_size'] = context['page_obj'].page_size
+        context['total_dorm_count'], context['dorm_count_capped'] = capped_count(
+            self.object_list, DORM_LIST_COUNT_CAP
+        )
         
         # Get all amenities and schools
         context['amenities'] = Amenity.objects.all()
@@ -847,52 +920,52 @@ class DormListView(LoginRequiredMixin, ListView):
                 schools,
                 location_filter['lat'],
                 location_filter['lng'],
+                LOCATION_FILTER_RADIUS_KM,
             )
 
         context['schools'] = schools
+        _add_facet_counts(self, context)
         
         # Pass current filter values back to template
         context['current_search'] = self.request.GET.get('search', '')
         context['current_target_price'] = self.request.GET.get('target_price', '50000')
         context['selected_amenities'] = [int(a) for a in self.request.GET.getlist('amenities')]
         context['selected_amenity_keyword'] = (self.request.GET.get('amenity_keyword') or '').strip()
+        context['must_have_options'] = MUST_HAVE_OPTIONS
+        context['selected_must_have'] = [key for key in self.request.GET.getlist('must_have') if key in AMENITY_BITS]
         context['selected_school'] = self.request.GET.get('school', '')
+        context['selected_school_ids'], context['school_radius'] = _school_filter(self.request.GET)
+        context['school_radius_choices'] = SCHOOL_RADIUS_CHOICES_KM
         context['selected_sort'] = self.request.GET.get('sort', '')
         context['location_options'] = MANILA_LOCATION_FILTERS
         context['selected_location'] = location_filter['value'] if location_filter else ''
         context['selected_location_label'] = location_filter['label'] if location_filter else ''
         context['selected_location_lat'] = location_filter['lat'] if location_filter else ''
         context['selected_location_lng'] = location_filter['lng'] if location_filter else ''
-        
-        # Add dorm data for map (same as public version)
-        dorms_data = []
-        for dorm in context['dorms']:
-            dorms_data.append({
-                'id': dorm.id,
-                'name': dorm.name,
-                'address': dorm.address,
-                'price': float(dorm.price),  # Convert Decimal to float
-                'latitude': float(dorm.latitude) if dorm.latitude else None,  # Convert Decimal to float
-                'longitude': float(dorm.longitude) if dorm.longitude else None,  # Convert Decimal to float
-                'thumbnail': (dorm.images.first().image.url if dorm.images.first() else ''),
-            })
-        context['dorms_json'] = json.dumps(dorms_data)
-        
-        # Add schools data for map
-        schools_data = []
-        for school in School.objects.all():
-            if school.latitude and school.longitude:
-                schools_data.append({
-                    'id': school.id,
-                    'name': school.name,
-                    'address': school.address,
-                    'latitude': float(school.latitude),
-                    'longitude': float(school.longitude),
-                })
-        context['schools_json'] = json.dumps(schools_data)
-        
+
         return context
 
+
+class DormListPageView(DormListView):
+    """Infinite-scroll endpoint: the next page of dorm cards plus their map data."""
+
+    def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        _paginator, page, dorms, _has_next = self.paginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        html = render_to_string(
+            'dormitory/partials/dorm_list_cards.html',
+            {'dorms': dorms, 'favorite_dorm_ids': _favorite_dorm_ids(request.user)},
+            request=request,
+        )
+        return JsonResponse({
+            'html': html,
+            'dorms': _dorm_map_payload(dorms),
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next,
+        })
+
 # 🚀 Dorm Details
 
 @method_decorator(ratelimit(key='user', rate='5/d', method='POST', block=True), name='post')
@@ -902,11 +975,9 @@ class DormDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "dorm"
 
     def get(self, request, *args, **kwargs):
-        """Increment the view count when the dorm is viewed"""
+        """Count the view (buffered in the cache, flushed to recent_views in batches)"""
         response = super().get(request, *args, **kwargs)
-        dorm = self.object
-        dorm.recent_views += 1
-        dorm.save(update_fields=['recent_views'])
+        record_view(request, self.object.pk)
         return response
 
     def get_context_data(self, **kwargs):
@@ -929,33 +1000,8 @@ class DormDetailView(LoginRequiredMixin, DetailView):
             context['payment_breakdown'] = payment_config.calculate_total_amount()
             context['partial_payment_amount'] = payment_config.get_partial_payment_amount()
 
-        # Get similar dorms based on price range, amenities, and location
-        current_dorm = self.object
-        # Convert float multipliers to Decimal
-        price_range = (
-            current_dorm.price * Decimal('0.7'), 
-            current_dorm.price * Decimal('1.3')
-        )  # ±30% price range
-        
-        similar_dorms = Dorm.objects.select_related('landlord').prefetch_related(
-            'images', 'amenities', 'reviews'
-        ).filter(
-            available=True,
-            approval_status="approved",
-            price__range=price_range,
-            accommodation_type=current_dorm.accommodation_type
-        ).exclude(
-            id=current_dorm.id  # Exclude current dorm
-        ).annotate(
-            avg_rating=models.Avg('reviews__rating'),
-            review_count=models.Count('reviews'),
-            amenity_match=models.Count(
-                'amenities',
-                filter=models.Q(amenities__in=current_dorm.amenities.all())
-            )
-        ).order_by('-amenity_match', '-avg_rating')[:4]  # Get top 4 similar dorms
-
-        context['similar_dorms'] = similar_dorms
+        # Similar dorms come from the precomputed neighbour table
+        context['similar_dorms'] = similar_dorms_for(self.object)
 
         # Get user's reviewable reservation for this dorm
         if self.request.user.is_authenticated and self.request.user != self.object.landlord:
@@ -3253,26 +3299,15 @@ class HomePageView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get popular dorms (most viewed, highest rated)
-        popular_dorms = Dorm.objects.select_related('landlord').prefetch_related(
-            'images', 'amenities', 'reviews'
-        ).filter(
-            available=True, 
-            approval_status="approved"
-        ).annotate(
-            avg_rating=models.Avg('reviews__rating'),
-            review_count=models.Count('reviews')
-        ).order_by('-recent_views', '-avg_rating')[:6]
+        # Get popular dorms (ranked by the trending pass)
+        popular_dorms = trending_dorms(6)
 
         # Get latest dorms
         latest_dorms = Dorm.objects.select_related('landlord').prefetch_related(
-            'images', 'amenities', 'reviews'
+            'images', 'amenities'
         ).filter(
             available=True, 
             approval_status="approved"
-        ).annotate(
-            avg_rating=models.Avg('reviews__rating'),
-            review_count=models.Count('reviews')
         ).order_by('-created_at')[:6]
 
         # Get roommate listings
@@ -297,9 +297,57 @@ CACHES = {
             'MAX_ENTRIES': 1000,
         },
         'TIMEOUT': 300,  # 5 minutes default timeout
-    }
+    },
+    # Buffered dorm view counters (dormitory/view_counts.py), kept apart so
+    # culling in the default cache cannot drop unflushed views.
+    'dorm_views': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dorm-views',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+        'TIMEOUT': None,
+    },
 }
 
+# In-process dorm spatial index (grid cell size in degrees, ~1.1 km at 0.01)
+# Max age forces a rebuild when the cache is per-process and cannot carry
+# version bumps between workers.
+DORM_SPATIAL_INDEX_CELL_DEG = float(os.environ.get('DORM_SPATIAL_INDEX_CELL_DEG', '0.01'))
+DORM_SPATIAL_INDEX_MAX_AGE = int(os.environ.get('DORM_SPATIAL_INDEX_MAX_AGE', '300'))  # seconds
+
+# Filter-sidebar facet catalog; the same max age bounds how long a command's
+# invalidate() takes to reach workers that do not share its cache.
+DORM_FACET_CATALOG_MAX_AGE = int(os.environ.get('DORM_FACET_CATALOG_MAX_AGE', '300'))  # seconds
+
+# Dorm <-> school pairs farther apart than this are not stored in DormSchoolDistance
+SCHOOL_DISTANCE_MAX_KM = float(os.environ.get('SCHOOL_DISTANCE_MAX_KM', '20'))
+
+# Dorm detail views are counted in the cache and flushed to Dorm.recent_views
+# by requests, at most once per interval and every MAX_PENDING recorded views.
+# Counters are bucketed by time; a bucket is flushed once the next one closes.
+# A dedupe window > 0 counts one view per user/session/IP per dorm per window.
+DORM_VIEW_FLUSH_INTERVAL = int(os.environ.get('DORM_VIEW_FLUSH_INTERVAL', '60'))  # seconds
+DORM_VIEW_FLUSH_MAX_PENDING = int(os.environ.get('DORM_VIEW_FLUSH_MAX_PENDING', '500'))
+DORM_VIEW_BUCKET_SECONDS = int(os.environ.get('DORM_VIEW_BUCKET_SECONDS', '10'))
+DORM_VIEW_DEDUPE_WINDOW = int(os.environ.get('DORM_VIEW_DEDUPE_WINDOW', '0'))  # seconds
+
+# Half-life of the "popular dorms" trending score (update_trending command)
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '72'))
+
+# Tenant dashboard recommender, written by the train_recommender command
+RECOMMENDER_MODEL_PATH = os.environ.get('RECOMMENDER_MODEL_PATH', os.path.join(BASE_DIR, 'ml_models', 'dorm_recommender.joblib'))
+
+# Half-life of favorite/interaction weight in the collaborative filter (rebuild_collaborative_filter command)
+COLLABORATIVE_HALF_LIFE_DAYS = float(os.environ.get('COLLABORATIVE_HALF_LIFE_DAYS', '30'))
+
+# Recompute a tenant's cached dashboard recommendations on a background thread after they change
+DASHBOARD_RECOMMENDATIONS_WARM = os.environ.get('DASHBOARD_RECOMMENDATIONS_WARM', 'true').lower() == 'true'
+# Seconds to wait before warming, so a burst of interactions triggers one recompute
+DASHBOARD_RECOMMENDATIONS_WARM_DELAY = float(os.environ.get('DASHBOARD_RECOMMENDATIONS_WARM_DELAY', '30'))
+# Only tenants who opened the dashboard within this many seconds are warmed
+DASHBOARD_RECOMMENDATIONS_ACTIVE_SECONDS = int(os.environ.get('DASHBOARD_RECOMMENDATIONS_ACTIVE_SECONDS', '1800'))
+
 # Site URL for email verification links (use in production)
 # Set this to your production domain (e.g., 'https://yourdomain.com')
 # If not set, will use request.build_absolute_uri() which may not work correctly in production
@@ -0,0 +1,120 @@
+/*
+ * Shared map data loading for the dorm list and detail pages.
+ *
+ * Schools come from the ETag'd payload at api/map/data/?layer=schools
+ * (dormitory/map_data.py). The browser revalidates it with If-None-Match,
+ * so pages no longer inline the whole school list into their HTML.
+ *
+ * Dorm markers outside the current page come from api/map/clusters/
+ * (dormitory/clusters.py) for the visible bounds and zoom, so the number
+ * of markers depends on the viewport rather than on the catalog size.
+ * With filters active, api/map/dorms/ returns the matching dorms in view.
+ */
+const DormMap = (function () {
+    const schoolRequests = {};
+
+    function loadSchools(url) {
+        if (!schoolRequests[url]) {
+            schoolRequests[url] = fetch(url, { credentials: 'same-origin' })
+                .then(function (response) {
+                    return response.ok ? response.json() : { schools: [] };
+                })
+                .then(function (payload) {
+                    return payload.schools || [];
+                })
+                .catch(function (error) {
+                    console.error('Failed to load schools for the map:', error);
+                    return [];
+                });
+        }
+        return schoolRequests[url];
+    }
+
+    function distanceKm(lat1, lng1, lat2, lng2) {
+        const toRadians = Math.PI / 180;
+        const dLat = (lat2 - lat1) * toRadians;
+        const dLng = (lng2 - lng1) * toRadians;
+        const a = Math.sin(dLat / 2) ** 2 +
+            Math.cos(lat1 * toRadians) * Math.cos(lat2 * toRadians) * Math.sin(dLng / 2) ** 2;
+        return 6371 * 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
+    }
+
+    function withinRadius(items, center, radiusKm) {
+        if (!center) {
+            return items;
+        }
+        return items.filter(function (item) {
+            return item.latitude && item.longitude &&
+                distanceKm(center[0], center[1], item.latitude, item.longitude) <= radiusKm;
+        });
+    }
+
+    function viewportQuery(map) {
+        const bounds = map.getBounds();
+        return new URLSearchParams({
+            bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+                .map(function (value) { return value.toFixed(6); })
+                .join(','),
+            zoom: String(map.getZoom()),
+        });
+    }
+
+    function loadClusters(url, map) {
+        return fetch(url + '?' + viewportQuery(map).toString(), { credentials: 'same-origin' })
+            .then(function (response) {
+                return response.ok ? response.json() : { clusters: [] };
+            })
+            .then(function (payload) {
+                return payload.clusters || [];
+            })
+            .catch(function (error) {
+                console.error('Failed to load map clusters:', error);
+                return [];
+            });
+    }
+
+    function loadViewportDorms(url, map, filters) {
+        const bounds = map.getBounds();
+        const query = new URLSearchParams(filters);
+        query.set('min_lat', bounds.getSouth().toFixed(6));
+        query.set('max_lat', bounds.getNorth().toFixed(6));
+        query.set('min_lng', bounds.getWest().toFixed(6));
+        query.set('max_lng', bounds.getEast().toFixed(6));
+        return fetch(url + '?' + query.toString(), { credentials: 'same-origin' })
+            .then(function (response) {
+                return response.ok ? response.json() : { dorms: [], truncated: false };
+            })
+            .then(function (payload) {
+                return {
+                    dorms: (payload.dorms || []).map(function (dorm) {
+                        return Object.assign({ latitude: dorm.lat, longitude: dorm.lng }, dorm);
+                    }),
+                    truncated: Boolean(payload.truncated),
+                };
+            })
+            .catch(function (error) {
+                console.error('Failed to load dorms for the map:', error);
+                return { dorms: [], truncated: false };
+            });
+    }
+
+    function clusterIcon(count) {
+        const size = count < 10 ? 32 : count < 100 ? 38 : 44;
+        return L.divIcon({
+            html: '<div style="width:' + size + 'px;height:' + size + 'px;line-height:' + size + 'px;' +
+                'border-radius:50%;background:rgba(37,99,235,0.85);color:#fff;border:2px solid #fff;' +
+                'text-align:center;font-weight:600;font-size:13px;">' + count + '</div>',
+            className: '',
+            iconSize: [size, size],
+            iconAnchor: [size / 2, size / 2],
+        });
+    }
+
+    return {
+        loadSchools: loadSchools,
+        withinRadius: withinRadius,
+        loadClusters: loadClusters,
+        loadViewportDorms: loadViewportDorms,
+        clusterIcon: clusterIcon,
+    };
+})();
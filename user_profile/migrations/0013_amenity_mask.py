@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+# Preference flag per bit as of this migration (bit = position); a frozen copy of
+# the flags in dormitory.amenity_bits.AMENITY_VOCABULARY.
+PREFERENCE_FIELDS = (
+    'wifi_required',
+    'parking_required',
+    'laundry_required',
+    'kitchen_required',
+    'aircon_required',
+    'security_required',
+    'pet_friendly_required',
+    'study_area_required',
+    'near_public_transport',
+)
+
+
+def backfill_amenity_masks(apps, schema_editor):
+    TenantPreferences = apps.get_model('user_profile', 'TenantPreferences')
+    for preferences in TenantPreferences.objects.iterator():
+        mask = 0
+        for position, field in enumerate(PREFERENCE_FIELDS):
+            if getattr(preferences, field):
+                mask |= 1 << position
+        if mask:
+            TenantPreferences.objects.filter(pk=preferences.pk).update(amenity_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0012_alter_tenantpreferences_preferred_room_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenantpreferences',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amenity_masks, migrations.RunPython.noop),
+    ]
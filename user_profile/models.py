@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from dormitory.amenity_bits import AMENITY_VOCABULARY, PREFERENCE_FIELDS, labels_for_mask, mask_for_preferences
 from dormitory.models import Dorm
 from django.utils import timezone
 
@@ -122,6 +123,8 @@ class TenantPreferences(models.Model):
     near_public_transport = models.BooleanField(default=False)
     other_amenity_required = models.BooleanField(default=False)
     other_amenity_text = models.CharField(max_length=120, blank=True)
+    # Vocabulary bits of the *_required flags above (see dormitory/amenity_bits.py), set on save
+    amenity_mask = models.PositiveIntegerField(default=0, editable=False)
     
     # Roommate Preferences
     ROOMMATE_MOOD_CHOICES = [
@@ -204,6 +207,13 @@ class TenantPreferences(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        self.amenity_mask = mask_for_preferences(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(PREFERENCE_FIELDS).intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'amenity_mask'}
+        super().save(*args, **kwargs)
+
     def get_primary_roommate_mood(self):
         moods = self.preferred_roommate_personalities or []
         valid_moods = {choice for choice, _label in self.ROOMMATE_MOOD_CHOICES if choice != 'any'}
@@ -260,46 +270,15 @@ class TenantPreferences(models.Model):
     
     def _get_required_amenities_list(self):
         """Get list of required amenities as a comma-separated string."""
-        amenities = []
-        if self.wifi_required:
-            amenities.append('WiFi')
-        if self.parking_required:
-            amenities.append('Parking')
-        if self.laundry_required:
-            amenities.append('Laundry')
-        if self.kitchen_required:
-            amenities.append('Kitchen')
-        if self.aircon_required:
-            amenities.append('Air Conditioning')
-        if self.security_required:
-            amenities.append('Security')
-        if self.pet_friendly_required:
-            amenities.append('Pet Friendly')
-        if self.study_area_required:
-            amenities.append('Study Area')
-        if self.near_public_transport:
-            amenities.append('Near Public Transport')
-        
-        return ', '.join(amenities) if amenities else 'No specific requirements'
+        labels = labels_for_mask(mask_for_preferences(self))
+        return ', '.join(labels) if labels else 'No specific requirements'
     
     def _get_required_amenities_objects(self):
         """Get list of RoommateAmenity objects based on preferences."""
         from dormitory.models import RoommateAmenity
         
         amenities = []
-        amenity_mapping = {
-            'wifi_required': 'WiFi',
-            'parking_required': 'Parking',
-            'laundry_required': 'Laundry',
-            'kitchen_required': 'Kitchen',
-            'aircon_required': 'Air Conditioning',
-            'security_required': 'Security',
-            'pet_friendly_required': 'Pet Friendly',
-            'study_area_required': 'Study Area',
-            'near_public_transport': 'Near Public Transport',
-        }
-        
-        for field_name, amenity_name in amenity_mapping.items():
+        for _key, amenity_name, field_name, _keywords in AMENITY_VOCABULARY:
             if getattr(self, field_name, False):
                 amenity_obj, created = RoommateAmenity.objects.get_or_create(name=amenity_name)
                 amenities.append(amenity_obj)
@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 
-from .models import UserProfile
+from dormitory.dashboard_cache import invalidate_user as invalidate_dashboard_recommendations
+from .models import FavoriteDorm, TenantPreferences, UserInteraction, UserProfile
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -18,3 +19,32 @@ def create_user_profile_on_user_creation(sender, instance, created, **kwargs):
     )
 
 
+@receiver(post_save, sender=TenantPreferences)
+def invalidate_recommendations_on_preferences(sender, instance, **kwargs):
+    invalidate_dashboard_recommendations(instance.user_id)
+
+
+@receiver(post_save, sender=UserInteraction)
+def invalidate_recommendations_on_interaction(sender, instance, created, **kwargs):
+    if created:
+        invalidate_dashboard_recommendations(instance.user_id)
+
+
+@receiver(post_save, sender=FavoriteDorm)
+@receiver(post_delete, sender=FavoriteDorm)
+def invalidate_recommendations_on_favorite(sender, instance, **kwargs):
+    user_id = UserProfile.objects.filter(pk=instance.user_profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_dashboard_recommendations(user_id)
+
+
+@receiver(m2m_changed, sender=UserProfile.favorite_dorms.through)
+def invalidate_recommendations_on_favorites(sender, instance, action, reverse, pk_set, **kwargs):
+    """``favorite_dorms.add()`` bulk-creates FavoriteDorm rows without post_save."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_dashboard_recommendations(instance.user_id)
+    elif pk_set:
+        for user_id in UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+            invalidate_dashboard_recommendations(user_id)
@@ -1,3 +1,95 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from accounts.models import CustomUser
+from dormitory import dashboard_cache
+from dormitory.models import Dorm
+
+from .models import FavoriteDorm, TenantPreferences, UserInteraction
+
+
+class DashboardInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        landlord = CustomUser.objects.create_user(
+            username='landlord', password='x', email='landlord@example.com', user_type='landlord',
+        )
+        self.tenant = CustomUser.objects.create_user(
+            username='tenant', password='x', email='tenant@example.com', user_type='tenant',
+        )
+        self.profile = self.tenant.userprofile
+        self.dorms = [
+            Dorm.objects.create(
+                landlord=landlord, name=f'Dorm {i}', address='Taft Avenue', price=Decimal('4000'),
+                description='desc', approval_status='approved',
+            )
+            for i in range(2)
+        ]
+        self.key = dashboard_cache.cache_key(self.tenant.pk)
+
+    def assert_invalidates(self, change):
+        cache.set(self.key, {'regular': []})
+        with mock.patch('dormitory.dashboard_cache.schedule_warm') as schedule_warm:
+            with self.captureOnCommitCallbacks() as callbacks:
+                change()
+            # Nothing is dropped before the write commits.
+            self.assertIsNotNone(cache.get(self.key))
+            for callback in callbacks:
+                callback()
+        self.assertIsNone(cache.get(self.key))
+        schedule_warm.assert_called_with(self.tenant.pk)
+
+    def test_preferences_interactions_and_favorites_drop_the_entry(self):
+        changes = [
+            lambda: TenantPreferences.objects.create(user=self.tenant, wifi_required=True),
+            lambda: UserInteraction.objects.create(user=self.tenant, dorm=self.dorms[0], interaction_type='view'),
+            lambda: FavoriteDorm.objects.create(user_profile=self.profile, dorm=self.dorms[0]),
+            lambda: FavoriteDorm.objects.filter(user_profile=self.profile).delete(),
+            lambda: self.profile.favorite_dorms.add(self.dorms[1]),
+            lambda: self.dorms[1].favorited_by.remove(self.profile),
+        ]
+        for change in changes:
+            self.assert_invalidates(change)
+
+    def test_other_tenants_keep_their_entry(self):
+        other = CustomUser.objects.create_user(
+            username='other', password='x', email='other@example.com', user_type='tenant',
+        )
+        other_key = dashboard_cache.cache_key(other.pk)
+        cache.set(other_key, {'regular': []})
+        with mock.patch('dormitory.dashboard_cache.schedule_warm'):
+            with self.captureOnCommitCallbacks(execute=True):
+                UserInteraction.objects.create(user=self.tenant, dorm=self.dorms[0], interaction_type='view')
+        self.assertIsNotNone(cache.get(other_key))
+
+
+@override_settings(DASHBOARD_RECOMMENDATIONS_WARM=True)
+class DashboardWarmTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        with dashboard_cache._warm_condition:
+            dashboard_cache._warm_due.clear()
+
+    @override_settings(DASHBOARD_RECOMMENDATIONS_WARM_DELAY=3600)
+    def test_only_recently_active_tenants_are_warmed(self):
+        dashboard_cache.schedule_warm(41)
+        self.assertNotIn(41, dashboard_cache._warm_due)
+        cache.set(dashboard_cache.active_key(41), 1)
+        dashboard_cache.schedule_warm(41)
+        self.assertIn(41, dashboard_cache._warm_due)
+
+    @override_settings(DASHBOARD_RECOMMENDATIONS_WARM_DELAY=0.2)
+    def test_a_burst_of_changes_warms_once(self):
+        cache.set(dashboard_cache.active_key(42), 1)
+        warmed = threading.Event()
+        with mock.patch('dormitory.dashboard_cache._warm', side_effect=lambda user_id: warmed.set()) as warm:
+            for _ in range(5):
+                dashboard_cache.schedule_warm(42)
+            self.assertTrue(warmed.wait(5))
+        warm.assert_called_once_with(42)